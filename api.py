@@ -0,0 +1,641 @@
+"""
+Code related to the programmatic search API, returning structured results without printing anything
+
+Example:
+    from api import search
+    result = search('Paris', 'Lyon', date(2030, 1, 10))
+    for day in result.days:
+        print(day.direct, day.indirect)
+"""
+import asyncio
+from contextlib import contextmanager
+from copy import copy
+from datetime import date, datetime, timedelta
+from functools import partial
+from logging import getLogger
+from threading import Lock
+from time import perf_counter
+from typing import Iterable, Iterator
+
+from dag import TaskGraph, Task
+from heuristics import SKIP_BELOW
+from direct_destination import DirectDestination
+from multiple_proposals import MultipleProposals
+from nearby import find_alternatives
+from options import SearchOptions, PromptOptions
+from prefilter import count_all
+from profiling import tracer
+from proposal import Proposal
+from search import get_available_seats
+from station import Station, PARIS
+
+logger = getLogger(__name__)
+
+# Days searched at the same time by a first available day search (--first-available)
+IN_FLIGHT = 3
+
+
+class DayResult:
+    """
+    Direct and multi-leg results of one day
+    """
+    day: datetime
+    direct: [Proposal]
+    indirect: dict[str, list[MultipleProposals]]  # via station name -> connections
+    nearby: dict[str, list[Proposal]]  # alternative station name -> direct proposals (--radius)
+    unexplored: [str]  # 'direct', via and alternative station names not searched for lack of budget
+
+    def __init__(self, day, direct=None, indirect=None, unexplored=None, nearby=None):
+        self.day = day
+        self.direct = direct or []
+        self.indirect = indirect or {}
+        self.unexplored = unexplored or []
+        self.nearby = nearby or {}
+
+    def arrivals(self) -> [datetime]:
+        """
+        Returns the arrival dates of direct, indirect and nearby itineraries
+        """
+        return [proposal.arrival_date for proposal in self.direct] + \
+            [connection.proposals[-1].arrival_date
+             for connections in self.indirect.values() for connection in connections] + \
+            [proposal.arrival_date for proposals in self.nearby.values() for proposal in proposals]
+
+    def after(self, moment: datetime) -> 'DayResult':
+        """
+        Returns the itineraries departing after a moment, like the return of a journey arriving at this moment
+        """
+        return DayResult(self.day, [proposal for proposal in self.direct if proposal.departure_date > moment],
+                         {via: [connection for connection in connections
+                                if connection.proposals[0].departure_date > moment]
+                          for via, connections in self.indirect.items()},
+                         self.unexplored,
+                         {station: [proposal for proposal in proposals if proposal.departure_date > moment]
+                          for station, proposals in self.nearby.items()})
+
+    def to_dict(self) -> dict:
+        """
+        Returns the day results as a JSON serializable dict
+        """
+        return {'date': self.day.date().isoformat(),
+                'direct': [proposal.to_dict() for proposal in self.direct],
+                'indirect': [{'via': via, 'connections': [connection.to_dict() for connection in connections]}
+                             for via, connections in self.indirect.items() if connections],
+                'nearby': [{'station': station, 'direct': [proposal.to_dict() for proposal in proposals]}
+                           for station, proposals in self.nearby.items() if proposals],
+                'unexplored': self.unexplored}
+
+
+class SearchResult:
+    """
+    Results of a search over several days, with the time spent in each phase
+    """
+    departure: Station
+    arrival: Station
+    days: [DayResult]
+    timings: dict[str, float]
+    skipped: [str]
+    unexplored: [str]
+    alternatives: [dict]
+
+    def __init__(self, departure, arrival, days, timings, skipped=None, unexplored=None, alternatives=None):
+        self.departure = departure
+        self.arrival = arrival
+        self.days = days
+        self.timings = timings
+        self.skipped = skipped or []
+        self.unexplored = unexplored or []
+        self.alternatives = alternatives or []
+
+    def to_dict(self) -> dict:
+        """
+        Returns the search results as a JSON serializable dict
+        """
+        return {'origin': self.departure.formal_name, 'destination': self.arrival.formal_name,
+                'days': [day.to_dict() for day in self.days], 'timings': self.timings, 'skipped': self.skipped,
+                'unexplored': self.unexplored,
+                'nearby': [{'station': alternative['station'].name, 'instead_of': alternative['end'],
+                            'distance': round(alternative['distance'], 1)} for alternative in self.alternatives]}
+
+
+class Search:
+    """
+    Search of direct and indirect proposals between two stations
+    """
+    departure: Station
+    arrival: Station
+    search_opts: SearchOptions
+    prompt_opts: PromptOptions
+    timings: dict[str, float]
+    workers: int
+    skipped: [str]
+    dpt_direct_dest: DirectDestination
+    arr_direct_dest: DirectDestination
+    intermediate_stations: [dict]
+    alternatives: [dict]
+
+    def __init__(self, origin: str, destination: str, search_opts: SearchOptions = None,
+                 prompt_opts: PromptOptions = None, workers: int = 1):
+        self.departure = Station(origin)
+        self.arrival = Station(destination)
+        self.search_opts = search_opts or SearchOptions(max_duration=600)
+        # progress bars are disabled unless the caller asks for them, and when searches run at the same time
+        self.prompt_opts = prompt_opts or PromptOptions(quiet=True)
+        if workers > 1 and not self.prompt_opts.quiet:
+            self.prompt_opts = PromptOptions(self.prompt_opts.verbosity, True, self.prompt_opts.debug,
+                                             self.prompt_opts.long)
+        self.workers = workers
+        self.timings = {}
+        self._timings_lock = Lock()
+        self.skipped = []
+        self.dpt_direct_dest = self.arr_direct_dest = None
+        self.intermediate_stations = None
+        self.alternatives = []
+
+    @contextmanager
+    def timed(self, phase: str):
+        """
+        Add the time spent in the block to the timings of a phase, and trace it as a span
+        """
+        start = perf_counter()
+        try:
+            with tracer.span(phase):
+                yield
+        finally:
+            elapsed = perf_counter() - start
+            # phases of the task graph run in worker threads
+            with self._timings_lock:
+                self.timings[phase] = self.timings.get(phase, 0.0) + elapsed
+
+    def resolve(self) -> None:
+        """
+        Resolve stations codes and, unless searching direct proposals only, direct destinations
+        and intermediate stations of both stations.
+        With a radius, the alternative stations near both stations are found among their direct destinations
+        """
+        with self.timed('stations'):
+            self.departure.get_code()  # Get station code from name (ex: Paris-> FRPAR)
+            self.arrival.get_code()
+            logger.info("Stations codes acquired")
+        if self.search_opts.direct_only and not self.search_opts.radius:
+            return
+
+        with self.timed('direct_destinations'):
+            self.departure.get_identifier()
+            self.arrival.get_identifier()
+            logger.info("Stations identifiers acquired")
+            self.dpt_direct_dest = DirectDestination.get(self.departure)
+            self.arr_direct_dest = DirectDestination.get(self.arrival)
+        if self.search_opts.radius:
+            with self.timed('nearby_stations'):
+                self.alternatives = find_alternatives(self.departure, self.arrival, self.dpt_direct_dest,
+                                                      self.arr_direct_dest, self.search_opts.radius)
+            logger.info("%s alternative stations within %s km", len(self.alternatives), self.search_opts.radius)
+        if self.search_opts.direct_only:
+            return
+
+        with self.timed('direct_destinations'):
+            if not self.search_opts.via:
+                intermediate_stations = DirectDestination.get_common_stations(self.dpt_direct_dest,
+                                                                              self.arr_direct_dest)
+                if not self.departure.is_paris() and not self.arrival.is_paris():  # Paris is the main hub
+                    intermediate_stations.append(PARIS)
+                logger.info("%s intermediate stations available", len(intermediate_stations))
+            else:  # if --via option is specified, search only proposals via this station
+                via = Station(self.search_opts.via)
+                via.get_code()
+                via.get_identifier()
+                intermediate_stations = [{'station': via}]
+            # check for segments between station located in France only
+            self.intermediate_stations = [intermediate_station for intermediate_station in intermediate_stations
+                                          if intermediate_station['station'].is_in_france()]
+
+    def search_direct(self, day: datetime) -> [Proposal]:
+        """
+        Returns direct proposals of a day
+        """
+        with self.timed('direct'):
+            return get_available_seats(self.departure.code, self.arrival.code, day,
+                                       self.search_opts, self.prompt_opts)
+
+    def search_nearby(self, alternative: dict, day: datetime) -> [Proposal]:
+        """
+        Returns direct proposals of a day from an alternative departure or to an alternative arrival
+        """
+        with self.timed('nearby'), tracer.span('nearby', station=alternative['station'].name):
+            return get_available_seats(alternative['dpt'].name_to_code()[0], alternative['arr'].name_to_code()[0],
+                                       day, self.search_opts, self.prompt_opts)
+
+    def ordered_segments(self, intermediate_station: dict, day: datetime = None) -> ([dict], bool, int):
+        """
+        Returns the segments of a connection in search order, the segment with the lowest hit rate first
+        with learned hit rates (--hit-rates), else the longest segment first
+        (most demanded than the shortest and potentially limiting factor)
+        Exemple : For Beziers-Paris (~4h) via Nimes, we first search for
+        the journey from Nimes to Paris (~3h), then for the journey
+        from Beziers-Nimes (~1h), because longer segment is rarer
+        :return: segments, whether they are in reverse travel order, and duration of the longest one in minutes
+        """
+        segments = [{'dpt': self.departure, 'arr': intermediate_station['station']},
+                    {'dpt': intermediate_station['station'], 'arr': self.arrival}]
+        rates = self.segment_rates(segments, day)
+        if None not in rates:
+            reverse = rates[1] < rates[0]
+        else:
+            farther_station = Station.get_farther(self.dpt_direct_dest, self.arr_direct_dest, intermediate_station)
+            reverse = farther_station == intermediate_station['station']
+        if reverse:
+            segments.reverse()
+        identifier = intermediate_station['station'].identifier
+        durations = [direct_destination.destinations[identifier]['duration']
+                     for direct_destination in (self.dpt_direct_dest, self.arr_direct_dest)
+                     if identifier in direct_destination.destinations]
+        return segments, reverse, max(durations, default=0)
+
+    def segment_rates(self, segments: [dict], day: datetime = None) -> [float]:
+        """
+        Returns the learned probability that each segment has seats on a day, None when unknown
+        """
+        hit_rates = self.search_opts.hit_rates
+        if hit_rates is None or day is None:
+            return [None] * len(segments)
+        return [hit_rates.rate(segment['dpt'].name_to_code()[0], segment['arr'].name_to_code()[0], day,
+                               self.search_opts.hours) for segment in segments]
+
+    def via_rate(self, intermediate_station: dict, day: datetime) -> float:
+        """
+        Returns the highest probability that both segments of a connection have seats on a day from learned
+        hit rates, unknown segments counting as always available, None when both are unknown
+        """
+        rates = self.segment_rates([{'dpt': self.departure, 'arr': intermediate_station['station']},
+                                    {'dpt': intermediate_station['station'], 'arr': self.arrival}], day)
+        if rates == [None, None]:
+            return None
+        return (rates[0] if rates[0] is not None else 1.0) * (rates[1] if rates[1] is not None else 1.0)
+
+    def via_stale(self, intermediate_station: dict, day: datetime) -> bool:
+        """
+        Returns whether the segment of a connection least likely to have seats was not searched for a while,
+        a skipped connection is then searched again, this segment first, so that its hit rate can recover
+        """
+        segments = [{'dpt': self.departure, 'arr': intermediate_station['station']},
+                    {'dpt': intermediate_station['station'], 'arr': self.arrival}]
+        rates = self.segment_rates(segments, day)
+        known = [(rate, segment) for rate, segment in zip(rates, segments) if rate is not None]
+        if not known:
+            return False
+        segment = min(known, key=lambda item: item[0])[1]
+        return self.search_opts.hit_rates.stale(segment['dpt'].name_to_code()[0], segment['arr'].name_to_code()[0])
+
+    def search_segment(self, segment: dict, day: datetime, *_needed) -> [Proposal]:
+        """
+        Returns proposals of a segment of a connection
+        :param segment: dict with dpt and arr stations
+        :param day: day of the search
+        :param _needed: results of the segments searched before, only searched if they are not empty
+        """
+        dpt_code, arr_code = segment['dpt'].name_to_code()[0], segment['arr'].name_to_code()[0]
+        negative_cache = self.search_opts.negative_cache
+        expiry = negative_cache.expiry(dpt_code, arr_code, day, self.search_opts.hours,
+                                       self.search_opts.max_duration) \
+            if negative_cache is not None else None
+        if expiry is not None:
+            self.skipped.append(f"Segment {segment['dpt'].name} - {segment['arr'].name} {day.date()}: "
+                                f"no seat found recently, searched again after {datetime.fromtimestamp(expiry):%X}")
+            return []
+        search_opts = self.search_opts
+        if search_opts.until_found:  # the first page with seats of each segment rarely has trains that connect
+            search_opts = copy(search_opts)
+            search_opts.until_found = False
+        with self.timed('indirect'), tracer.span('segment', dpt=segment['dpt'].name, arr=segment['arr'].name):
+            result = get_available_seats(dpt_code, arr_code, day, search_opts, self.prompt_opts)
+        logger.info("Segment %s - %s: %s proposals", segment['dpt'].name, segment['arr'].name, len(result))
+        return result
+
+    @staticmethod
+    def join(reverse: bool, first: [Proposal], second: [Proposal]) -> [MultipleProposals]:
+        """
+        Returns connections of two segments given in search order
+        """
+        if reverse:  # segments were searched in reverse order, join them in travel order
+            first, second = second, first
+        with tracer.span('join'):
+            connections = MultipleProposals.join(first, second)
+        if not connections:
+            logger.info("Connection is physically impossible between available proposals")
+        return connections
+
+    def search_via(self, intermediate_station: dict, day: datetime) -> [MultipleProposals]:
+        """
+        Returns connections of a day via an intermediate station
+        """
+        segments, reverse, _ = self.ordered_segments(intermediate_station, day)
+        results = []
+        for segment in segments:
+            result = self.search_segment(segment, day)
+            if not result:
+                return []  # it's useless to search next segment if one is not available
+            results.append(result)
+        return self.join(reverse, *results)
+
+    def via_duration(self, intermediate_station: dict) -> int:
+        """
+        Returns the duration of a journey via an intermediate station in minutes, from direct destinations durations
+        """
+        identifier = intermediate_station['station'].identifier
+        return sum(direct_destination.destinations.get(identifier, {}).get('duration', 0)
+                   for direct_destination in (self.dpt_direct_dest, self.arr_direct_dest))
+
+    def plan(self, days: [datetime], direct: bool = True, vias: bool = True) -> TaskGraph:
+        """
+        Returns the graph of all searches of the days: direct proposals, then the first segment of each via,
+        the most promising vias first, then the other segment only if the first one has seats, then connections.
+        With a budget, searches are ranked by value instead of by day: direct proposals of every day first,
+        then both segments of the most promising vias.
+        Vias are ranked by learned hit rates (--hit-rates) and hopeless ones are not searched,
+        without hit rates the shortest vias come first, or the longest segment without budget.
+        With HAFAS timetables (--prefilter), vias without any connection of TGV or Intercités trains are not
+        searched and the other ones are ranked by number of connections.
+        Direct proposals of alternative stations (--radius) come right after the direct proposals, nearest first
+        :param days: days to search
+        :param direct: plan direct searches, of the stations and of the alternative ones
+        :param vias: plan searches of connections
+        """
+        budgeted = self.search_opts.budget is not None
+        graph = TaskGraph()
+        counts = {}
+        if self.search_opts.prefilter and vias and not self.search_opts.direct_only:
+            with self.timed('prefilter'):
+                via_stations = [intermediate_station['station'] for intermediate_station in self.intermediate_stations]
+                counts = count_all(self.departure, self.arrival, via_stations, days, self.search_opts.hours)
+        for day_index, day in enumerate(days):
+            if direct:
+                graph.add(f'Direct {self.departure.name} - {self.arrival.name} {day.date()}',
+                          partial(self.search_direct, day), rank=(0, day_index) if budgeted else (day_index, 0),
+                          day=day, kind='direct', dpt=self.departure, arr=self.arrival)
+            for index, alternative in enumerate(self.alternatives if direct else []):
+                graph.add(f"Direct {alternative['dpt'].name} - {alternative['arr'].name} {day.date()}",
+                          partial(self.search_nearby, alternative, day),
+                          rank=(0, len(days) + day_index, index) if budgeted else (day_index, 0, index),
+                          day=day, kind='nearby', station=alternative['station'].name,
+                          dpt=alternative['dpt'], arr=alternative['arr'])
+            if self.search_opts.direct_only or not vias:
+                continue
+            for intermediate_station in self.intermediate_stations:
+                via_name = intermediate_station['station'].name
+                rate = self.via_rate(intermediate_station, day)
+                if rate is not None and rate < SKIP_BELOW and not self.via_stale(intermediate_station, day):
+                    self.skipped.append(f'Connections via {via_name} {day.date()}: '
+                                        f'seats on both segments in {rate:.0%} of past searches')
+                    continue
+                count = counts.get((via_name, day))
+                if count == 0:
+                    self.skipped.append(f'Connections via {via_name} {day.date()}: '
+                                        'no TGV or Intercités connection in HAFAS timetables')
+                    continue
+                # vias never searched are ranked like vias with seats half of the time,
+                # then vias with the most connections come first
+                score = (-(rate if rate is not None else 0.5), -(count or 0))
+                segments, reverse, longest = self.ordered_segments(intermediate_station, day)
+                if budgeted:
+                    duration = self.via_duration(intermediate_station)
+                    ranks = [(1, score, duration, day_index, 0), (1, score, duration, day_index, 1), (-1, day_index)]
+                else:
+                    ranks = [(day_index, 1, score, -longest), (day_index, 2, score, -longest), (day_index, 3)]
+                names = [f"Segment {segment['dpt'].name} - {segment['arr'].name} {day.date()}"
+                         for segment in segments]
+                first = graph.add(names[0], partial(self.search_segment, segments[0], day),
+                                  rank=ranks[0], day=day, kind='segment', via=via_name, **segments[0])
+                second = graph.add(names[1], partial(self.search_segment, segments[1], day), needs=[first],
+                                   rank=ranks[1], day=day, kind='segment', via=via_name, **segments[1])
+                graph.add(f"Connections via {via_name} {day.date()}",
+                          partial(self.join, reverse), needs=[first, second], rank=ranks[2], day=day,
+                          kind='join', via=via_name)
+        return graph
+
+    def search_day(self, day: datetime) -> DayResult:
+        """
+        Returns direct, nearby and indirect results of a day
+        """
+        result = DayResult(day, self.search_direct(day))
+        for alternative in self.alternatives:
+            result.nearby[alternative['station'].name] = self.search_nearby(alternative, day)
+        if not self.search_opts.direct_only:
+            for intermediate_station in self.intermediate_stations:
+                result.indirect[intermediate_station['station'].name] = self.search_via(intermediate_station, day)
+        return result
+
+    def iter_days(self, days: Iterable[datetime]) -> Iterator[DayResult]:
+        """
+        Yield results day by day, as soon as each day and the previous ones are searched.
+        All searches of the days run as one graph, with workers searches at the same time,
+        and segments of a connection are skipped when the other one has no seat.
+        With a budget, searches which can't be afforded anymore are cancelled and noted as unexplored
+        """
+        if self.departure.code is None:
+            self.resolve()
+        days = list(days)
+        graph = self.plan(days)
+        budget = self.search_opts.budget
+        if budget is not None:
+            budget.reserve(sum(task.details['kind'] != 'join' for task in graph.tasks))
+
+        def stop(task: Task) -> bool:
+            # connections are joined without any request, whatever the budget
+            return budget is not None and task.details['kind'] != 'join' and budget.exhausted
+        vias = [] if self.search_opts.direct_only else self.intermediate_stations
+        results = [DayResult(day, [], {via['station'].name: [] for via in vias},
+                             nearby={alternative['station'].name: [] for alternative in self.alternatives})
+                   for day in days]
+        remaining = [0] * len(days)
+        for task in graph.tasks:
+            remaining[days.index(task.details['day'])] += 1
+        yielded = 0
+        for task in graph.run(self.workers, stop):
+            day_index = days.index(task.details['day'])
+            remaining[day_index] -= 1
+            kind = task.details['kind']
+            if task.state == Task.DONE and kind == 'direct':
+                results[day_index].direct = task.result
+            elif task.state == Task.DONE and kind == 'join':
+                results[day_index].indirect[task.details['via']] = task.result
+            elif task.state == Task.DONE and kind == 'nearby':
+                results[day_index].nearby[task.details['station']] = task.result
+            elif task.state == Task.SKIPPED and kind == 'segment':
+                self.skipped.append(f'{task.name}: {task.reason}')
+            if budget is not None and task.state in (Task.SKIPPED, Task.CANCELLED) and kind != 'join':
+                budget.release()
+                if task.state == Task.CANCELLED:
+                    budget.note(task.name)
+            if task.state == Task.CANCELLED and kind in ('direct', 'join', 'nearby'):
+                results[day_index].unexplored.append(task.details.get('via', task.details.get('station', 'direct')))
+            while yielded < len(days) and remaining[yielded] == 0:
+                yield results[yielded]
+                yielded += 1
+
+    def first_available(self, days: Iterable[datetime], in_flight: int = IN_FLIGHT) -> DayResult:
+        """
+        Returns the results of the earliest day with an itinerary, None if no day has one.
+        Days are searched in order, direct proposals then connections, in_flight searches at the same time.
+        Each direct search stops at its first page with seats, segments of connections are searched in full,
+        and searches of the days following a day with an itinerary are cancelled, then the direct proposals
+        found that day are searched again in full
+        :param days: days to scan, nearest first
+        :param in_flight: number of searches run at the same time
+        """
+        if self.departure.code is None:
+            self.resolve()
+        days = list(days)
+        search_opts = self.search_opts
+        self.search_opts = copy(search_opts)
+        self.search_opts.until_found = True
+        results = {}
+        found = []  # indexes of days with an itinerary
+
+        def stop(task: Task) -> bool:
+            return bool(found) and days.index(task.details['day']) > min(found)
+
+        try:
+            for task in self.plan(days).run(in_flight, stop):
+                kind = task.details['kind']
+                result = results.setdefault(task.details['day'], DayResult(task.details['day']))
+                if task.state == Task.DONE and kind == 'direct':
+                    result.direct = task.result
+                elif task.state == Task.DONE and kind == 'nearby':
+                    result.nearby[task.details['station']] = task.result
+                elif task.state == Task.DONE and kind == 'join':
+                    result.indirect[task.details['via']] = task.result
+                elif task.state == Task.SKIPPED and kind == 'segment':
+                    self.skipped.append(f'{task.name}: {task.reason}')
+                if task.state == Task.DONE and kind != 'segment' and task.result:
+                    found.append(days.index(task.details['day']))
+        finally:
+            self.search_opts = search_opts
+        if not found:
+            return None
+        # the scan kept the first page with seats of each direct search, the ones found get all their pages
+        result = results[days[min(found)]]
+        if result.direct:
+            result.direct = self.search_direct(result.day)
+        for alternative in self.alternatives:
+            if result.nearby.get(alternative['station'].name):
+                result.nearby[alternative['station'].name] = self.search_nearby(alternative, result.day)
+        return result
+
+    def reverse(self) -> 'Search':
+        """
+        Returns the search of the return journey, sharing the resolved stations and intermediate stations
+        """
+        search = Search(self.arrival.name, self.departure.name, self.search_opts, self.prompt_opts, self.workers)
+        search.departure, search.arrival = self.arrival, self.departure
+        search.dpt_direct_dest, search.arr_direct_dest = self.arr_direct_dest, self.dpt_direct_dest
+        search.intermediate_stations = self.intermediate_stations
+        search.alternatives = [alternative | {'end': 'arrival' if alternative['end'] == 'departure' else 'departure',
+                                              'dpt': alternative['arr'], 'arr': alternative['dpt']}
+                               for alternative in self.alternatives]
+        return search
+
+    def run(self, days: Iterable[datetime]) -> SearchResult:
+        """
+        Search all days and returns the results
+        """
+        start = perf_counter()
+        day_results = list(self.iter_days(days))
+        self.timings['total'] = perf_counter() - start
+        budget = self.search_opts.budget
+        return SearchResult(self.departure, self.arrival, day_results, self.timings, self.skipped,
+                            budget.unexplored if budget is not None else None, self.alternatives)
+
+
+class RoundTrip:
+    """
+    Outbound and return searches sharing stations resolution, direct destinations and intermediate stations,
+    the return being searched only on days following a feasible outbound
+    """
+    outbound: Search
+    inbound: Search
+    return_after: int
+    return_period: int
+
+    def __init__(self, outbound: Search, return_after: int, return_period: int = 1):
+        """
+        :param outbound: search of the outbound journey
+        :param return_after: number of days between the outbound and the first return day
+        :param return_period: number of return days to search from the first one
+        """
+        self.outbound = outbound
+        self.inbound = None
+        self.return_after = return_after
+        self.return_period = return_period
+
+    def return_days(self, outbound_result: DayResult) -> [datetime]:
+        """
+        Returns the return days of an outbound day, none if it has no itinerary
+        """
+        arrivals = outbound_result.arrivals()
+        if not arrivals:
+            return []
+        days = [outbound_result.day + timedelta(days=offset)
+                for offset in range(self.return_after, self.return_after + self.return_period)]
+        return [day for day in days if day.date() >= min(arrivals).date()]
+
+    def run(self, days: Iterable[datetime]) -> Iterator[tuple[DayResult, list[DayResult]]]:
+        """
+        Search the outbound days, then the return days following at least one of them,
+        and yield each outbound day with its return days, restricted to departures after its earliest arrival
+        """
+        outbound_results = list(self.outbound.iter_days(days))
+        return_days = sorted({day for result in outbound_results for day in self.return_days(result)})
+        self.inbound = self.outbound.reverse()
+        return_results = {result.day: result for result in self.inbound.iter_days(return_days)} if return_days else {}
+        for result in outbound_results:
+            yield result, [return_results[day].after(min(result.arrivals())) for day in self.return_days(result)]
+
+
+def normalize_dates(dates) -> [datetime]:
+    """
+    Returns days to search from a date, a datetime or an iterable of them
+    """
+    if isinstance(dates, (date, datetime)):
+        dates = [dates]
+    days = []
+    for day in dates:
+        if not isinstance(day, datetime):
+            day = datetime.combine(day, datetime.min.time())
+        days.append(day.replace(hour=0, minute=0, second=1, microsecond=0))
+    return days
+
+
+def search(origin: str, destination: str, dates, options: SearchOptions = None) -> SearchResult:
+    """
+    Search TGVmax proposals between two stations
+    :param origin: name of departure station
+    :param destination: name of arrival station
+    :param dates: a date or an iterable of dates to search
+    :param options: search options, direct and indirect proposals by default
+    :return: direct and multi-leg results of each day, with timings
+    :raise SNCFConnectError: if SNCF Connect refuses a request
+    :raise ValueError: if a station is not found
+    """
+    return Search(origin, destination, options).run(normalize_dates(dates))
+
+
+def iter_search(origin: str, destination: str, dates, options: SearchOptions = None) -> Iterator[DayResult]:
+    """
+    Same as search, but yield results of each day as soon as it is searched
+    """
+    return Search(origin, destination, options).iter_days(normalize_dates(dates))
+
+
+async def search_async(origin: str, destination: str, dates, options: SearchOptions = None) -> SearchResult:
+    """
+    Asynchronous variant of search, run in a worker thread
+    """
+    return await asyncio.to_thread(search, origin, destination, dates, options)
+
+
+def date_range(start: datetime, days: int) -> [datetime]:
+    """
+    Returns a list of consecutive days
+    """
+    return [start + timedelta(days=day_counter) for day_counter in range(days)]
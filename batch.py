@@ -0,0 +1,272 @@
+"""
+Code related to batch mode, searching many routes with one shared query plan
+"""
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from os import makedirs
+from os.path import join, splitext
+
+from direct_destination import DirectDestination
+from multiple_proposals import MultipleProposals
+from options import SearchOptions, PromptOptions
+from search import get_cached_seats
+from station import Station, PARIS
+
+
+class BatchRoute:
+    """
+    Route to search, as described by one entry of the batch file
+    """
+    origin: str
+    destination: str
+    start: datetime
+    period: int
+    via: str
+    direct_only: bool
+    hours: tuple[int, int]
+    max_duration: int
+
+    def __init__(self, origin, destination, start, period=1, via=None, direct_only=False,
+                 hours=None, max_duration=600):
+        self.origin = origin
+        self.destination = destination
+        self.start = start
+        self.period = period
+        self.via = via
+        self.direct_only = direct_only
+        self.hours = hours
+        self.max_duration = max_duration
+
+    @staticmethod
+    def from_row(row: dict) -> 'BatchRoute':
+        """
+        Parse one entry of the batch file, values may be strings (CSV) or typed (YAML)
+        :param row: dict with at least origin and destination keys
+        :return: BatchRoute object
+        """
+        today = datetime.now().replace(hour=0, minute=0, second=1)
+        if row.get('date'):
+            start = datetime.combine(datetime.fromisoformat(str(row['date'])).date(), today.time())
+        else:
+            start = today + timedelta(days=int(row.get('timedelta') or 1))
+        return BatchRoute(
+            origin=row['origin'],
+            destination=row['destination'],
+            start=start,
+            period=int(row.get('period') or 1),
+            via=row.get('via') or None,
+            direct_only=str(row.get('direct_only', '')).lower() in ('true', '1', 'yes'),
+            hours=SearchOptions.parse_hours(str(row['hours'])) if row.get('hours') else None,
+            max_duration=int(row.get('max_duration') or 600),
+        )
+
+    @property
+    def name(self) -> str:
+        """
+        Returns a name for the route, used as results file name, with the options which differ from the defaults
+        so that routes between the same stations from the same day have different names
+        """
+        parts = [self.origin, self.destination, self.start.strftime('%Y-%m-%d')]
+        if self.period != 1:
+            parts.append(f'{self.period}days')
+        if self.via:
+            parts.append(f'via-{self.via}')
+        if self.direct_only:
+            parts.append('direct')
+        if self.hours:
+            parts.append(f'{self.hours[0]}-{self.hours[1]}h')
+        if self.max_duration != 600:
+            parts.append(f'max{self.max_duration}')
+        return '_'.join(str(part) for part in parts).replace(' ', '-').replace('/', '-')
+
+    def days(self) -> [datetime]:
+        """
+        Returns all days to search for the route
+        """
+        return [self.start + timedelta(days=day_counter) for day_counter in range(self.period)]
+
+
+def load_routes(path: str) -> [BatchRoute]:
+    """
+    Load routes from a YAML or CSV batch file
+    :param path: path of the file, format is guessed from the extension
+    :return: list of BatchRoute objects
+    """
+    with open(path, encoding='utf-8') as file:
+        if splitext(path)[1] in ('.yml', '.yaml'):
+            try:
+                import yaml  # pylint: disable=import-outside-toplevel
+            except ImportError:
+                raise ImportError('PyYAML is required to read YAML batch files, use a CSV file instead') from None
+            rows = yaml.safe_load(file)
+            if isinstance(rows, dict):
+                rows = rows['routes']
+        else:
+            rows = list(csv.DictReader(file))
+    routes = [BatchRoute.from_row(row) for row in rows]
+    names = [route.name for route in routes]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Routes of {path} listed more than once: {', '.join(duplicates)}")
+    return routes
+
+
+class QueryPlanner:
+    """
+    Build one plan for all routes of a batch, so that identical (segment, day) fetches,
+    station and direct destinations lookups are done only once
+    """
+    routes: [BatchRoute]
+    prompt_opts: PromptOptions
+    workers: int
+    stations: dict[str, Station]
+    queries: dict[tuple, tuple]
+    results: dict[tuple, list]
+
+    def __init__(self, routes: [BatchRoute], prompt_opts: PromptOptions, workers: int = 4):
+        self.routes = routes
+        self.prompt_opts = prompt_opts
+        self.workers = workers
+        self.stations = {}
+        self.queries = {}
+        self.results = {}
+
+    def station(self, name: str, with_identifier: bool = False) -> Station:
+        """
+        Returns the resolved station for a name, shared by all routes
+        """
+        if name.lower() not in self.stations:
+            station = Station(name)
+            station.get_code()
+            self.stations[name.lower()] = station
+        station = self.stations[name.lower()]
+        if with_identifier:
+            station.get_identifier()
+        return station
+
+    def query(self, dpt_code: str, arr_code: str, day: datetime, hours: tuple, max_duration: int = 600) -> tuple:
+        """
+        Register a segment fetch in the plan
+        :return: key of the fetch, identical for identical fetches of several routes
+        """
+        key = (dpt_code, arr_code, day.date().isoformat(), hours, max_duration)
+        self.queries.setdefault(key, (dpt_code, arr_code, day, hours, max_duration))
+        return key
+
+    def plan_route(self, route: BatchRoute) -> [dict]:
+        """
+        Register all fetches needed by a route
+        :return: list of planned days, with keys of direct and via segments fetches
+        """
+        departure = self.station(route.origin, with_identifier=not route.direct_only)
+        arrival = self.station(route.destination, with_identifier=not route.direct_only)
+        vias = []
+        if not route.direct_only:
+            dpt_direct_dest = DirectDestination.get(departure)
+            arr_direct_dest = DirectDestination.get(arrival)
+            if route.via:
+                intermediate_stations = [{'station': self.station(route.via, with_identifier=True)}]
+            else:
+                intermediate_stations = DirectDestination.get_common_stations(dpt_direct_dest, arr_direct_dest)
+                if not departure.is_paris() and not arrival.is_paris():  # Paris is the main hub
+                    intermediate_stations.append(PARIS)
+            for intermediate_station in intermediate_stations:
+                if intermediate_station['station'].is_in_france():
+                    # the longest segment is searched first, as for a single route
+                    farther_station = Station.get_farther(dpt_direct_dest, arr_direct_dest, intermediate_station)
+                    vias.append((intermediate_station['station'],
+                                 intermediate_station['station'].name_to_code()[0],
+                                 farther_station == intermediate_station['station']))
+
+        planned_days = []
+        for day in route.days():
+            planned_day = {'day': day,
+                           'direct': self.query(departure.code, arrival.code, day, route.hours, route.max_duration),
+                           'vias': []}
+            for via, via_code, reverse in vias:
+                legs = [self.query(departure.code, via_code, day, route.hours, route.max_duration),
+                        self.query(via_code, arrival.code, day, route.hours, route.max_duration)]
+                planned_day['vias'].append({'via': via, 'legs': legs, 'reverse': reverse})
+            planned_days.append(planned_day)
+        return planned_days
+
+    def fetch(self, keys: [tuple]) -> None:
+        """
+        Fetch all segments not fetched yet, through one executor sharing the rate limiter
+        """
+        keys = [key for key in dict.fromkeys(keys) if key not in self.results]
+        quiet_opts = PromptOptions(verbosity=self.prompt_opts.verbosity, quiet=True)
+
+        def fetch_one(key):
+            dpt_code, arr_code, day, hours, max_duration = self.queries[key]
+            return get_cached_seats(dpt_code, arr_code, day, SearchOptions(max_duration=max_duration, hours=hours),
+                                    quiet_opts)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for key, proposals in zip(keys, executor.map(fetch_one, keys)):
+                self.results[key] = proposals
+        if not self.prompt_opts.quiet:
+            print(f'{len(keys)} segments fetched, {len(self.results)}/{len(self.queries)} planned segments done')
+
+    def run(self) -> dict[str, dict]:
+        """
+        Plan and fetch all routes
+        :return: results by route name
+        """
+        plans = {route.name: (route, self.plan_route(route)) for route in self.routes}
+        if not self.prompt_opts.quiet:
+            print(f'{len(self.queries)} distinct segments planned for {len(self.routes)} routes')
+
+        # First pass: direct journeys and longest segment of each via
+        first_keys = []
+        for _, planned_days in plans.values():
+            for planned_day in planned_days:
+                first_keys.append(planned_day['direct'])
+                first_keys.extend(via['legs'][1 if via['reverse'] else 0] for via in planned_day['vias'])
+        self.fetch(first_keys)
+
+        # Second pass: the other segment, only where the longest one has seats
+        second_keys = []
+        for _, planned_days in plans.values():
+            for planned_day in planned_days:
+                for via in planned_day['vias']:
+                    first, second = reversed(via['legs']) if via['reverse'] else via['legs']
+                    if self.results[first]:
+                        second_keys.append(second)
+        self.fetch(second_keys)
+
+        return {name: self.route_results(route, planned_days) for name, (route, planned_days) in plans.items()}
+
+    def route_results(self, route: BatchRoute, planned_days: [dict]) -> dict:
+        """
+        Assemble results of a route from fetched segments
+        :return: JSON serializable dict of the route results
+        """
+        days = []
+        for planned_day in planned_days:
+            indirect = []
+            for via in planned_day['vias']:
+                if all(leg in self.results for leg in via['legs']):
+                    connections = MultipleProposals.join(*(self.results[leg] for leg in via['legs']))
+                    if connections:
+                        indirect.append({'via': via['via'].name,
+                                         'connections': [connection.to_dict() for connection in connections]})
+            days.append({'date': planned_day['day'].date().isoformat(),
+                         'direct': [proposal.to_dict() for proposal in self.results[planned_day['direct']]],
+                         'indirect': indirect})
+        return {'origin': route.origin, 'destination': route.destination, 'days': days}
+
+    @staticmethod
+    def write(results: dict[str, dict], output_dir: str) -> None:
+        """
+        Write results of each route in its own JSON file
+        """
+        makedirs(output_dir, exist_ok=True)
+        for name, result in results.items():
+            with open(join(output_dir, name + '.json'), 'w', encoding='utf-8') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+            direct_count = sum(len(day['direct']) for day in result['days'])
+            indirect_count = sum(len(via['connections']) for day in result['days'] for via in day['indirect'])
+            print(f'{name}: {direct_count} direct and {indirect_count} indirect proposals')
@@ -0,0 +1,73 @@
+"""
+Micro-benchmarks of the columnar proposals (requires numpy) against the Proposal objects path,
+on the same synthetic payloads as bench_hot_paths
+
+Not collected by a plain pytest run (bench_ prefix), run from the repository root (requires pytest-benchmark):
+    python -m pytest benchmarks/bench_batch_paths.py --benchmark-only --benchmark-group-by=func,param:size
+"""
+import pytest
+
+from benchmarks.payloads import proposals, segment
+from multiple_proposals import MultipleProposals
+from proposal import Proposal
+from proposal_batch import ProposalBatch
+
+pytest.importorskip('pytest_benchmark')
+pytest.importorskip('numpy')
+
+SIZES = [100, 1000, 10000]
+PATHS = ['objects', 'batch']
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_batch_conversion(benchmark, size):
+    """
+    ProposalBatch.from_proposals then to_proposals, the cost of switching between both paths
+    """
+    payload = proposals(size)
+    result = benchmark(lambda: ProposalBatch.from_proposals(payload).to_proposals())
+    assert len(result) == size
+
+
+@pytest.mark.parametrize('path', PATHS)
+@pytest.mark.parametrize('size', SIZES)
+def test_batch_remove_duplicates(benchmark, size, path):
+    """
+    Removing duplicates of overlapping pages
+    """
+    payload = proposals(size)
+    if path == 'objects':
+        result = benchmark(Proposal.remove_duplicates, payload)
+    else:
+        result = benchmark(ProposalBatch.from_proposals(payload).remove_duplicates)
+    assert len(result) < size
+
+
+@pytest.mark.parametrize('path', PATHS)
+@pytest.mark.parametrize('size', SIZES)
+def test_batch_seats_filter(benchmark, size, path):
+    """
+    Keeping proposals departing in the morning with at least 3 seats
+    """
+    payload = segment('Paris', 'Lyon', size, 6)
+    if path == 'objects':
+        result = benchmark(lambda: [proposal for proposal in payload if 6 <= proposal.departure_date.hour < 12
+                                    and proposal.get_remaining_seats() >= 3])
+    else:
+        result = benchmark(ProposalBatch.from_proposals(payload).where, (6, 12), None, 3)
+    assert len(result)
+
+
+@pytest.mark.parametrize('path', PATHS)
+@pytest.mark.parametrize('size', [10, 100, 500])
+def test_batch_join(benchmark, size, path):
+    """
+    Indexes of the connections between two segments with size proposals each
+    """
+    first, second = segment('Beziers', 'Nimes', size, 6), segment('Nimes', 'Paris', size, 8)
+    if path == 'objects':
+        result = benchmark(MultipleProposals.join, first, second)
+    else:
+        result = benchmark(ProposalBatch.join, ProposalBatch.from_proposals(first),
+                           ProposalBatch.from_proposals(second))[0]
+    assert len(result)
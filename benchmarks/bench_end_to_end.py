@@ -0,0 +1,38 @@
+"""
+End-to-end benchmark of searches against the offline emulator, without network
+
+Run from the repository root: python -m benchmarks.bench_end_to_end [latency] [days]
+"""
+import sys
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from api import search
+from emulator import Emulator, use_emulator
+from metrics import metrics
+from options import SearchOptions
+
+ROUTES = [('Paris', 'Lyon'), ('Beziers', 'Paris'), ('Nantes', 'Marseille'), ('Lille', 'Strasbourg')]
+
+
+def main(latency: float = 0.05, days: int = 2) -> None:
+    """
+    Search every route, direct and indirect, with the same timetables on every run
+    """
+    server = Emulator(latency=latency, seed=1).start()
+    use_emulator(f'http://127.0.0.1:{server.server_port}')
+    first_day = datetime.now() + timedelta(days=1)
+    print(f'{len(ROUTES)} routes x {days} days, emulated latency {latency} s')
+    for origin, destination in ROUTES:
+        start = perf_counter()
+        result = search(origin, destination, [first_day + timedelta(days=day) for day in range(days)],
+                        SearchOptions(max_duration=600))
+        connections = sum(len(connections) for day in result.days for connections in day.indirect.values())
+        print(f'{origin + " - " + destination:<24} {perf_counter() - start:7.3f} s'
+              f'  {sum(len(day.direct) for day in result.days):4} direct  {connections:5} connections')
+    metrics.print()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.05, int(sys.argv[2]) if len(sys.argv) > 2 else 2)
@@ -0,0 +1,108 @@
+"""
+Micro-benchmarks of parsing, filtering, deduplicating and joining proposals, and of statistics
+
+Not collected by a plain pytest run (bench_ prefix), run from the repository root (requires pytest-benchmark):
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-only
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-only --benchmark-autosave   # keep a baseline
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-only --benchmark-compare    # compare with it
+"""
+import pytest
+
+from benchmarks.payloads import (itinerary_proposals, intercites_de_nuit_offers, proposals, segment,
+                                 DirectDestinationsResponse, passed_trips)
+from direct_destination import DirectDestination
+from multiple_proposals import MultipleProposals
+from proposal import Proposal
+from station import Station
+from trips_statistics import Statistics
+
+pytest.importorskip('pytest_benchmark')
+
+SIZES = [100, 1000, 10000]
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_parse_proposal(benchmark, size):
+    """
+    Proposal.parse_proposal on every JSON proposal
+    """
+    payload = itinerary_proposals(size)
+    result = benchmark(lambda: [Proposal.parse_proposal(proposal) for proposal in payload])
+    assert len(result) == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_filter(benchmark, size):
+    """
+    Proposal.filter of a whole day of JSON proposals
+    """
+    payload = itinerary_proposals(size)
+    result = benchmark(Proposal.filter, payload, 600)
+    assert 0 < len(result) < size
+
+
+@pytest.mark.parametrize('size', [10, 100, 1000])
+def test_parse_intercites_de_nuit(benchmark, size):
+    """
+    Proposal.parse_intercites_de_nuit of seats and berths offers
+    """
+    payload = intercites_de_nuit_offers(size)
+    result = benchmark(Proposal.parse_intercites_de_nuit, payload)
+    assert result
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_remove_duplicates(benchmark, size):
+    """
+    Proposal.remove_duplicates of overlapping pages
+    """
+    payload = proposals(size)
+    result = benchmark(Proposal.remove_duplicates, payload)
+    assert len(result) < size
+
+
+@pytest.mark.parametrize('size', [100, 1000, 5000])
+def test_direct_destination_parse(benchmark, size):
+    """
+    DirectDestination.parse of a direkt.bahn.guru response
+    """
+    response = DirectDestinationsResponse(size)
+    result = benchmark(DirectDestination.parse, Station('Paris', identifier='8796001'), response)
+    assert len(result.destinations) == size
+
+
+@pytest.mark.parametrize('size', [100, 1000, 5000])
+def test_get_common_stations(benchmark, size):
+    """
+    DirectDestination.get_common_stations of two stations sharing half of their destinations
+    """
+    departure = DirectDestination.parse(Station('Paris'), DirectDestinationsResponse(size))
+    arrival = DirectDestination.parse(Station('Lyon'), DirectDestinationsResponse(size, offset=size // 2))
+    result = benchmark(DirectDestination.get_common_stations, departure, arrival)
+    assert len(result) == size - size // 2
+
+
+@pytest.mark.parametrize('size', [10, 100, 500])
+def test_join(benchmark, size):
+    """
+    MultipleProposals.join of two segments with size proposals each
+    """
+    first, second = segment('Beziers', 'Nimes', size, 6), segment('Nimes', 'Paris', size, 8)
+    result = benchmark(MultipleProposals.join, first, second)
+    assert result
+
+
+@pytest.mark.parametrize('size', [100, 1000, 10000])
+def test_statistics_analyze(benchmark, size):
+    """
+    Statistics.analyze of passed trips, without requesting them
+    """
+    response = passed_trips(size)
+
+    def analyze():
+        statistics = Statistics.empty()
+        statistics.analyze(response['response']['passedTrips'])
+        return statistics
+
+    result = benchmark(analyze)
+    assert sum(result.frequented_stations.values()) == 2 * size
@@ -0,0 +1,61 @@
+"""
+Benchmark of output formats rendering 10k rows
+
+Run from the repository root: python -m benchmarks.bench_render [rows]
+"""
+import io
+import sys
+from datetime import datetime, timedelta
+from os import devnull
+from time import perf_counter
+
+from api import DayResult
+from proposal import Proposal, ProposalMetadata, console
+from renderers import JsonLinesRenderer, CsvRenderer, TableRenderer, ArrowRenderer
+from station import Station
+
+
+def make_result(rows: int) -> DayResult:
+    """
+    Returns a day with synthetic direct proposals
+    """
+    day = datetime(2030, 1, 10, 0, 0, 1)
+    departure, arrival = Station('Paris Gare de Lyon'), Station('Lyon Part Dieu')
+    proposals = [Proposal(120, day + timedelta(minutes=index), departure,
+                          day + timedelta(minutes=index + 120), arrival,
+                          ProposalMetadata('TGV INOUI', str(6000 + index), {'seats': index % 12}, 0))
+                 for index in range(rows)]
+    return DayResult(day, proposals)
+
+
+def bench(name: str, render) -> None:
+    """
+    Print the time spent by a render function
+    """
+    start = perf_counter()
+    render()
+    print(f'{name:<28} {perf_counter() - start:8.3f} s')
+
+
+def main(rows: int = 10000) -> None:
+    """
+    Compare the legacy row by row rich output with the new formats
+    """
+    result = make_result(rows)
+    print(f'Rendering {rows} rows')
+    with open(devnull, 'w', encoding='utf-8') as null:
+        legacy_file = console.file
+        console.file = null
+        bench('rich, row by row (legacy)', lambda: Proposal.display(result.direct))
+        console.file = legacy_file
+        bench('table, batched', lambda: TableRenderer(null).write_day(result))
+    bench('jsonl', lambda: JsonLinesRenderer(io.StringIO()).write_day(result))
+    bench('csv', lambda: CsvRenderer(io.StringIO()).write_day(result))
+    try:
+        bench('arrow', lambda: ArrowRenderer(io.BytesIO()).write_day(result))
+    except ImportError:
+        print('arrow                        skipped, pyarrow is not installed')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
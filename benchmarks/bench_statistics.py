@@ -0,0 +1,94 @@
+"""
+Benchmark of the peak memory and time of trips statistics, the whole response loaded at once
+or passed trips parsed one by one while the response is read, and of the --statistics path
+with a trips history: first run, next run without new trips and offline run
+
+Run from the repository root: python -m benchmarks.bench_statistics [trips]
+"""
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from os import path
+from time import perf_counter
+from unittest.mock import patch
+
+from benchmarks.payloads import passed_trips
+from trips_statistics import Statistics, TripHistory, TripsStream, ijson
+
+
+def bench(name: str, analyze) -> None:
+    """
+    Print the time spent and the memory peak of an analysis, measured on another run
+    because tracing memory slows allocations down
+    """
+    start = perf_counter()
+    statistics = analyze()
+    elapsed = perf_counter() - start
+    tracemalloc.start()
+    analyze()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<28} {elapsed:8.3f} s {peak / 2 ** 20:8.1f} MiB peak   {statistics.count} trips')
+
+
+def load_all(file_path: str) -> Statistics:
+    """
+    Statistics of the whole response loaded at once
+    """
+    with open(file_path, 'rb') as file:
+        response = json.load(file)
+    statistics = Statistics.empty()
+    statistics.analyze(response['response']['passedTrips'])
+    return statistics
+
+
+def stream(file_path: str) -> Statistics:
+    """
+    Statistics of the passed trips parsed one by one
+    """
+    statistics = Statistics.empty()
+    with TripsStream(open(file_path, 'rb')) as trips:  # pylint: disable=consider-using-with
+        statistics.analyze(trips)
+    return statistics
+
+
+def with_history(file_path: str, history_path: str, first: bool = False, offline: bool = False) -> Statistics:
+    """
+    Statistics of the --statistics path, requesting the trips of the response unless offline
+    """
+    if first and path.exists(history_path):
+        os.remove(history_path)
+
+    def fetch() -> TripsStream:
+        return TripsStream(open(file_path, 'rb'))  # pylint: disable=consider-using-with
+
+    with patch.object(Statistics, 'fetch', fetch):
+        return Statistics(TripHistory(history_path), offline)
+
+
+def main(count: int = 10000) -> None:
+    """
+    Compare both parses on histories of count / 10 and count trips
+    """
+    if ijson is None:
+        print('ijson is not installed, trips would be loaded at once')
+    with tempfile.TemporaryDirectory() as directory:
+        for trips in (count // 10, count):
+            file_path = path.join(directory, f'trips-{trips}.json')
+            with open(file_path, 'w', encoding='utf-8') as file:
+                json.dump(passed_trips(trips), file)
+            print(f'{trips} trips, {path.getsize(file_path) / 2 ** 20:.1f} MiB response')
+            bench('whole response', lambda: load_all(file_path))  # pylint: disable=cell-var-from-loop
+            bench('streamed', lambda: stream(file_path))  # pylint: disable=cell-var-from-loop
+            history_path = path.join(directory, f'history-{trips}.json')
+            # pylint: disable=cell-var-from-loop
+            bench('history, first run', lambda: with_history(file_path, history_path, first=True))
+            bench('history, no new trip', lambda: with_history(file_path, history_path))
+            bench('history, offline', lambda: with_history(file_path, history_path, offline=True))
+            print(f'{path.getsize(history_path) / 2 ** 20:.1f} MiB history')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,105 @@
+"""
+Synthetic payloads of scalable size for the benchmarks, deterministic for a given size
+"""
+from datetime import datetime, timedelta
+from random import Random
+
+from emulator import STATIONS, proposal_json, duration_label
+from proposal import Proposal, ProposalMetadata
+from station import Station
+
+DAY = datetime(2030, 1, 10)
+
+
+def itinerary_proposals(count: int) -> [dict]:
+    """
+    SNCF Connect JSON proposals: TGVmax seats, no TGVmax seat, paid and not bookable ones
+    """
+    random = Random(count)
+    proposals = []
+    for index in range(count):
+        kind = random.random()
+        proposals.append(proposal_json('Paris', 'Lyon', DAY + timedelta(minutes=index % 1000), 120,
+                                       seats=random.choice([1, 3, 8, 999]),
+                                       price=0 if kind < 0.6 else 99999 if kind < 0.8 else 45,
+                                       number=str(6000 + index % 4000), bookable=kind < 0.95))
+    return proposals
+
+
+def intercites_de_nuit_offers(count: int) -> [dict]:
+    """
+    Second class offers of an Intercites de Nuit proposal, seats and berths
+    """
+    random = Random(count)
+    return [{'priceLabel': random.choice(['0 €', '0,00 €', '19,00 €']),
+             'comfortClass': {'physicalSpaceLabel': random.choice(['seats', 'berths', 'berths 4', 'berths 6'])},
+             'messages': [{'message': random.choice(['Plus que 3 places', 'Plus que 1 place', 'Disponible'])}]}
+            for _ in range(count)]
+
+
+def proposals(count: int, duplicates: float = 0.3) -> [Proposal]:
+    """
+    Parsed proposals sorted by departure, with consecutive duplicates like overlapping pages
+    """
+    random = Random(count)
+    result = []
+    departure = DAY.replace(hour=5)
+    while len(result) < count:
+        proposal = Proposal(120, departure, Station('Paris'), departure + timedelta(minutes=120), Station('Lyon'),
+                            ProposalMetadata('TGV INOUI', str(random.randint(6000, 9999)), {'seats': 3}, 0))
+        result.append(proposal)
+        if random.random() < duplicates and len(result) < count:
+            result.append(proposal)
+        departure += timedelta(minutes=random.randint(1, 5))
+    return result
+
+
+def segment(departure: str, arrival: str, count: int, start_hour: int) -> [Proposal]:
+    """
+    Proposals of a segment, spread over the day from a start hour
+    """
+    return [Proposal(90, DAY.replace(hour=start_hour) + timedelta(minutes=index * 900 // max(count, 1)),
+                     Station(departure),
+                     DAY.replace(hour=start_hour) + timedelta(minutes=index * 900 // max(count, 1) + 90),
+                     Station(arrival),
+                     ProposalMetadata('TGV INOUI', str(6000 + index), {'seats': 3}, 0))
+            for index in range(count)]
+
+
+class DirectDestinationsResponse:
+    """
+    Stand-in of the direkt.bahn.guru response, with count destinations
+    """
+
+    def __init__(self, count: int, offset: int = 0):
+        self.destinations = [{'id': str(8700000 + offset + index), 'name': f'Station {offset + index}',
+                              'location': {'latitude': 43 + index % 700 / 100, 'longitude': index % 900 / 100},
+                              'duration': 30 + index % 300}
+                             for index in range(count)]
+
+    def json(self) -> list:
+        """
+        Returns the destinations like requests.Response.json
+        """
+        return self.destinations
+
+
+def passed_trips(count: int) -> dict:
+    """
+    SNCF Connect trips response, with delays on some trips
+    """
+    random = Random(count)
+    trips = []
+    for index in range(count):
+        origin, destination = random.sample(STATIONS, 2)
+        messages = [{'disruptionType': 'DISRUPTION_DELAYED',
+                     'title': random.choice(['Retard estimé à 15 min',
+                                             'Retard au départ de 5 min et 12 min à l’arrivée'])}] \
+            if random.random() < 0.3 else []
+        trips.append({'sortDate': (DAY - timedelta(days=index)).isoformat(), 'trip': {
+            'originLabel': origin[0], 'destinationLabel': destination[0],
+            'tripDetails': {'outwardJourney': {'priceLabel': '0,00 €'}},
+            'tripIv': {'disruptions': {'messages': messages}},
+            'duration': duration_label(random.randint(40, 400)),
+            'transportersRecapLabel': random.choice(['TGV INOUI', 'OUIGO', 'TER + correspondance'])}})
+    return {'response': {'passedTrips': trips}}
@@ -0,0 +1,111 @@
+"""
+Code related to the time and request budget of a best-effort search (--deadline, --max-requests)
+"""
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+
+from throttle import limiter
+
+logger = getLogger(__name__)
+
+
+class Budget:
+    """
+    Time and number of SNCF Connect requests a search may spend, first pages of planned searches
+    are kept in reserve so that further pages only use what they would not need
+    """
+    deadline: float
+    max_requests: int
+    requests: int
+    reserved: int
+    unexplored: [str]
+
+    def __init__(self, deadline: float = None, max_requests: int = None):
+        """
+        :param deadline: number of seconds from now, unlimited if None
+        :param max_requests: number of SNCF Connect requests, unlimited if None
+        """
+        self.deadline = deadline
+        self.max_requests = max_requests
+        self.requests = 0
+        self.reserved = 0
+        self.unexplored = []
+        self._started = monotonic()
+        self._lock = Lock()
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Number of seconds since the start of the search
+        """
+        return monotonic() - self._started
+
+    @property
+    def exhausted(self) -> bool:
+        """
+        True once no request can be sent anymore
+        """
+        return (self.max_requests is not None and self.requests >= self.max_requests
+                or self.deadline is not None and self.elapsed >= self.deadline)
+
+    def request_cost(self) -> float:
+        """
+        Returns the estimated number of seconds of a request, waiting for the rate limiter included
+        """
+        if self.requests:
+            return self.elapsed / self.requests
+        return (limiter.min_interval + limiter.max_interval) / 2
+
+    def reserve(self, count: int = 1) -> None:
+        """
+        Keep budget for the first page of planned searches
+        """
+        with self._lock:
+            self.reserved += count
+
+    def release(self, count: int = 1) -> None:
+        """
+        Give back the budget kept for planned searches which won't run
+        """
+        with self._lock:
+            self.reserved = max(0, self.reserved - count)
+
+    def spend(self, first_page: bool = True) -> bool:
+        """
+        Take a request from the budget
+        :param first_page: further pages are only allowed if the first pages of planned searches can still be sent
+        :return: False if the request must not be sent
+        """
+        with self._lock:
+            if self.exhausted:
+                return False
+            if first_page:
+                self.reserved = max(0, self.reserved - 1)
+            else:
+                if self.max_requests is not None and self.max_requests - self.requests <= self.reserved:
+                    return False
+                if self.deadline is not None and \
+                        self.deadline - self.elapsed <= (self.reserved + 1) * self.request_cost():
+                    return False
+            self.requests += 1
+            return True
+
+    def note(self, unexplored: str) -> None:
+        """
+        Remember a search or a part of a search which was not done
+        """
+        logger.info('Not explored: %s', unexplored)
+        with self._lock:
+            self.unexplored.append(unexplored)
+
+    def summary(self) -> str:
+        """
+        Returns what was spent
+        """
+        limits = []
+        if self.deadline is not None:
+            limits.append(f'{self.elapsed:.0f}/{self.deadline:.0f}s')
+        if self.max_requests is not None:
+            limits.append(f'{self.requests}/{self.max_requests} requests')
+        return ', '.join(limits)
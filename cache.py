@@ -0,0 +1,103 @@
+"""
+Code related to caches shared by all searches of the process
+"""
+from concurrent.futures import Future
+from threading import Lock
+from time import monotonic
+from typing import Callable
+
+
+class MemoryCache:
+    """
+    Thread-safe in-memory cache, with an optional time-to-live for entries
+    """
+    ttl: float
+    hits: int
+    misses: int
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl
+        self.hits = 0  # calls of get_or_compute answered without computing
+        self.misses = 0
+        self._entries = {}
+        self._pending = {}
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for a key if it is not expired
+        """
+        with self._lock:
+            if key not in self._entries:
+                return default
+            stored_at, value = self._entries[key]
+            if self.ttl is not None and monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key, value) -> None:
+        """
+        Store a value for a key
+        """
+        with self._lock:
+            self._entries[key] = (monotonic(), value)
+
+    def get_or_compute(self, key, compute: Callable):
+        """
+        Returns the value stored for a key, computing and storing it if missing.
+        Concurrent calls for the same missing key wait for the first one instead of computing it again
+        :param key: cache key
+        :param compute: function without argument returning the value
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            with self._lock:
+                self.hits += 1
+            return value
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if pending is not None:
+            return pending.result()
+
+        try:
+            value = compute()
+        except BaseException as error:
+            with self._lock:
+                self._pending.pop(key).set_exception(error)
+            raise
+        self.set(key, value)
+        with self._lock:
+            self._pending.pop(key).set_result(value)
+        return value
+
+    def items(self) -> list:
+        """
+        Returns all (key, value) pairs stored, including expired ones
+        """
+        with self._lock:
+            return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def __contains__(self, key):
+        missing = object()
+        return self.get(key, missing) is not missing
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Station lookups don't change during a run, they are shared by all searches
+station_codes = MemoryCache()  # station name -> (code, formal name) from SNCF Connect autocomplete
+station_identifiers = MemoryCache()  # station name -> UIC identifier from HAFAS
+station_coordinates = MemoryCache()  # station name -> (latitude, longitude) from HAFAS
+direct_destinations = MemoryCache()  # UIC identifier -> DirectDestination from direkt.bahn.guru
+# Timetables change rarely, but a long-running service must see new ones
+timetables = MemoryCache(ttl=6 * 3600)  # (departure UIC, arrival UIC, day, hours) -> [(departure, arrival)] from HAFAS
+# Search results expire quickly because seats availability changes
+segments = MemoryCache(ttl=300)  # (departure code, arrival code, day, hours, max duration) -> [Proposal]
@@ -25,6 +25,10 @@ class AppConfig:
     """
 
     SNCFCONNECT_COOKIE: str
+    # Base URLs of the services, they can point to the offline emulator (main.py emulate)
+    SNCFCONNECT_URL: str = 'https://www.sncf-connect.com'
+    DIREKT_BAHN_GURU_URL: str = 'https://api.direkt.bahn.guru'
+    HAFAS_URL: str = 'https://reiseauskunft.bahn.de/bin/mgate.exe'
 
     """
     Map environment variables to class fields according to these rules:
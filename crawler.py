@@ -0,0 +1,233 @@
+"""
+Code related to the corridor crawler, refreshing continuously the availability of hub corridors
+"""
+import csv
+import sqlite3
+from datetime import datetime, timedelta
+from multiprocessing import Process
+from os import getpid
+from time import sleep, time
+
+from options import SearchOptions, PromptOptions
+from search import get_available_seats, recorders
+from snapshot_store import SnapshotStore
+from station import Station
+from throttle import limiter
+
+# (origin, destination, demand weight), searched in both directions
+HUB_CORRIDORS = [
+    ('Paris', 'Lyon', 3), ('Paris', 'Marseille', 3), ('Paris', 'Bordeaux', 3),
+    ('Paris', 'Lille', 2), ('Paris', 'Rennes', 2), ('Paris', 'Nantes', 2),
+    ('Paris', 'Strasbourg', 2), ('Paris', 'Montpellier', 2), ('Paris', 'Nice', 1),
+    ('Lyon', 'Marseille', 1), ('Lyon', 'Lille', 1), ('Bordeaux', 'Toulouse', 1),
+]
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_queue (
+    id INTEGER PRIMARY KEY,
+    dpt_code TEXT NOT NULL,
+    arr_code TEXT NOT NULL,
+    day TEXT NOT NULL,
+    demand REAL NOT NULL,
+    priority REAL NOT NULL,
+    next_due REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    last_done REAL,
+    UNIQUE (dpt_code, arr_code, day)
+);
+CREATE INDEX IF NOT EXISTS crawl_queue_due ON crawl_queue (next_due, priority);
+"""
+
+
+class Corridor:
+    """
+    Corridor between two hubs, with a demand weight
+    """
+    origin: str
+    destination: str
+    demand: float
+
+    def __init__(self, origin, destination, demand=1.0):
+        self.origin = origin
+        self.destination = destination
+        self.demand = float(demand)
+
+
+def load_corridors(path: str = None) -> [Corridor]:
+    """
+    Load corridors from a CSV file with origin, destination and demand columns,
+    or use default hub corridors in both directions
+    """
+    if path is None:
+        return [Corridor(origin, destination, demand)
+                for hub_1, hub_2, demand in HUB_CORRIDORS
+                for origin, destination in ((hub_1, hub_2), (hub_2, hub_1))]
+    with open(path, encoding='utf-8') as file:
+        return [Corridor(row['origin'], row['destination'], row.get('demand') or 1)
+                for row in csv.DictReader(file)]
+
+
+def priority(demand: float, days_ahead: int) -> float:
+    """
+    Returns the priority of a (corridor, day) work item, near dates and high demand first
+    """
+    return demand / (1 + days_ahead)
+
+
+def refresh_interval(days_ahead: int) -> float:
+    """
+    Returns the number of seconds before a (corridor, day) needs to be searched again,
+    from 15 minutes for tomorrow to a few hours for dates one month ahead
+    """
+    return 900 * (1 + days_ahead / 3)
+
+
+class WorkQueue:
+    """
+    Work queue shared by crawler processes through a SQLite database, items are leased to one worker at a time
+    """
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(QUEUE_SCHEMA)
+
+    def seed(self, routes: [tuple], days: int, today: datetime = None) -> None:
+        """
+        Add the next days of every route to the queue and update priorities, past days are removed
+        :param routes: tuples (departure code, arrival code, demand)
+        :param days: number of days to crawl from today
+        :param today: first day to crawl
+        """
+        today = (today or datetime.now()).date()
+        self.connection.execute('BEGIN IMMEDIATE')
+        self.connection.execute('DELETE FROM crawl_queue WHERE day < ?', (today.isoformat(),))
+        self.connection.executemany(
+            """
+            INSERT INTO crawl_queue (dpt_code, arr_code, day, demand, priority) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (dpt_code, arr_code, day) DO UPDATE SET demand = excluded.demand, priority = excluded.priority
+            """,
+            [(dpt_code, arr_code, (today + timedelta(days=days_ahead)).isoformat(), demand,
+              priority(demand, days_ahead))
+             for dpt_code, arr_code, demand in routes
+             for days_ahead in range(days)])
+        self.connection.execute('COMMIT')
+
+    def claim(self, owner: str, lease_seconds: float = 600) -> tuple or None:
+        """
+        Lease the due item with the highest priority
+        :param owner: worker name
+        :param lease_seconds: the item goes back to the queue if not completed before
+        :return: tuple (id, departure code, arrival code, day) or None if nothing is due
+        """
+        now = time()
+        self.connection.execute('BEGIN IMMEDIATE')
+        row = self.connection.execute(
+            """
+            SELECT id, dpt_code, arr_code, day FROM crawl_queue
+            WHERE next_due <= ? AND lease_expires <= ?
+            ORDER BY priority DESC, next_due LIMIT 1
+            """, (now, now)).fetchone()
+        if row:
+            self.connection.execute('UPDATE crawl_queue SET lease_owner = ?, lease_expires = ? WHERE id = ?',
+                                    (owner, now + lease_seconds, row[0]))
+        self.connection.execute('COMMIT')
+        return row
+
+    def complete(self, item_id: int, day: str) -> None:
+        """
+        Release an item searched successfully and schedule its next refresh
+        """
+        now = time()
+        days_ahead = max(0, (datetime.fromisoformat(day).date() - datetime.now().date()).days)
+        self.connection.execute(
+            'UPDATE crawl_queue SET lease_owner = NULL, lease_expires = 0, last_done = ?, next_due = ? WHERE id = ?',
+            (now, now + refresh_interval(days_ahead), item_id))
+
+    def release(self, item_id: int, retry_after: float = 300) -> None:
+        """
+        Release an item which failed, it will be retried later
+        """
+        self.connection.execute(
+            'UPDATE crawl_queue SET lease_owner = NULL, lease_expires = 0, next_due = ? WHERE id = ?',
+            (time() + retry_after, item_id))
+
+    def close(self) -> None:
+        """
+        Close the database connection
+        """
+        self.connection.close()
+
+
+def work(queue_path: str, store_path: str, request_interval: float) -> None:
+    """
+    Worker process loop: claim an item, search it with the CLI search path and store the results
+    :param queue_path: path of the work queue database
+    :param store_path: path of the snapshot store
+    :param request_interval: minimum number of seconds between two requests of this worker
+    """
+    owner = f'worker-{getpid()}'
+    limiter.min_interval = max(limiter.min_interval, request_interval)
+    limiter.max_interval = max(limiter.max_interval, request_interval * 1.25)
+    recorders.append(SnapshotStore(store_path))
+    queue = WorkQueue(queue_path)
+    search_opts = SearchOptions(max_duration=600)
+    prompt_opts = PromptOptions(quiet=True)
+    while True:
+        item = queue.claim(owner)
+        if item is None:
+            sleep(30)
+            continue
+        item_id, dpt_code, arr_code, day = item
+        try:
+            proposals = get_available_seats(dpt_code, arr_code,
+                                            datetime.fromisoformat(day).replace(second=1),
+                                            search_opts, prompt_opts)
+        except Exception as error:  # pylint: disable=broad-except
+            print(f'{owner} {dpt_code}-{arr_code} {day} failed: {error}')
+            queue.release(item_id)
+            continue
+        queue.complete(item_id, day)
+        print(f'{owner} {dpt_code}-{arr_code} {day}: {len(proposals)} proposals')
+
+
+def crawl(corridors: [Corridor], days: int, budget: int, workers: int, store_path: str,
+          queue_path: str = None) -> None:
+    """
+    Crawl corridors forever with several worker processes
+    :param corridors: corridors to crawl
+    :param days: number of days to crawl from today
+    :param budget: maximum number of requests per hour, shared by all workers
+    :param workers: number of worker processes
+    :param store_path: path of the snapshot store where results are written
+    :param queue_path: path of the work queue database, the snapshot store by default
+    """
+    queue_path = queue_path or store_path
+    routes = []
+    for corridor in corridors:
+        departure = Station(corridor.origin)
+        departure.get_code()
+        arrival = Station(corridor.destination)
+        arrival.get_code()
+        routes.append((departure.code, arrival.code, corridor.demand))
+    queue = WorkQueue(queue_path)
+    queue.seed(routes, days)
+    print(f'{len(routes)} corridors x {days} days queued, {budget} requests per hour with {workers} workers')
+
+    # every worker has its share of the hourly budget
+    request_interval = 3600 * workers / budget
+    processes = [Process(target=work, args=(queue_path, store_path, request_interval), daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        while True:
+            sleep(3600)
+            queue.seed(routes, days)  # days ahead and priorities change with the date
+    finally:
+        for process in processes:
+            process.terminate()
+        queue.close()
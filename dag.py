@@ -0,0 +1,143 @@
+"""
+Code related to the execution of a search as a graph of dependent tasks
+"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from heapq import heappush, heappop
+from itertools import count
+from logging import getLogger
+from typing import Callable, Iterator
+
+logger = getLogger(__name__)
+
+
+class Task:
+    """
+    Task of a graph, run once all tasks it needs are done with a non-empty result
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    SKIPPED = 'skipped'
+    CANCELLED = 'cancelled'
+    FAILED = 'failed'
+
+    name: str
+    function: Callable
+    needs: ['Task']
+    rank: tuple
+    state: str
+    result: any
+    reason: str
+
+    def __init__(self, name, function, needs=(), rank=(), **details):
+        """
+        :param name: description of the task, used in reports
+        :param function: called with the results of the needed tasks, in order
+        :param needs: tasks which must return a non-empty result before this one runs
+        :param rank: tasks with the lowest rank run first among ready tasks
+        :param details: attributes kept on the task, like the day it belongs to
+        """
+        self.name = name
+        self.function = function
+        self.needs = list(needs)
+        self.rank = rank
+        self.state = Task.PENDING
+        self.result = None
+        self.reason = None
+        self.details = details
+
+    def __repr__(self):
+        return f'Task({self.name}, {self.state})'
+
+
+class TaskGraph:
+    """
+    Run tasks by rank as soon as the tasks they need are done, independent tasks at the same time,
+    and skip tasks which need an empty result
+    """
+    tasks: [Task]
+
+    def __init__(self):
+        self.tasks = []
+
+    def add(self, name: str, function: Callable, needs=(), rank=(), **details) -> Task:
+        """
+        Add a task to the graph, see Task
+        """
+        task = Task(name, function, needs, rank, **details)
+        self.tasks.append(task)
+        return task
+
+    @property
+    def skipped(self) -> [Task]:
+        """
+        Tasks not run because a task they need returned an empty result
+        """
+        return [task for task in self.tasks if task.state == Task.SKIPPED]
+
+    @property
+    def cancelled(self) -> [Task]:
+        """
+        Tasks not run because the graph was stopped before them
+        """
+        return [task for task in self.tasks if task.state == Task.CANCELLED]
+
+    def run(self, workers: int = 1, stop: Callable[[Task], bool] = None) -> Iterator[Task]:
+        """
+        Run the graph, yielding tasks as soon as they are done, skipped or cancelled
+        :param workers: number of tasks run at the same time
+        :param stop: called with each ready task before it runs, the task and its dependents are cancelled
+        if it returns True
+        :raise: the error of the first failed task, once running tasks are finished; pending ones are not run
+        """
+        dependents = {id(task): [] for task in self.tasks}
+        waiting = {}
+        for task in self.tasks:
+            waiting[id(task)] = len(task.needs)
+            for need in task.needs:
+                dependents[id(need)].append(task)
+        ready = []
+        order = count()  # tasks of the same rank run in insertion order
+        for task in self.tasks:
+            if not task.needs:
+                heappush(ready, (task.rank, next(order), task))
+
+        def skip(task: Task, reason: str, state: str = Task.SKIPPED) -> Iterator[Task]:
+            task.state, task.reason = state, reason
+            logger.info('%s %s: %s', task.name, state, reason)
+            yield task
+            for dependent in dependents[id(task)]:
+                if dependent.state == Task.PENDING:
+                    yield from skip(dependent, f'{task.name} was {state}', state)
+
+        error = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = {}
+            while ready or running:
+                while ready and len(running) < workers and error is None:
+                    _, _, task = heappop(ready)
+                    if stop is not None and stop(task):
+                        yield from skip(task, 'stopped', Task.CANCELLED)
+                        continue
+                    running[executor.submit(task.function, *(need.result for need in task.needs))] = task
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    if future.exception() is not None:
+                        task.state = Task.FAILED
+                        error = error or future.exception()
+                        continue
+                    task.state, task.result = Task.DONE, future.result()
+                    yield task
+                    for dependent in dependents[id(task)]:
+                        if dependent.state != Task.PENDING:
+                            continue
+                        if not task.result:
+                            yield from skip(dependent, f'{task.name} is empty')
+                            continue
+                        waiting[id(dependent)] -= 1
+                        if waiting[id(dependent)] == 0:
+                            heappush(ready, (dependent.rank, next(order), dependent))
+        if error is not None:
+            raise error
@@ -1,9 +1,11 @@
 """
 Code related to direct destinations accessible from train station
 """
-from operator import itemgetter
-from requests import get, Response as ReqResponse
+from requests import Response as ReqResponse
 
+from cache import direct_destinations
+from config import Config
+from session import session
 from station import Station
 
 
@@ -50,21 +52,25 @@ class DirectDestination:
 
         destinations_keys = set(departure_direct_destinations.destinations.keys()).intersection(
             arrival_direct_destinations.destinations.keys())
-        destinations = list(itemgetter(*destinations_keys)(
-            departure_direct_destinations.destinations | arrival_direct_destinations.destinations))
-
-        print(len(destinations), 'intermediate stations available')
-
-        return destinations
+        all_destinations = departure_direct_destinations.destinations | arrival_direct_destinations.destinations
+        return [all_destinations[key] for key in destinations_keys]
 
     @staticmethod
     def get(departure: Station):
         """
-        Returns the direct destinations of a given station.
+        Returns the direct destinations of a given station, downloaded once per process.
+        """
+        destinations = direct_destinations.get_or_compute(departure.identifier,
+                                                          lambda: DirectDestination.fetch(departure))
+        return DirectDestination(departure, destinations.destinations)
+
+    @staticmethod
+    def fetch(departure: Station):
+        """
+        Request the direct destinations of a given station to direkt.bahn.guru API.
         """
-        response = get('https://api.direkt.bahn.guru/' + departure.identifier, timeout=15)
+        response = session.get(Config.DIREKT_BAHN_GURU_URL + '/' + departure.identifier, timeout=15)
         if response.status_code != 200:
-            print()
             raise ValueError(f'{departure.name} identifier not found is UIC database.'
                             ' Maybe you should use local station name, like Ventimiglia (IT)'
                             ' instead of Vintimille (FR) ?')
@@ -0,0 +1,412 @@
+"""
+Code related to the offline emulator of SNCF Connect, direkt.bahn.guru and HAFAS,
+serving recorded or synthetic responses for reproducible end-to-end runs and benchmarks
+"""
+import json
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from os import path as os_path
+from random import Random
+from threading import Thread
+from time import sleep
+from urllib.parse import urlparse
+
+from config import Config
+from proposal import Proposal
+from station import client, great_circle_distance
+from throttle import limiter
+
+# name, SNCF Connect code, UIC identifier, latitude, longitude
+STATIONS = [
+    ('Paris', 'FRPAR', '8796001', 48.856614, 2.352222),
+    ('Lyon', 'FRLYS', '8772319', 45.760540, 4.859700),
+    ('Marseille', 'FRMSC', '8775100', 43.302800, 5.380600),
+    ('Bordeaux', 'FRBOJ', '8758100', 44.825900, -0.556200),
+    ('Lille', 'FRLLE', '8722326', 50.638600, 3.075600),
+    ('Nantes', 'FRNTE', '8748100', 47.217300, -1.542300),
+    ('Rennes', 'FRRNS', '8741100', 48.103500, -1.672200),
+    ('Strasbourg', 'FRSXB', '8721202', 48.585000, 7.734600),
+    ('Montpellier', 'FRMPL', '8777300', 43.604500, 3.880600),
+    ('Nice', 'FRNIC', '8775605', 43.704600, 7.261900),
+    ('Toulouse', 'FRTLS', '8761100', 43.611200, 1.453700),
+    ('Nimes', 'FRFNI', '8777500', 43.832700, 4.366000),
+    ('Avignon TGV', 'FRAVG', '8731896', 43.921700, 4.786000),
+    ('Dijon', 'FRDIJ', '8771300', 47.323400, 5.027200),
+    ('Beziers', 'FRBZR', '8778100', 43.336400, 3.218700),
+]
+
+MAX_DIRECT_DISTANCE = 750  # km, farther stations have no direct train
+SPEED = 200  # km/h, average speed of a high speed train including stops
+
+
+def distance(station_1: tuple, station_2: tuple) -> float:
+    """
+    Returns the great-circle distance between two stations of STATIONS, in km
+    """
+    return great_circle_distance(station_1[3:5], station_2[3:5])
+
+
+def travel_duration(station_1: tuple, station_2: tuple) -> int or None:
+    """
+    Returns the duration in minutes of a direct train between two stations, None if there is none
+    """
+    km = distance(station_1, station_2)
+    if station_1 == station_2 or km > MAX_DIRECT_DISTANCE:
+        return None
+    return int(km / SPEED * 60) + 10
+
+
+def find_station(term: str) -> tuple or None:
+    """
+    Returns the first station of STATIONS matching a searched name
+    """
+    term = term.lower().strip()
+    for station in STATIONS:
+        if station[0].lower().startswith(term) or term.startswith(station[0].lower()):
+            return station
+    return None
+
+
+def location(station: tuple) -> dict:
+    """
+    Returns a station of STATIONS as a HAFAS location
+    """
+    return {'lid': f'A=1@O={station[0]}@X={int(station[4] * 1e6)}@Y={int(station[3] * 1e6)}@L={station[2]}@',
+            'name': station[0], 'crd': {'x': int(station[4] * 1e6), 'y': int(station[3] * 1e6)}}
+
+
+def duration_label(minutes: int) -> str:
+    """
+    Returns a duration as labelled by SNCF Connect, like 2h01 or 58 min
+    """
+    return f'{minutes // 60}h{minutes % 60:02d}' if minutes >= 60 else f'{minutes} min'
+
+
+def proposal_json(departure: str, arrival: str, dpt_date: datetime, duration: int, seats: int = 999,
+                  price: int = 0, transporter: str = 'TGV INOUI', number: str = '6601', bookable: bool = True) -> dict:
+    """
+    Returns a proposal of the SNCF Connect itineraries API, with the fields read by Proposal.parse_proposal
+    :param departure: name of departure station
+    :param arrival: name of arrival station
+    :param dpt_date: departure date
+    :param duration: duration in minutes
+    :param seats: remaining seats at this price, 999 for more than 10
+    :param price: best price, 0 with TGVmax and 99999 when no seat is available
+    :param transporter: transporter description
+    :param number: vehicle number
+    :param bookable: whether the proposal can be booked
+    """
+    arr_date = dpt_date + timedelta(minutes=duration)
+    proposal = {
+        'travelId': f"{dpt_date.strftime('%Y-%m-%dT%H:%M')}_{number}",
+        'durationLabel': duration_label(duration),
+        'bestPriceLabel': f'{price} €',
+        'departure': {'dateLabel': 'Aller : ' + dpt_date.strftime('%a %d %b'),
+                      'timeLabel': dpt_date.strftime('%H:%M'), 'originStationLabel': departure},
+        'arrival': {'dateLabel': 'Arrivée : ' + arr_date.strftime('%a %d %b'),
+                    'timeLabel': arr_date.strftime('%H:%M'), 'destinationStationLabel': arrival},
+        'secondComfortClassOffers': {'offers': []},
+        'timeline': {'segments': [{'transporter': {'description': transporter, 'number': number}}]},
+        'status': {'isBookable': bookable},
+    }
+    if seats < 10:
+        proposal['bestPriceRemainingSeatsLabel'] = f'{seats} places à ce prix'
+    return proposal
+
+
+class Emulator:
+    """
+    Synthetic responses of the services, deterministic for a given seed, with injectable latency and faults
+    """
+    latency: float
+    error_rate: float
+    captcha_rate: float
+    page_size: int
+    seed: int
+    recordings: str
+
+    def __init__(self, latency=0.0, error_rate=0.0, captcha_rate=0.0, page_size=5, seed=0, recordings=None):
+        """
+        :param latency: mean delay of a response in seconds, each response waits between 0.5 and 1.5 times it
+        :param error_rate: probability of an HTTP 503 response
+        :param captcha_rate: probability of an HTTP 403 captcha response from SNCF Connect
+        :param page_size: number of proposals per page of itineraries
+        :param seed: seed of synthetic timetables and faults
+        :param recordings: directory of recorded responses, served instead of synthetic ones when they exist,
+            as <recordings>/<endpoint>/<key>.json (see recorded)
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.captcha_rate = captcha_rate
+        self.page_size = page_size
+        self.seed = seed
+        self.recordings = recordings
+        self.faults = Random(seed)
+
+    def recorded(self, endpoint: str, key: str):
+        """
+        Returns the recorded response of a request, or None
+        :param endpoint: itineraries, autocomplete, trips, direct_destinations or hafas
+        :param key: ORIGIN_DESTINATION_YYYY-MM-DDTHHMM for itineraries and hafas trips (UIC identifiers),
+            the search term for autocomplete and hafas locations, the UIC identifier for direct_destinations,
+            'trips' for trips
+        """
+        if self.recordings is None:
+            return None
+        file_path = os_path.join(self.recordings, endpoint, key + '.json')
+        if not os_path.exists(file_path):
+            return None
+        with open(file_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def fault(self, sncf_connect: bool, base_url: str = '') -> tuple or None:
+        """
+        Returns an injected (status, body) fault, or None
+        :param sncf_connect: whether the request is sent to SNCF Connect, which answers with captchas
+        :param base_url: URL of the emulator, to build the captcha URL
+        """
+        draw = self.faults.random()
+        if draw < self.error_rate:
+            return 503, {'error': 'Service unavailable (emulated)'}
+        if sncf_connect and draw < self.error_rate + self.captcha_rate:
+            return 403, {'url': base_url + '/captcha'}
+        return None
+
+    def timetable(self, origin: tuple, destination: tuple, day: datetime) -> [dict]:
+        """
+        Returns all proposals of a day between two stations, the same ones for every request
+        """
+        duration = travel_duration(origin, destination)
+        if duration is None:
+            return []
+        random = Random(f'{self.seed}-{origin[1]}-{destination[1]}-{day.date()}')
+        proposals = []
+        departure = day.replace(hour=6, minute=0, second=0, microsecond=0) + timedelta(minutes=random.randint(0, 59))
+        while departure.hour < 22 and departure.date() == day.date():
+            tgvmax = random.random() < 0.6
+            proposals.append(proposal_json(origin[0], destination[0], departure, duration + random.randint(-5, 5),
+                                           seats=random.choice([1, 2, 3, 5, 8, 999, 999]) if tgvmax else 999,
+                                           price=0 if tgvmax else 99999,
+                                           number=str(random.randint(6000, 9999))))
+            departure += timedelta(minutes=random.choice([30, 45, 60, 60, 90, 120]))
+        return proposals
+
+    def itineraries(self, body: dict) -> dict:
+        """
+        Page of proposals departing from the requested date, changeDay is set on the last page of the day
+        """
+        origin_code = body['mainJourney']['origin']['id'].split('_')[-1]
+        destination_code = body['mainJourney']['destination']['id'].split('_')[-1]
+        date = datetime.strptime(body['schedule']['outward']['date'][:19], '%Y-%m-%dT%H:%M:%S')
+        recorded = self.recorded('itineraries', f"{origin_code}_{destination_code}_{date.strftime('%Y-%m-%dT%H%M')}")
+        if recorded is not None:
+            return recorded
+        stations = {station[1]: station for station in STATIONS}
+        if origin_code not in stations or destination_code not in stations:
+            return {'longDistance': None}
+        proposals = [proposal for proposal in self.timetable(stations[origin_code], stations[destination_code], date)
+                     if proposal['travelId'][:16] >= date.strftime('%Y-%m-%dT%H:%M')]
+        return {'longDistance': {'proposals': {
+            'proposals': proposals[:self.page_size],
+            'pagination': {'next': {'changeDay': len(proposals) <= self.page_size}}}}}
+
+    def autocomplete(self, body: dict) -> dict:
+        """
+        Station matching the search term
+        """
+        recorded = self.recorded('autocomplete', body['searchTerm'])
+        if recorded is not None:
+            return recorded
+        station = find_station(body['searchTerm'])
+        places = [] if station is None else [{'type': {'label': 'Gare'}, 'label': station[0],
+                                              'codes': [{'value': station[1]}]}]
+        return {'places': {'transportPlaces': places}}
+
+    def trips(self) -> dict:
+        """
+        Passed trips of the account
+        """
+        recorded = self.recorded('trips', 'trips')
+        if recorded is not None:
+            return recorded
+        random = Random(self.seed)
+        passed_trips = []
+        date = datetime(2030, 1, 1, 8)
+        for _ in range(20):
+            origin, destination = random.sample(STATIONS, 2)
+            duration = travel_duration(origin, destination) or 300
+            date -= timedelta(days=random.randint(1, 20))
+            messages = [{'disruptionType': 'DISRUPTION_DELAYED', 'title': 'Retard estimé à 15 min'}] \
+                if random.random() < 0.2 else []
+            passed_trips.append({'sortDate': date.isoformat(), 'trip': {
+                'originLabel': origin[0], 'destinationLabel': destination[0],
+                'tripDetails': {'outwardJourney': {'priceLabel': '0,00 €'}},
+                'tripIv': {'disruptions': {'messages': messages}},
+                'duration': duration_label(duration),
+                'transportersRecapLabel': 'TGV INOUI'}})
+        return {'response': {'passedTrips': passed_trips}}
+
+    def direct_destinations(self, identifier: str) -> list or None:
+        """
+        Stations reachable without connection, None if the station is unknown
+        """
+        recorded = self.recorded('direct_destinations', identifier)
+        if recorded is not None:
+            return recorded
+        station = next((station for station in STATIONS if station[2] == identifier), None)
+        if station is None:
+            return None
+        return [{'id': other[2], 'name': other[0], 'location': {'latitude': other[3], 'longitude': other[4]},
+                 'duration': travel_duration(station, other)}
+                for other in STATIONS if travel_duration(station, other) is not None]
+
+    def hafas(self, body: dict) -> dict:
+        """
+        HAFAS mgate response, only location searches (LocMatch) and trips without change (TripSearch) are emulated
+        """
+        request = body['svcReqL'][0]
+        if request['meth'] == 'TripSearch':
+            return self.trip_search(request['req'])
+        if request['meth'] != 'LocMatch':
+            return {'svcResL': [{'meth': request['meth'], 'err': 'PARSE', 'errTxt': 'Not emulated'}]}
+        name = request['req']['input']['loc']['name']
+        recorded = self.recorded('hafas', name)
+        if recorded is not None:
+            return recorded
+        station = find_station(name)
+        locations = [] if station is None else [location(station)]
+        return {'svcResL': [{'meth': 'LocMatch', 'err': 'OK', 'res': {'common': {}, 'match': {'locL': locations}}}]}
+
+    def trip_search(self, request: dict) -> dict:
+        """
+        HAFAS trips departing from the requested date, the direct trains of the SNCF Connect timetable
+        """
+        identifiers = [request[side][0]['lid'].split('L=')[1].split('@')[0] for side in ('depLocL', 'arrLocL')]
+        date = datetime.strptime(request['outDate'] + request['outTime'], '%Y%m%d%H%M%S')
+        recorded = self.recorded('hafas', f"{identifiers[0]}_{identifiers[1]}_{date.strftime('%Y-%m-%dT%H%M')}")
+        if recorded is not None:
+            return recorded
+        stations = {station[2]: station for station in STATIONS}
+        if identifiers[0] not in stations or identifiers[1] not in stations:
+            return {'svcResL': [{'meth': 'TripSearch', 'err': 'LOCATION', 'errTxt': 'Unknown station'}]}
+        origin, destination = stations[identifiers[0]], stations[identifiers[1]]
+        trips = []
+        for proposal in self.timetable(origin, destination, date):
+            departure = datetime.strptime(proposal['travelId'][:16], '%Y-%m-%dT%H:%M')
+            if departure < date:
+                continue
+            duration = timedelta(minutes=Proposal.parse_duration(proposal['durationLabel']))
+            arrival = departure + duration
+            days = (arrival.date() - departure.date()).days
+            trips.append({
+                'ctxRecon': proposal['travelId'], 'date': departure.strftime('%Y%m%d'),
+                'dur': f'{duration.seconds // 3600:02d}{duration.seconds // 60 % 60:02d}00',
+                'secL': [{'type': 'JNY', 'jny': {'jid': proposal['travelId'], 'prodX': 0},
+                          'dep': {'locX': 0, 'dTimeS': departure.strftime('%H%M%S')},
+                          'arr': {'locX': 1, 'aTimeS': (f'{days:02d}' if days else '') + arrival.strftime('%H%M%S')}}]})
+        if request.get('numF', -1) > 0:
+            trips = trips[:request['numF']]
+        common = {'locL': [location(origin), location(destination)], 'prodL': [{'name': 'TGV'}], 'remL': []}
+        return {'svcResL': [{'meth': 'TripSearch', 'err': 'OK', 'res': {'common': common, 'outConL': trips}}]}
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+        """
+        Serve in a background thread, port 0 picks a free port
+        :return: the server, its URL is http://host:server.server_port
+        """
+        server = ThreadingHTTPServer((host, port), EmulatorRequestHandler)
+        server.emulator = self
+        Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class EmulatorRequestHandler(BaseHTTPRequestHandler):
+    """
+    Route requests of the emulated services
+    """
+    verbose = False
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        direkt.bahn.guru destinations and the captcha page
+        """
+        url = urlparse(self.path)
+        emulator = self.server.emulator
+        self.wait()
+        if url.path == '/captcha':
+            self.send_json(200, {'captcha': 'Emulated captcha, nothing to resolve'})
+        elif url.path.startswith('/direkt.bahn.guru/'):
+            destinations = emulator.direct_destinations(url.path.rsplit('/', 1)[-1])
+            self.send_json(*(emulator.fault(False) or ((404, {'error': 'Unknown station'}) if destinations is None
+                                                       else (200, destinations))))
+        else:
+            self.send_json(404, {'error': f'Unknown endpoint {url.path}'})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        SNCF Connect and HAFAS requests
+        """
+        url = urlparse(self.path)
+        emulator = self.server.emulator
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.wait()
+        routes = {
+            '/bff/api/v1/itineraries': lambda: emulator.itineraries(body),
+            '/bff/api/v1/autocomplete': lambda: emulator.autocomplete(body),
+            '/bff/api/v1/trips': emulator.trips,
+        }
+        if url.path in routes:
+            self.send_json(*(emulator.fault(True, f"http://{self.headers['Host']}") or (200, routes[url.path]())))
+        elif url.path == '/hafas/mgate.exe':
+            self.send_json(*(emulator.fault(False) or (200, emulator.hafas(body))))
+        else:
+            self.send_json(404, {'error': f'Unknown endpoint {url.path}'})
+
+    def wait(self) -> None:
+        """
+        Emulate the latency of the service
+        """
+        latency = self.server.emulator.latency
+        if latency:
+            sleep(latency * self.server.emulator.faults.uniform(0.5, 1.5))
+
+    def send_json(self, status: int, body) -> None:
+        """
+        Send a JSON response
+        """
+        content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def use_emulator(url: str) -> None:
+    """
+    Point every client of the process at an emulator, and disable the rate limiter which only protects SNCF Connect
+    :param url: base URL of the emulator, like http://127.0.0.1:8000
+    """
+    Config.SNCFCONNECT_URL = url
+    Config.DIREKT_BAHN_GURU_URL = url + '/direkt.bahn.guru'
+    Config.HAFAS_URL = client.profile.baseUrl = url + '/hafas/mgate.exe'
+    limiter.min_interval = limiter.max_interval = 0
+
+
+def emulate(host: str, port: int, emulator: Emulator, verbose: bool = False) -> None:
+    """
+    Run the emulator until interrupted
+    """
+    EmulatorRequestHandler.verbose = verbose
+    server = ThreadingHTTPServer((host, port), EmulatorRequestHandler)
+    server.emulator = emulator
+    print(f'Emulating SNCF Connect, direkt.bahn.guru and HAFAS on http://{host}:{port},'
+          f' use it with --emulator http://{host}:{port}')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
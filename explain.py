@@ -0,0 +1,152 @@
+"""
+Code related to the dry run of a search (--explain): planned queries, estimated requests and time,
+without any itinerary request
+"""
+from datetime import datetime
+from time import perf_counter
+
+from rich.console import Console
+from rich.tree import Tree
+
+from api import Search
+from dag import Task
+from metrics import CACHES
+from snapshot_store import SnapshotStore
+from throttle import limiter
+
+# Pages of a whole day assumed for routes never scanned, SNCF Connect returns about 5 proposals per page
+DEFAULT_PAGES = 4.0
+
+
+class SegmentEstimate:
+    """
+    Estimated cost of the search of a route for one day
+    """
+    pages: float
+    seats_chance: float
+    source: str
+
+    def __init__(self, pages, seats_chance, source):
+        self.pages = pages
+        self.seats_chance = seats_chance  # probability that the search finds seats
+        self.source = source
+
+
+class Explanation:
+    """
+    Query plan of a search with its estimated number of requests and duration
+    """
+    search: Search
+    days: [datetime]
+    store: SnapshotStore
+    lookups: dict[str, tuple[int, int]]  # cache name -> (hits, misses) during resolution
+    resolution_seconds: float
+
+    def __init__(self, search: Search, days: [datetime], store: SnapshotStore = None):
+        """
+        :param search: search to explain, not resolved yet
+        :param days: days to search
+        :param store: snapshot store whose scans tell the number of pages of each route
+        """
+        self.search = search
+        self.days = days
+        self.store = store
+        self.lookups = {}
+        self.resolution_seconds = 0.0
+
+    def resolve(self) -> None:
+        """
+        Resolve stations and intermediate stations like the search would do, counting lookups answered by caches
+        """
+        before = {name: (cache.hits, cache.misses) for name, cache in CACHES.items()}
+        start = perf_counter()
+        self.search.resolve()
+        for intermediate_station in self.search.intermediate_stations or []:
+            intermediate_station['station'].name_to_code()
+        self.resolution_seconds = perf_counter() - start
+        self.lookups = {name: (cache.hits - before[name][0], cache.misses - before[name][1])
+                        for name, cache in CACHES.items() if name != 'segments'}
+
+    def estimate(self, dpt_code: str, arr_code: str) -> SegmentEstimate:
+        """
+        Returns the estimated cost of the search of a route, from the scans of the snapshot store
+        """
+        if self.store is not None:
+            scans, pages, seats_chance, last_scan = self.store.scan_statistics(dpt_code, arr_code)
+            if scans:
+                return SegmentEstimate(pages, seats_chance, f'{scans} scans, last {last_scan[:16]}')
+            scans, pages, seats_chance, _ = self.store.scan_statistics()
+            if scans:
+                return SegmentEstimate(pages, seats_chance, f'mean of {scans} scans')
+        pages = DEFAULT_PAGES
+        if self.search.search_opts.hours is not None:
+            start, end = self.search.search_opts.hours
+            pages = max(1.0, DEFAULT_PAGES * (end - start) / 24)
+        return SegmentEstimate(pages, 1.0, 'no history')
+
+    def plan(self) -> ([tuple[Task, SegmentEstimate, float]], float):
+        """
+        Returns the searches of the first day in execution order, with their estimate and expected number of
+        requests, and the expected number of requests of all days
+        """
+        graph = self.search.plan(self.days)
+        estimates = {}
+        requests = 0.0
+        first_day = []
+        for task in sorted(graph.tasks, key=lambda task: task.rank):
+            if task.details['kind'] == 'join':
+                continue
+            estimate = self.estimate(task.details['dpt'].name_to_code()[0], task.details['arr'].name_to_code()[0])
+            estimates[id(task)] = estimate
+            expected = estimate.pages
+            for need in task.needs:  # searched only if the segments searched before have seats
+                expected *= estimates[id(need)].seats_chance
+            requests += expected
+            if task.details['day'] == self.days[0]:
+                first_day.append((task, estimate, expected))
+        return first_day, requests
+
+    def print(self) -> None:
+        """
+        Print the query tree, the lookups answered by caches and the estimated requests and time
+        """
+        first_day, requests = self.plan()
+        interval = (limiter.min_interval + limiter.max_interval) / 2
+        search = self.search
+        vias = 0 if search.search_opts.direct_only else len(search.intermediate_stations)
+        tree = Tree(f'{search.departure.formal_name} → {search.arrival.formal_name}: {len(self.days)} days, '
+                    f'{vias} intermediate stations')
+
+        resolution = tree.add(f'Resolution, done in {self.resolution_seconds:.1f} s')
+        for name, (hits, misses) in self.lookups.items():
+            if hits or misses:
+                resolution.add(f'{name.replace("_", " ")}: {hits} from cache, {misses} requested')
+
+        day_label = str(self.days[0].date()) if len(self.days) == 1 else \
+            f'each of the {len(self.days)} days ({self.days[0].date()} to {self.days[-1].date()})'
+        day = tree.add(f'Itineraries of {day_label}, by priority')
+        vias = {}
+        for task, estimate, expected in first_day:
+            line = f"{task.details['dpt'].name} → {task.details['arr'].name}: ~{estimate.pages:.1f} pages " \
+                   f"({estimate.source})"
+            if task.details['kind'] == 'direct':
+                day.add(f'Direct {line}')
+            elif task.details['kind'] == 'nearby':
+                day.add(f'Direct from a nearby station {line}')
+            elif not task.needs:
+                vias[task.details['via']] = day.add(f"Via {task.details['via']}")
+                vias[task.details['via']].add(line)
+            else:
+                vias[task.details['via']].add(f'then, if seats, {line}, {expected:.1f} expected')
+
+        console = Console()
+        console.print(tree)
+        console.print(f'Estimated itinerary requests: {requests:.0f}, about {requests * interval / 60:.1f} min '
+                      f'at one request every {limiter.min_interval:g} to {limiter.max_interval:g} s')
+        budget = search.search_opts.budget
+        if budget is not None:
+            affordable = budget.max_requests if budget.max_requests is not None else float('inf')
+            if budget.deadline is not None and interval:
+                affordable = min(affordable, (budget.deadline - self.resolution_seconds) / interval)
+            console.print(f'The budget covers about {min(1.0, max(0.0, affordable) / max(requests, 1)):.0%} of them, '
+                          'direct journeys first')
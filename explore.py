@@ -0,0 +1,98 @@
+"""
+Code related to the exploration of every direct destination of a station, ex: where to go from Lyon tomorrow
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from logging import getLogger
+from typing import Iterator
+
+from dag import TaskGraph
+from direct_destination import DirectDestination
+from options import SearchOptions, PromptOptions
+from proposal import Proposal
+from search import get_available_seats
+from station import Station
+
+logger = getLogger(__name__)
+
+SORT_KEYS = ('duration', 'distance')
+
+
+class Explorer:
+    """
+    Search seats from one station to each of its French direct destinations, several destinations at the
+    same time under the shared rate limit
+    """
+    origin: Station
+    search_opts: SearchOptions
+    prompt_opts: PromptOptions
+    workers: int
+
+    def __init__(self, origin: str, search_opts: SearchOptions = None, prompt_opts: PromptOptions = None,
+                 workers: int = 4):
+        self.origin = Station(origin)
+        # each destination search stops at the first page with seats, the earliest departures
+        self.search_opts = search_opts or SearchOptions(max_duration=600)
+        self.search_opts.until_found = True
+        self.prompt_opts = prompt_opts or PromptOptions(quiet=True)
+        self.workers = workers
+
+    def destinations(self, top: int = None, sort: str = 'duration') -> [dict]:
+        """
+        Returns the French direct destinations of the origin with their code, one per code
+        :param top: keep only the nearest destinations
+        :param sort: 'duration' of the direct train or 'distance' as the crow flies
+        :return: dicts with station, duration and code, nearest first
+        """
+        self.origin.get_code()
+        self.origin.get_identifier()
+        destinations = [destination for destination in DirectDestination.get(self.origin).destinations.values()
+                        if destination['station'].is_in_france()
+                        and destination['duration'] <= self.search_opts.max_duration]
+        if sort == 'distance':
+            self.origin.get_coordinates()
+            destinations.sort(key=lambda destination: self.origin.distance(destination['station']))
+        else:
+            destinations.sort(key=lambda destination: destination['duration'])
+
+        def resolve(destination: dict) -> dict:
+            try:
+                code = destination['station'].name_to_code()
+            except ValueError as error:
+                logger.info('%s skipped: %s', destination['station'].name, error)
+                return None
+            return destination | {'code': code[0]} if code else None
+
+        # several stations of a city share the same code, like Paris ones, codes are resolved nearest first,
+        # a batch of destinations at a time, until enough unique ones are found
+        codes = {self.origin.code}
+        unique = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(destinations), self.workers):
+                if top is not None and len(unique) >= top:
+                    break
+                for destination in executor.map(resolve, destinations[start:start + self.workers]):
+                    if destination is not None and destination['code'] not in codes:
+                        codes.add(destination['code'])
+                        unique.append(destination)
+        return unique[:top]
+
+    def search(self, destination: dict, day: datetime) -> [Proposal]:
+        """
+        Returns the earliest proposals of a day to a destination, sorted by departure
+        """
+        proposals = get_available_seats(self.origin.code, destination['code'], day,
+                                        self.search_opts, self.prompt_opts)
+        return sorted(proposals, key=lambda proposal: proposal.departure_date)
+
+    def run(self, destinations: [dict], day: datetime) -> Iterator[tuple[dict, list[Proposal]]]:
+        """
+        Search every destination, nearest first, yielding each one as soon as it is searched
+        """
+        graph = TaskGraph()
+        for index, destination in enumerate(destinations):
+            graph.add(destination['station'].name, partial(self.search, destination, day), rank=(index,),
+                      destination=destination)
+        for task in graph.run(self.workers):
+            yield task.details['destination'], task.result
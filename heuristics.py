@@ -0,0 +1,143 @@
+"""
+Code related to the hit rates of segments learned from past searches, used to order segments searches,
+skip hopeless ones and pick intermediate stations
+"""
+import json
+import os
+from datetime import datetime
+from threading import Lock
+from time import time
+
+from proposal import Proposal
+
+DEFAULT_PATH = 'hit_rates.json'
+
+# Hour windows of the day in which seats are counted, (start hour, end hour excluded, name)
+WINDOWS = [(0, 6, 'night'), (6, 12, 'morning'), (12, 18, 'afternoon'), (18, 24, 'evening')]
+# Number of days between the search and the departure, (first day, last day, name)
+HORIZONS = [(0, 1, '0-1'), (2, 7, '2-7'), (8, 14, '8-14'), (15, 30, '15-30'), (31, 10000, '31+')]
+# Searches of a weekday, window and horizon needed before trusting their hit rate, else the route one is used
+MIN_SEARCHES = 5
+# Connections whose segments both have seats less often than this are not searched
+SKIP_BELOW = 0.05
+# Seconds after which the segments of a skipped connection are searched again, so that their hit rate can recover
+RETRY_AFTER = 3 * 24 * 60 * 60
+# Weekday names of the keys, not localized so that the file does not depend on the locale
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def horizon(day: datetime, today: datetime = None) -> str:
+    """
+    Returns the name of the horizon of a day of departure
+    """
+    days = (day.date() - (today or datetime.now()).date()).days
+    return next(name for first, last, name in HORIZONS if days <= last)
+
+
+def windows(hours: tuple[int, int] = None) -> [str]:
+    """
+    Returns the names of the windows overlapping an hour window, all of them without window
+    """
+    if hours is None:
+        return [name for _, _, name in WINDOWS]
+    return [name for start, end, name in WINDOWS if start < hours[1] and hours[0] < end]
+
+
+class HitRates:
+    """
+    Number of searches and of searches with seats of each segment, by weekday, hour window and horizon,
+    stored in a JSON file and updated after each search like the snapshot store
+    """
+    path: str
+    counts: dict[str, list[int]]  # key -> [searches, hits]
+    searched_at: dict[str, float]  # segment key -> timestamp of its last search
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.counts = {}
+        self.searched_at = {}
+        self._lock = Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                content = json.load(file)
+            if 'counts' in content:
+                self.counts, self.searched_at = content['counts'], content['searched_at']
+            else:  # file written before the search times were kept
+                self.counts = content
+
+    @staticmethod
+    def key(dep_station: str, arr_station: str, *parts) -> str:
+        """
+        Returns the key of a segment counts, for all its searches without parts
+        """
+        return '|'.join((f'{dep_station}-{arr_station}',) + parts)
+
+    def record(self, dep_station: str, arr_station: str, day: datetime, proposals: [Proposal], pages: int,
+               hours: tuple[int, int] = None, max_duration: int = None) -> None:
+        """
+        Count a search, and for each window it covers, whether a proposal departs in it
+        :param dep_station: departure station code
+        :param arr_station: arrival station code
+        :param day: day searched
+        :param proposals: proposals found
+        :param pages: number of pages requested, not used
+        :param hours: hour window of the search
+        :param max_duration: maximum duration of the proposals searched, not used
+        """
+        weekday, day_horizon = WEEKDAYS[day.weekday()], horizon(day)
+        departure_hours = {proposal.departure_date.hour for proposal in proposals}
+        with self._lock:
+            self.searched_at[HitRates.key(dep_station, arr_station)] = time()
+            self._count(HitRates.key(dep_station, arr_station), bool(proposals))
+            if hours is None:
+                self._count(HitRates.key(dep_station, arr_station, weekday, 'day', day_horizon), bool(proposals))
+            for start, end, name in WINDOWS:
+                if name in windows(hours):
+                    self._count(HitRates.key(dep_station, arr_station, weekday, name, day_horizon),
+                                any(start <= hour < end for hour in departure_hours))
+
+    def _count(self, key: str, hit: bool) -> None:
+        searches, hits = self.counts.get(key, (0, 0))
+        self.counts[key] = [searches + 1, hits + hit]
+
+    def rate(self, dep_station: str, arr_station: str, day: datetime, hours: tuple[int, int] = None) -> float:
+        """
+        Returns the estimated probability that a search finds seats, None for a segment never searched
+        :param dep_station: departure station code
+        :param arr_station: arrival station code
+        :param day: day of departure
+        :param hours: hour window of the search
+        """
+        weekday, day_horizon = WEEKDAYS[day.weekday()], horizon(day)
+        with self._lock:
+            counts = [self.counts.get(HitRates.key(dep_station, arr_station, weekday, name, day_horizon), (0, 0))
+                      for name in (['day'] if hours is None else windows(hours))]
+            if all(searches >= MIN_SEARCHES for searches, _ in counts):
+                # smoothed, so that a few searches without seats never make a segment hopeless,
+                # windows are assumed independent
+                misses = 1.0
+                for searches, hits in counts:
+                    misses *= 1 - (hits + 1) / (searches + 2)
+                return 1 - misses
+            searches, hits = self.counts.get(HitRates.key(dep_station, arr_station), (0, 0))
+        if searches < MIN_SEARCHES:
+            return None
+        return (hits + 1) / (searches + 2)
+
+    def stale(self, dep_station: str, arr_station: str) -> bool:
+        """
+        Returns whether a segment was not searched for RETRY_AFTER seconds, its hit rate may be outdated
+        """
+        with self._lock:
+            searched_at = self.searched_at.get(HitRates.key(dep_station, arr_station))
+        return searched_at is None or time() - searched_at > RETRY_AFTER
+
+    def save(self) -> None:
+        """
+        Write the counts and the search times, the file is replaced atomically
+        """
+        with self._lock:
+            content = json.dumps({'counts': self.counts, 'searched_at': self.searched_at}, indent=1, sort_keys=True)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(self.path + '.tmp', self.path)
@@ -4,141 +4,93 @@
 Script entry point
 """
 from argparse import ArgumentParser, SUPPRESS
+from atexit import register
 from datetime import datetime, timedelta
 from locale import setlocale, LC_TIME
-from time import sleep
-from sys import exit as sys_exit
-from random import uniform
+from logging import basicConfig, INFO
+from os.path import exists
+from sys import argv, stderr, exit as sys_exit
 
 from argcomplete import autocomplete
 from pyhafas import HafasClient
 from pyhafas.profile import DBProfile
-from alive_progress import alive_bar
 
-from direct_destination import DirectDestination
-from multiple_proposals import MultipleProposals
+from api import Search, RoundTrip, DayResult, IN_FLIGHT, date_range
+from batch import QueryPlanner, load_routes
+from budget import Budget
+from cache import segments
+from crawler import crawl, load_corridors
+from emulator import Emulator, emulate, use_emulator
+from explain import Explanation
+from explore import Explorer, SORT_KEYS
+from heuristics import HitRates, DEFAULT_PATH as HIT_RATES_PATH
+from negative_cache import NegativeCache, DEFAULT_PATH as NEGATIVE_CACHE_PATH
+from prefetch import prefetcher
+from captcha import resolve
+from metrics import metrics
 from options import SearchOptions, PromptOptions
-from proposal import Proposal, console
-from station import Station, PARIS
-from trips_statistics import Statistics
+from profiling import Profiler, tracer
+from proposal import Proposal, SNCFConnectError, console
+from renderers import RENDERERS, TableRenderer
+from search import recorders, observers
+from server import serve
+from snapshot_store import SnapshotStore, DEFAULT_PATH
+from station import Station
+from trips_statistics import Statistics, StatisticsError, TripHistory, DEFAULT_PATH as TRIPS_HISTORY_PATH
+from watch import Watcher
 
 setlocale(LC_TIME, "fr_FR.UTF-8")
 client = HafasClient(DBProfile())
 
 
-def wait_random_time() -> None:
-    """
-    Sleep script during a random interval of time
-    :return: None
-    """
-    sleep(uniform(2.5, 4.0))
-
-
-def get_available_seats(dep_station: str, arr_station: str, day: datetime,
-                        search_opts: SearchOptions, prompt_opts: PromptOptions) -> [Proposal]:
-    """
-    Returns train proposals for a given day
-    :param dep_station: station of departure
-    :param arr_station: station of arrival
-    :param day: date of departure wished
-    :param search_opts: search options specified by the user
-    :param prompt_opts: display options specified by the user
-
-    :return: List of journey 'Proposal' objects
-    """
-    all_proposals = []
-    with alive_bar(title='Searching', stats=False, disable=prompt_opts.quiet, monitor="Page {count}") as progress_bar:
-        response = Proposal.get_next(dep_station, arr_station, day.strftime('%Y-%m-%dT%H:%M:00'), prompt_opts.verbosity)
-        progress_bar()  # pylint: disable=not-callable
-        if response:
-            response_json = response.json()['longDistance']
-            wait_random_time()
-
-            if response_json is not None and response_json['proposals'] and response_json['proposals']['proposals']:
-                all_proposals = Proposal.filter(response_json['proposals']['proposals'], search_opts.max_duration)
-                if prompt_opts.debug:
-                    print(response_json['proposals'])
-                while response_json['proposals']['pagination']['next']['changeDay'] is False:
-                    response = Proposal.get_next(dep_station,
-                                                 arr_station,
-                                                 Proposal.get_last_timetable(response),
-                                                 prompt_opts.verbosity)
-                    response_json = response.json()['longDistance']
-                    progress_bar()  # pylint: disable=not-callable
-                    wait_random_time()
-                    all_proposals.extend(
-                        Proposal.filter(response_json['proposals']['proposals'], search_opts.max_duration))
-        progress_bar.title = 'Search has finished'
-    return Proposal.remove_duplicates(all_proposals, prompt_opts.verbosity) if all_proposals else []
-
-
-def display_indirect_proposals(dpt_direct_dest, arr_direct_dest, day,
-                               search_opts: SearchOptions, prompt_opts: PromptOptions) -> None:
+def display_indirect_proposals(result: DayResult, search_opts: SearchOptions, prompt_opts: PromptOptions) -> None:
     """
     Display indirect train proposals for a given day
-    :param dpt_direct_dest: direct destinations of departure
-    :param arr_direct_dest: direct destinations of arrival
-    :param day: date of departure
+    :param result: results of the day
     :param search_opts: search options
     :param prompt_opts: search options
     :return: None
     """
-
-    if not search_opts.via:
-        intermediate_stations = DirectDestination.get_common_stations(dpt_direct_dest, arr_direct_dest) + [PARIS]
-    else:  # if --via option is specified, search only proposals via this station
-        via = Station(search_opts.via)
-        via.get_code()
-        via.get_identifier()
-        intermediate_stations = [{'station': via}]
-
-    for intermediate_station in intermediate_stations:
-        # check for segments between station located in France only
-        if intermediate_station['station'].is_in_france():
-            if not prompt_opts.quiet:
-                print(f"\nVia {intermediate_station['station'].name}")
-
-            farther_station = Station.get_farther(
-                dpt_direct_dest,
-                arr_direct_dest,
-                intermediate_station)
-
-            segments = [{'dpt': dpt_direct_dest.station, 'arr': intermediate_station['station']},
-                        {'dpt': intermediate_station['station'], 'arr': arr_direct_dest.station}]
-
-            if farther_station == intermediate_station:
-                segments.reverse()
-
-            results = {}
-            for index, segment in enumerate(segments):
-                result = get_available_seats(segment['dpt'].name_to_code()[0],
-                                             segment['arr'].name_to_code()[0],
-                                             day,
-                                             search_opts,
-                                             prompt_opts
-                                             )
-                if result:
-                    results[index] = result
-                    if prompt_opts.verbosity:
-                        print(f"Segment {index + 1} found :")
-                        Proposal.display(result, long=True)
-                else:
-                    if prompt_opts.verbosity:
-                        console.print(f"Segment {index + 1} not found", style='red')
-                    break # it's useless to search next segment if one is not available
-
-                # To optimize the search, we first search for the longest segment
-                # (most demanded than the shortest and potentially limiting factor)
-                # Exemple : For Beziers-Paris (~4h) via Nimes, we first search for
-                # the journey from Nimes to Paris (~3h), then for the journey
-                # from Beziers-Nimes (~1h), because longer segment is rarer
-
-                if len(results) > 1:  # Display results if more than one segment found
-                    MultipleProposals.display(results[0], results[1], search_opts, prompt_opts)
+    for via, connections in result.indirect.items():
+        if not prompt_opts.quiet:
+            print(f"\nVia {via}")
+        if via in result.unexplored and not prompt_opts.quiet:
+            print("Not explored, the budget was exhausted")
+        if connections and prompt_opts.verbosity:
+            print("Segments 1 & 2 combined :")
+        for background, connection in enumerate(connections):
+            connection.print(search_opts, background % 2 == 0)
+
+
+def render_proposals(dpt_name: str, arr_name: str, days: int, days_delta: int, output_format: str,
+                     search_opts: SearchOptions, prompt_opts: PromptOptions, workers: int = 1):
+    """
+    Write train proposals in the output format chosen with --format, day by day
+    :param dpt_name: name of departure station
+    :param arr_name: name of arrival station
+    :param days: number of days to search
+    :param days_delta: number of days to search from today
+    :param output_format: one of the RENDERERS formats
+    :param search_opts: search options defined by user
+    :param prompt_opts: display options defined by user
+    :param workers: number of searches run at the same time
+    """
+    date = datetime.now().replace(hour=0, minute=0, second=1) + timedelta(days=days_delta)
+    if output_format == 'table':
+        renderer = TableRenderer(berth_only=search_opts.berth_only, long=prompt_opts.long)
+    else:
+        renderer = RENDERERS[output_format](berth_only=search_opts.berth_only)
+    search = Search(dpt_name, arr_name, search_opts, prompt_opts, workers)
+    for result in search.iter_days(date_range(date, days)):
+        with tracer.span('render'):
+            renderer.write_day(result)
+    renderer.close()
+    if search_opts.budget is not None and search_opts.budget.unexplored:
+        print_unexplored(search_opts.budget, prompt_opts, stderr)
 
 
 def display_proposals(dpt_name: str, arr_name: str, days: int, days_delta: int,
-                      search_opts: SearchOptions, prompt_opts: PromptOptions):
+                      search_opts: SearchOptions, prompt_opts: PromptOptions, workers: int = 1):
     """
     Display train proposals depending on search options provided by the user
     :param dpt_name: name of departure station
@@ -147,57 +99,440 @@ def display_proposals(dpt_name: str, arr_name: str, days: int, days_delta: int,
     :param days_delta: number of days to search from today
     :param search_opts: search options defined by user
     :param prompt_opts: display options defined by user
+    :param workers: number of searches run at the same time
     """
 
     # set initial search date based on --timedelta argument
     date = datetime.now().replace(hour=0, minute=0, second=1) + timedelta(days=days_delta)
 
-    departure = Station(dpt_name)  # Store station name
-    departure.get_code()  # Get station code from name (ex: Paris-> FRPAR)
-    arrival = Station(arr_name)
-    arrival.get_code()
-    if prompt_opts.verbosity:
-        print("Stations codes acquired")
-        # acquire direct destinations of both stations only if --direct option is not specified
+    search = Search(dpt_name, arr_name, search_opts, prompt_opts, workers)
+    search.resolve()
+    departure, arrival = search.departure, search.arrival
 
-    if search_opts.direct_only:
-        dpt_direct_dest = arr_direct_dest = None
-    else:
-        departure.get_identifier()
-        arrival.get_identifier()
-        dpt_direct_dest = DirectDestination.get(departure)
-        arr_direct_dest = DirectDestination.get(arrival)
-        if prompt_opts.verbosity:
-            print("Stations identifiers acquired")
+    # Iterate over the period (--period) specified by the user, each day is displayed once searched
+    for result in search.iter_days(date_range(date, days)):
+        with tracer.span('render'):
+            display_day(result, departure, arrival, search_opts, prompt_opts, search.alternatives)
 
-    for day_counter in range(days):  # Iterate over the period (--period) specified by the user
-        day = date + timedelta(days=day_counter)
-        print(day.strftime("%c"))
+    display_skipped(search, search_opts, prompt_opts)
+
+
+def display_first_available(dpt_name: str, arr_name: str, days: int, days_delta: int,
+                            search_opts: SearchOptions, prompt_opts: PromptOptions, in_flight: int = IN_FLIGHT) -> None:
+    """
+    Display the earliest day with a train proposal or a connection
+    :param dpt_name: name of departure station
+    :param arr_name: name of arrival station
+    :param days: number of days to scan
+    :param days_delta: number of days to search from today
+    :param search_opts: search options defined by user
+    :param prompt_opts: display options defined by user
+    :param in_flight: number of searches run at the same time
+    """
+    date = datetime.now().replace(hour=0, minute=0, second=1) + timedelta(days=days_delta)
+    search = Search(dpt_name, arr_name, search_opts, prompt_opts, in_flight)
+    search.resolve()
+    result = search.first_available(date_range(date, days), in_flight)
+    if result is None:
+        print(f"No seat available from {search.departure.display_name} to {search.arrival.display_name}"
+              f" in the {days} days from {date.date()}")
+    else:
+        # a day found with direct proposals often has no connection, its section is left out
+        display_day(result, search.departure, search.arrival, search_opts, prompt_opts, search.alternatives,
+                    split=any(result.indirect.values()))
+    display_skipped(search, search_opts, prompt_opts)
 
-        print(f"Direct journey from {departure.display_name} to {arrival.display_name}")
 
-        direct_proposals = get_available_seats(departure.code, arrival.code, day, search_opts, prompt_opts)
-        if direct_proposals:
-            Proposal.display(direct_proposals, search_opts.berth_only, prompt_opts.long)
+def display_day(result: DayResult, departure: Station, arrival: Station,
+                search_opts: SearchOptions, prompt_opts: PromptOptions, alternatives: [dict] = (),
+                split: bool = True) -> None:
+    """
+    Display direct, nearby and indirect train proposals of a day
+    :param result: results of the day
+    :param departure: station of departure
+    :param arrival: station of arrival
+    :param search_opts: search options defined by user
+    :param prompt_opts: display options defined by user
+    :param alternatives: stations searched near the departure or the arrival (--radius)
+    :param split: display the indirect proposals
+    """
+    print(result.day.strftime("%c"))
+
+    print(f"Direct journey from {departure.display_name} to {arrival.display_name}")
+    if result.direct:
+        Proposal.display(result.direct, search_opts.berth_only, prompt_opts.long)
+    elif 'direct' in result.unexplored and not prompt_opts.quiet:
+        print("Not explored, the budget was exhausted")
+    elif prompt_opts.verbosity:
+        print("No direct journey found")
+
+    for alternative in alternatives:
+        replaced = departure if alternative['end'] == 'departure' else arrival
+        print(f"Direct journey from {alternative['dpt'].display_name} to {alternative['arr'].display_name}"
+              f" ({alternative['station'].display_name} is {alternative['distance']:.0f} km from"
+              f" {replaced.display_name})")
+        proposals = result.nearby.get(alternative['station'].name)
+        if proposals:
+            Proposal.display(proposals, search_opts.berth_only, prompt_opts.long)
+        elif alternative['station'].name in result.unexplored and not prompt_opts.quiet:
+            print("Not explored, the budget was exhausted")
         elif prompt_opts.verbosity:
             print("No direct journey found")
 
-        if not search_opts.direct_only:
-            print(f"Let's split the journey from {departure.formal_name} to {arrival.formal_name} :")
-            display_indirect_proposals(dpt_direct_dest, arr_direct_dest, day, search_opts, prompt_opts)
+    if split and not search_opts.direct_only:
+        print(f"Let's split the journey from {departure.formal_name} to {arrival.formal_name} :")
+        display_indirect_proposals(result, search_opts, prompt_opts)
+
+
+def display_skipped(search: Search, search_opts: SearchOptions, prompt_opts: PromptOptions) -> None:
+    """
+    Display the searches skipped or left unexplored by a search
+    :param search: search done
+    :param search_opts: search options defined by user
+    :param prompt_opts: display options defined by user
+    """
+    if search.skipped and not prompt_opts.quiet:
+        print(f"{len(search.skipped)} searches skipped: the other segment of the connection has no seat,"
+              " seats are rarely or were recently not found there, or timetables have no connection")
+        if prompt_opts.verbosity:
+            for skipped in search.skipped:
+                print(f"  {skipped}")
+    if search_opts.budget is not None and search_opts.budget.unexplored:
+        print_unexplored(search_opts.budget, prompt_opts)
+
+
+def display_round_trip(dpt_name: str, arr_name: str, days: int, days_delta: int, return_after: int,
+                       return_period: int, search_opts: SearchOptions, prompt_opts: PromptOptions,
+                       workers: int = 1) -> None:
+    """
+    Display each outbound day followed by the return days paired with it
+    :param dpt_name: name of departure station
+    :param arr_name: name of arrival station
+    :param days: number of outbound days to search
+    :param days_delta: number of days to search from today
+    :param return_after: number of days between an outbound day and its first return day
+    :param return_period: number of return days of each outbound day
+    :param search_opts: search options defined by user
+    :param prompt_opts: display options defined by user
+    :param workers: number of searches run at the same time
+    """
+    date = datetime.now().replace(hour=0, minute=0, second=1) + timedelta(days=days_delta)
+    round_trip = RoundTrip(Search(dpt_name, arr_name, search_opts, prompt_opts, workers), return_after, return_period)
+    round_trip.outbound.resolve()
+    departure, arrival = round_trip.outbound.departure, round_trip.outbound.arrival
+    for outbound, returns in round_trip.run(date_range(date, days)):
+        with tracer.span('render'):
+            print("Outbound:", end=' ')
+            display_day(outbound, departure, arrival, search_opts, prompt_opts, round_trip.outbound.alternatives)
+            if not returns:
+                print("No outbound journey, return not searched\n")
+            for inbound in returns:
+                print("\nReturn:", end=' ')
+                display_day(inbound, arrival, departure, search_opts, prompt_opts, round_trip.inbound.alternatives)
+            print()
+
+    if round_trip.inbound is not None:
+        round_trip.outbound.skipped += round_trip.inbound.skipped
+    display_skipped(round_trip.outbound, search_opts, prompt_opts)
+
+
+def print_unexplored(budget: Budget, prompt_opts: PromptOptions, file=None) -> None:
+    """
+    Print what a budgeted search could not explore
+    :param budget: budget of the search
+    :param prompt_opts: display options, every unexplored search is listed with verbosity
+    :param file: where to print, standard output by default
+    """
+    print(f"\nBudget exhausted ({budget.summary()}), {len(budget.unexplored)} searches or pages not explored",
+          file=file)
+    shown = budget.unexplored if prompt_opts.verbosity else budget.unexplored[:10]
+    for unexplored in shown:
+        print(f"  {unexplored}", file=file)
+    if len(shown) < len(budget.unexplored):
+        print(f"  ... and {len(budget.unexplored) - len(shown)} more (--verbosity to list them)", file=file)
+
+
+def explain_proposals(dpt_name: str, arr_name: str, days: int, days_delta: int,
+                      search_opts: SearchOptions, prompt_opts: PromptOptions, store_path: str = None) -> None:
+    """
+    Print the query plan of a search and its estimated cost, stations are resolved but nothing is searched
+    :param dpt_name: name of departure station
+    :param arr_name: name of arrival station
+    :param days: number of days to search
+    :param days_delta: number of days to search from today
+    :param search_opts: search options defined by user
+    :param prompt_opts: display options defined by user
+    :param store_path: snapshot store giving the number of pages of each route, the default one if it exists
+    """
+    date = datetime.now().replace(hour=0, minute=0, second=1) + timedelta(days=days_delta)
+    store_path = store_path or (DEFAULT_PATH if exists(DEFAULT_PATH) else None)
+    explanation = Explanation(Search(dpt_name, arr_name, search_opts, prompt_opts),
+                              list(date_range(date, days)), SnapshotStore(store_path) if store_path else None)
+    explanation.resolve()
+    explanation.print()
+
+
+def watch_proposals(dpt_name: str, arr_name: str, days: int, days_delta: int, args,
+                    search_opts: SearchOptions, prompt_opts: PromptOptions) -> None:
+    """
+    Poll direct proposals periodically and print only availability changes
+    :param dpt_name: name of departure station
+    :param arr_name: name of arrival station
+    :param days: number of days to watch
+    :param days_delta: number of days to watch from today
+    :param args: parsed command line arguments with watch options
+    :param search_opts: search options defined by user
+    :param prompt_opts: display options defined by user
+    """
+    date = datetime.now().replace(hour=0, minute=0, second=1) + timedelta(days=days_delta)
+    departure = Station(dpt_name)
+    departure.get_code()
+    arrival = Station(arr_name)
+    arrival.get_code()
+    print(f"Watching {departure.formal_name} → {arrival.formal_name} every {args.watch} seconds")
+    watcher = Watcher(departure, arrival,
+                      [date + timedelta(days=day_counter) for day_counter in range(days)],
+                      args.watch,
+                      threshold=args.threshold,
+                      state_file=args.watch_state,
+                      on_change=args.on_change,
+                      jsonl_file=args.jsonl)
+    watcher.run(search_opts, prompt_opts)
+
+
+def query_command(arguments: [str]) -> None:
+    """
+    Answer from the snapshot store without network, ex: main.py query Paris Lyon --timedelta 4 --max-age 10
+    :param arguments: command line arguments following 'query'
+    """
+    parser = ArgumentParser(prog='main.py query', description='Query availability history of the snapshot store')
+    parser.add_argument("stations", metavar="station", nargs='*', help="Station names or codes (departure arrival)")
+    parser.add_argument("--store", metavar="DB", default=DEFAULT_PATH, help="Path of the snapshot store")
+    parser.add_argument("-t", "--timedelta", type=int, default=1, help="How many days from today")
+    parser.add_argument("--date", type=datetime.fromisoformat, help="Day of departure (YYYY-MM-DD)")
+    parser.add_argument("--max-age", type=int, metavar="MINUTES", help="Ignore snapshots older than MINUTES")
+    parser.add_argument("-l", "--long", action="store_true", help="Add transporter and vehicle number")
+    parser.add_argument("--retention", type=int, metavar="DAYS", help="Delete snapshots older than DAYS")
+    parser.add_argument("--compact", action="store_true",
+                        help="Keep only one snapshot per train and per hour after 24 hours")
+    args = parser.parse_args(arguments)
+
+    store = SnapshotStore(args.store)
+    if args.retention is not None:
+        print(f"{store.apply_retention(args.retention)} snapshots deleted")
+    if args.compact:
+        print(f"{store.compact()} snapshots compacted")
+    if len(args.stations) == 2:
+        day = args.date or datetime.now() + timedelta(days=args.timedelta)
+        proposals = store.query(args.stations[0], args.stations[1], day, args.max_age)
+        print(day.strftime("%x"))
+        if proposals:
+            Proposal.display(proposals, long=args.long)
+        else:
+            print("No snapshot matches this route and day")
+    elif args.stations:
+        parser.error("expected departure and arrival stations")
+    store.close()
+
+
+def crawl_command(arguments: [str]) -> None:
+    """
+    Refresh continuously hub corridors availability in the snapshot store, ex: main.py crawl --budget 600
+    :param arguments: command line arguments following 'crawl'
+    """
+    parser = ArgumentParser(prog='main.py crawl', description='Crawl hub corridors into the snapshot store')
+    parser.add_argument("--corridors", metavar="FILE",
+                        help="CSV file with origin, destination and demand columns (default: built-in hubs)")
+    parser.add_argument("--days", type=int, default=30, help="Number of days to crawl from today")
+    parser.add_argument("--budget", type=int, default=600, help="Maximum number of requests per hour")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--store", metavar="DB", default=DEFAULT_PATH, help="Path of the snapshot store")
+    parser.add_argument("--queue", metavar="DB", help="Path of the work queue (default: the snapshot store)")
+    args = parser.parse_args(arguments)
+    crawl(load_corridors(args.corridors), args.days, args.budget, args.workers, args.store, args.queue)
+
+
+def explore_command(arguments: [str]) -> None:
+    """
+    Search seats to every direct destination of a station, ex: main.py explore Lyon --top 20
+    :param arguments: command line arguments following 'explore'
+    """
+    parser = ArgumentParser(prog='main.py explore', description='Find where to go with TGVmax from a station')
+    parser.add_argument("station", help="Station of departure")
+    parser.add_argument("-t", "--timedelta", type=int, default=1, help="How many days from today")
+    parser.add_argument("--top", type=int, metavar="N", help="Only search the N nearest destinations")
+    parser.add_argument("--sort", choices=SORT_KEYS, default='duration',
+                        help="Nearest destinations by duration of the direct train or by distance")
+    parser.add_argument("--workers", type=int, default=4, help="Number of destinations searched at the same time")
+    parser.add_argument("--max-duration", type=int, default=600, help="Maximum duration of a journey")
+    parser.add_argument("--hours", type=SearchOptions.parse_hours, metavar="START-END",
+                        help="Only search departures in this hour window, like 7-12")
+    parser.add_argument("-b", "--berth-only", action="store_true",
+                        help="Print berth only for Intercites de Nuit proposals")
+    parser.add_argument("-l", "--long", action="store_true", help="Add transporter and vehicle number")
+    parser.add_argument("-v", "--verbosity", action="store_true", help="Also list destinations without seat")
+    parser.add_argument("--emulator", metavar="URL",
+                        help="Send every request to the offline emulator started with 'main.py emulate'")
+    args = parser.parse_args(arguments)
+    if args.emulator:
+        use_emulator(args.emulator)
+
+    day = datetime.now().replace(hour=0, minute=0, second=1) + timedelta(days=args.timedelta)
+    explorer = Explorer(args.station, SearchOptions(max_duration=args.max_duration, hours=args.hours),
+                        PromptOptions(quiet=True), args.workers)
+    destinations = explorer.destinations(args.top, args.sort)
+    print(f"{day.strftime('%c')}: searching {len(destinations)} destinations from {explorer.origin.formal_name}")
+    found = 0
+    for destination, proposals in explorer.run(destinations, day):
+        if proposals:
+            found += 1
+            print(f"\n{destination['station'].display_name} ({destination['duration'] // 60}h"
+                  f"{destination['duration'] % 60:02d} direct)")
+            Proposal.display(proposals, args.berth_only, args.long)
+        elif args.verbosity:
+            print(f"\n{destination['station'].display_name}: no seat")
+    print(f"\n{found} of {len(destinations)} destinations have seats")
+
+
+def serve_command(arguments: [str]) -> None:
+    """
+    Run the local JSON search service, ex: main.py serve --port 8080
+    :param arguments: command line arguments following 'serve'
+    """
+    parser = ArgumentParser(prog='main.py serve', description='Serve /search, /stations and /direct-destinations'
+                                                               ' as JSON with shared caches')
+    parser.add_argument("--host", default="127.0.0.1", help="Listening address")
+    parser.add_argument("--port", type=int, default=8080, help="Listening port")
+    parser.add_argument("--cache-ttl", type=int, default=300, metavar="SECONDS",
+                        help="How long search results are reused")
+    parser.add_argument("--store", metavar="DB", help="Record every search in a SQLite snapshot store")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Search the next day and the reverse direction of each searched segment in advance,"
+                             " with the request slots left free by searches")
+    parser.add_argument("-v", "--verbosity", action="store_true", help="Log every request")
+    args = parser.parse_args(arguments)
+    segments.ttl = args.cache_ttl
+    if args.store:
+        recorders.append(SnapshotStore(args.store))
+    if args.prefetch:
+        observers.append(prefetcher)
+        prefetcher.start()
+    serve(args.host, args.port, args.verbosity)
+
+
+def emulate_command(arguments: [str]) -> None:
+    """
+    Run the offline emulator of SNCF Connect, direkt.bahn.guru and HAFAS, ex: main.py emulate --port 8000
+    :param arguments: command line arguments following 'emulate'
+    """
+    parser = ArgumentParser(prog='main.py emulate', description='Serve recorded or synthetic responses of'
+                                                                 ' SNCF Connect, direkt.bahn.guru and HAFAS')
+    parser.add_argument("--host", default="127.0.0.1", help="Listening address")
+    parser.add_argument("--port", type=int, default=8000, help="Listening port")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="SECONDS", help="Mean delay of responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an HTTP 503 response")
+    parser.add_argument("--captcha-rate", type=float, default=0.0,
+                        help="Probability of an HTTP 403 captcha response from SNCF Connect")
+    parser.add_argument("--page-size", type=int, default=5, help="Number of proposals per page")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of synthetic timetables and faults")
+    parser.add_argument("--recordings", metavar="DIR",
+                        help="Directory of recorded responses, served instead of synthetic ones")
+    parser.add_argument("-v", "--verbosity", action="store_true", help="Log every request")
+    args = parser.parse_args(arguments)
+    emulate(args.host, args.port, Emulator(args.latency, args.error_rate, args.captcha_rate, args.page_size,
+                                           args.seed, args.recordings), args.verbosity)
 
 
 def main():
     """
     Main function
     """
+    subcommands = {'query': query_command, 'crawl': crawl_command, 'serve': serve_command,
+                   'emulate': emulate_command, 'explore': explore_command}
+    if len(argv) > 1 and argv[1] in subcommands:
+        subcommands[argv[1]](argv[2:])
+        return
+
     parser = ArgumentParser(add_help=False)
     parser.add_argument("--statistics", action="store_true", help="Show only account statistics")
+    parser.add_argument("--trips-history", metavar="FILE", default=TRIPS_HISTORY_PATH,
+                        help="Keep past trips and statistics totals in FILE (default: %(default)s), so that"
+                             " --statistics only analyzes new or changed trips")
+    parser.add_argument("--offline", action="store_true",
+                        help="Show statistics from the trips history without requesting trips (with --statistics)")
+    parser.add_argument("--batch", metavar="FILE", help="Search all routes of a YAML/CSV file with a shared plan")
+    parser.add_argument("--output", metavar="DIR", default="results", help="Directory of batch results")
+    parser.add_argument("--workers", type=int,
+                        help="Number of searches run at the same time (default: 1, 4 in batch mode)")
+    parser.add_argument("--store", metavar="DB",
+                        help=f"Record every search in a SQLite snapshot store (like {DEFAULT_PATH}),"
+                             " queried with 'main.py query'")
+    parser.add_argument("--hit-rates", metavar="FILE", nargs='?', const=HIT_RATES_PATH,
+                        help=f"Learn how often each segment has seats in FILE (default: {HIT_RATES_PATH}), and use it"
+                             " to order segments searches, skip hopeless ones and pick intermediate stations")
+    parser.add_argument("--negative-cache", metavar="FILE", nargs='?', const=NEGATIVE_CACHE_PATH,
+                        help=f"Remember in FILE (default: {NEGATIVE_CACHE_PATH}) segments searched without seats,"
+                             " their connections are not searched again for 10 minutes the day before departure"
+                             " up to a day a month ahead")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only show results")
+    parser.add_argument("-v", "--verbosity", action="store_true", help="Verbosity")
+    parser.add_argument("--debug", action="store_true", help="Debug")
+    parser.add_argument("--report", action="store_true",
+                        help="Print latencies per endpoint, sleep, network and parse time and cache hits at the end")
+    parser.add_argument("--report-file", metavar="FILE",
+                        help="Write the report at the end, in Prometheus text format if FILE ends with .prom, "
+                             "in JSON otherwise")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write nested timing spans of the search phases as a Chrome trace (chrome://tracing)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the most expensive functions and the peak memory at the end")
+    parser.add_argument("--profile-dump", metavar="FILE", help="Write the cProfile stats to FILE (with --profile)")
+    parser.add_argument("--emulator", metavar="URL",
+                        help="Send every request to the offline emulator started with 'main.py emulate'")
     args, _ = parser.parse_known_args()
 
+    if args.emulator:
+        use_emulator(args.emulator)
+
+    # reports are written even if the run is interrupted or fails, exit handlers run in reverse order
+    if args.profile:
+        profiler = Profiler(args.profile_dump)
+        profiler.start()
+        register(profiler.stop)
+    if args.trace:
+        tracer.start()
+        register(tracer.write, args.trace)
+    if args.report:
+        register(metrics.print)
+    if args.report_file:
+        register(metrics.write, args.report_file)
+
+    if args.verbosity:  # library modules report their progress with logging
+        basicConfig(level=INFO, format='%(message)s')
+
+    if args.store:
+        recorders.append(SnapshotStore(args.store))
+    hit_rates = None
+    if args.hit_rates:
+        hit_rates = HitRates(args.hit_rates)
+        recorders.append(hit_rates)
+        register(hit_rates.save)
+    negative_cache = None
+    if args.negative_cache:
+        negative_cache = NegativeCache(args.negative_cache)
+        recorders.append(negative_cache)
+        register(negative_cache.save)
+
     if args.statistics:
-        statistics = Statistics()
+        statistics = Statistics(TripHistory(args.trips_history), args.offline)
         statistics.show()
+        return
+
+    if args.batch:
+        planner = QueryPlanner(load_routes(args.batch), PromptOptions(verbosity=args.verbosity, quiet=args.quiet),
+                               workers=args.workers or 4)
+        QueryPlanner.write(planner.run(), args.output)
+        return
 
     parser.add_argument("stations", metavar="station", help="Station names", nargs=2)
     parser.add_argument("-t", "--timedelta", help="How many days from today", type=int, default=1)
@@ -213,33 +548,89 @@ def main():
                         action="store_true")
     parser.add_argument("--max-duration", type=int, help="Maximum duration of a journey",
                         default=600)
-    parser.add_argument("-q", "--quiet", action="store_true", help="Only show results")
-    parser.add_argument("-v", "--verbosity", action="store_true", help="Verbosity")
-    parser.add_argument("--debug", action="store_true", help="Debug")
+    parser.add_argument("--format", choices=list(RENDERERS),
+                        help="Output format: JSON lines, CSV or Arrow rows streamed day by day, or rich tables")
+    parser.add_argument("--hours", type=SearchOptions.parse_hours, metavar="START-END",
+                        help="Only search departures in this hour window, like 7-12")
+    parser.add_argument("--watch", type=int, metavar="INTERVAL",
+                        help="Poll direct proposals every INTERVAL seconds and print only changes")
+    parser.add_argument("--threshold", type=int, help="Report when remaining seats cross this value (watch mode)")
+    parser.add_argument("--watch-state", metavar="FILE", help="Keep watch snapshots in this JSON file")
+    parser.add_argument("--on-change", metavar="CMD",
+                        help="Command to run on each change, with the change as JSON on stdin (watch mode)")
+    parser.add_argument("--jsonl", metavar="FILE", help="Append each change as a JSON line to FILE (watch mode)")
+    parser.add_argument("--return-after", type=int, metavar="DAYS",
+                        help="Also search the return journey DAYS days after each outbound day with an itinerary")
+    parser.add_argument("--return-period", type=int, default=1, metavar="N",
+                        help="Number of return days to search from the first one (with --return-after)")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Only search intermediate stations with TGV or Intercités connections in HAFAS"
+                             " timetables, the ones with the most connections first")
+    parser.add_argument("--radius", type=float, metavar="KM",
+                        help="Also search direct journeys from stations within KM of the departure"
+                             " and to stations within KM of the arrival")
+    parser.add_argument("--first-available", action="store_true",
+                        help="Print only the earliest of the --period days with a seat, direct journeys first,"
+                             " scanning a few days at once and cancelling the following days once one has a seat")
+    parser.add_argument("--explain", action="store_true",
+                        help="Print the planned searches with their estimated requests and time, without searching")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS",
+                        help="Stop searching after SECONDS and show what was found, direct proposals first")
+    parser.add_argument("--max-requests", type=int, metavar="N",
+                        help="Send at most N search requests to SNCF Connect and show what was found")
     parser.add_argument('-h', '--help', action='help', default=SUPPRESS,
                         help='Show this help message and exit.')
 
 
     autocomplete(parser)
     args = parser.parse_args()
-
-    display_proposals(args.stations[0],
-                      args.stations[1],
-                      args.period,
-                      args.timedelta,
-                      SearchOptions(
-                          via=args.via,
-                          max_duration=args.max_duration,
-                          berth_only=args.berth_only,
-                          direct_only=args.direct_only,
-                      ),
-                      PromptOptions(
-                          verbosity=args.verbosity,
-                          quiet=args.quiet,
-                          debug=args.debug,
-                          long=args.long,
-                      )
-                      )
+    # these modes print their results their own way
+    modes = {'--explain': args.explain, '--first-available': args.first_available,
+             '--return-after': args.return_after is not None, '--watch': args.watch is not None}
+    for option, enabled in modes.items():
+        if args.format and enabled:
+            parser.error(f"--format can't be used with {option}")
+
+    search_opts = SearchOptions(
+        via=args.via,
+        max_duration=args.max_duration,
+        berth_only=args.berth_only,
+        direct_only=args.direct_only,
+        hours=args.hours,
+        hit_rates=hit_rates,
+        negative_cache=negative_cache,
+        prefilter=args.prefilter,
+        radius=args.radius,
+        # a budget is spent once, watch mode polls again and again
+        budget=Budget(args.deadline, args.max_requests) if (args.deadline or args.max_requests) and not args.watch
+        else None,
+    )
+    prompt_opts = PromptOptions(
+        verbosity=args.verbosity,
+        # progress bars would be mixed with machine-readable output
+        quiet=args.quiet or args.format not in (None, 'table'),
+        debug=args.debug,
+        long=args.long,
+    )
+
+    if args.explain:
+        explain_proposals(args.stations[0], args.stations[1], args.period, args.timedelta,
+                          search_opts, prompt_opts, args.store)
+    elif args.first_available:
+        display_first_available(args.stations[0], args.stations[1], args.period, args.timedelta,
+                                search_opts, prompt_opts, args.workers or IN_FLIGHT)
+    elif args.return_after is not None:
+        display_round_trip(args.stations[0], args.stations[1], args.period, args.timedelta, args.return_after,
+                           args.return_period, search_opts, prompt_opts, args.workers or 1)
+    elif args.watch:
+        watch_proposals(args.stations[0], args.stations[1], args.period, args.timedelta, args,
+                        search_opts, prompt_opts)
+    elif args.format:
+        render_proposals(args.stations[0], args.stations[1], args.period, args.timedelta, args.format,
+                         search_opts, prompt_opts, args.workers or 1)
+    else:
+        display_proposals(args.stations[0], args.stations[1], args.period, args.timedelta,
+                          search_opts, prompt_opts, args.workers or 1)
 
 
 if __name__ == '__main__':
@@ -249,3 +640,11 @@ if __name__ == '__main__':
     except KeyboardInterrupt:  # Catch CTRL-C
         print('Interrupted')
         sys_exit(1)
+    except SNCFConnectError as error:
+        console.print(f"Error: HTTP {error.status_code}", style='red')
+        if error.captcha_url:
+            print("Let's try to resolve the captcha, then update your cookies in the .env file")
+            resolve(error.captcha_url)
+        sys_exit(str(error))
+    except StatisticsError as error:
+        sys_exit(str(error))
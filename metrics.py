@@ -0,0 +1,207 @@
+"""
+Code related to the instrumentation of outbound requests and the run report (--report)
+"""
+import json
+import os
+import re
+from contextlib import contextmanager
+from statistics import quantiles
+from threading import Lock
+from time import perf_counter
+from urllib.parse import urlparse
+
+from rich.console import Console
+from rich.table import Table
+
+from cache import station_codes, station_identifiers, station_coordinates, direct_destinations, segments, timetables
+
+# URL part -> endpoint label, other URLs are labelled with their host and path.
+# Hosts are not part of SNCF Connect labels, so that calls to the offline emulator have the same labels
+ENDPOINT_LABELS = {
+    '/bff/api/v1/itineraries': 'itineraries',
+    '/bff/api/v1/autocomplete': 'autocomplete',
+    '/bff/api/v1/trips': 'trips',
+    'direkt.bahn.guru/': 'direct_destinations',
+}
+
+CACHES = {
+    'station_codes': station_codes,
+    'station_identifiers': station_identifiers,
+    'station_coordinates': station_coordinates,
+    'direct_destinations': direct_destinations,
+    'timetables': timetables,
+    'segments': segments,
+}
+
+
+def endpoint_name(url: str) -> str:
+    """
+    Returns the label of a request URL, identifiers in the path are not part of it
+    """
+    parsed = urlparse(url)
+    address = parsed.netloc + parsed.path
+    for part, label in ENDPOINT_LABELS.items():
+        if part in address:
+            return label
+    return re.sub(r'/\d+', '/{id}', address)
+
+
+def percentile(values: [float], percent: int) -> float:
+    """
+    Returns a percentile of values, with linear interpolation
+    """
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+class EndpointStats:
+    """
+    Calls of one endpoint
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.bytes = 0
+        self.retries = 0
+
+    def to_dict(self) -> dict:
+        """
+        Returns the endpoint statistics as a JSON serializable dict
+        """
+        return {'count': len(self.latencies), 'statuses': self.statuses, 'bytes': self.bytes,
+                'retries': self.retries, 'seconds': round(sum(self.latencies), 6),
+                'p50': round(percentile(self.latencies, 50), 6), 'p95': round(percentile(self.latencies, 95), 6)}
+
+
+class Metrics:
+    """
+    Latency, status, size and retries of every outbound call, and the time spent
+    sleeping in the rate limiter or parsing responses
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self.timers = {'sleep': 0.0, 'parse': 0.0}
+        self._lock = Lock()
+
+    def observe(self, endpoint: str, seconds: float, status, size: int = 0, retries: int = 0) -> None:
+        """
+        Record one outbound call
+        :param endpoint: endpoint label
+        :param seconds: time spent waiting for the response
+        :param status: HTTP status code, or 'error' if no response was received
+        :param size: number of bytes of the response body
+        :param retries: number of retries before the response
+        """
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.latencies.append(seconds)
+            stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+            stats.bytes += size
+            stats.retries += retries
+
+    @contextmanager
+    def measure(self, endpoint: str):
+        """
+        Record the call made in the block, for clients which don't use the shared session
+        """
+        start = perf_counter()
+        status = 'error'
+        try:
+            yield
+            status = 'ok'
+        finally:
+            self.observe(endpoint, perf_counter() - start, status)
+
+    def add_time(self, timer: str, seconds: float) -> None:
+        """
+        Add seconds to a timer, like 'sleep' for the rate limiter
+        """
+        with self._lock:
+            self.timers[timer] = self.timers.get(timer, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, timer: str):
+        """
+        Add the time spent in the block to a timer
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(timer, perf_counter() - start)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the run report as a JSON serializable dict
+        """
+        with self._lock:
+            endpoints = {endpoint: stats.to_dict() for endpoint, stats in self.endpoints.items()}
+            timers = dict(self.timers)
+        timers['network'] = sum(stats['seconds'] for stats in endpoints.values())
+        return {'endpoints': endpoints,
+                'time': {timer: round(seconds, 6) for timer, seconds in timers.items()},
+                'caches': {name: {'hits': cache.hits, 'misses': cache.misses} for name, cache in CACHES.items()}}
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the run report in the Prometheus text format, for the node exporter textfile collector
+        """
+        report = self.to_dict()
+        lines = ['# TYPE tgvmax_requests_total counter']
+        lines += [f'tgvmax_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}'
+                  for endpoint, stats in report['endpoints'].items() for status, count in stats['statuses'].items()]
+        lines.append('# TYPE tgvmax_request_seconds summary')
+        for endpoint, stats in report['endpoints'].items():
+            lines += [f'tgvmax_request_seconds{{endpoint="{endpoint}",quantile="0.5"}} {stats["p50"]}',
+                      f'tgvmax_request_seconds{{endpoint="{endpoint}",quantile="0.95"}} {stats["p95"]}',
+                      f'tgvmax_request_seconds_sum{{endpoint="{endpoint}"}} {stats["seconds"]}',
+                      f'tgvmax_request_seconds_count{{endpoint="{endpoint}"}} {stats["count"]}']
+        lines.append('# TYPE tgvmax_response_bytes_total counter')
+        lines += [f'tgvmax_response_bytes_total{{endpoint="{endpoint}"}} {stats["bytes"]}'
+                  for endpoint, stats in report['endpoints'].items()]
+        lines.append('# TYPE tgvmax_retries_total counter')
+        lines += [f'tgvmax_retries_total{{endpoint="{endpoint}"}} {stats["retries"]}'
+                  for endpoint, stats in report['endpoints'].items()]
+        lines.append('# TYPE tgvmax_time_seconds counter')
+        lines += [f'tgvmax_time_seconds{{kind="{timer}"}} {seconds}' for timer, seconds in report['time'].items()]
+        lines.append('# TYPE tgvmax_cache_requests_total counter')
+        for name, cache in report['caches'].items():
+            lines += [f'tgvmax_cache_requests_total{{cache="{name}",result="hit"}} {cache["hits"]}',
+                      f'tgvmax_cache_requests_total{{cache="{name}",result="miss"}} {cache["misses"]}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """
+        Write the run report to a file, in the Prometheus text format if its extension is .prom, in JSON otherwise.
+        The file is replaced atomically, so that a collector never reads a partial report
+        """
+        content = self.to_prometheus() if path.endswith('.prom') else json.dumps(self.to_dict(), indent=2)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(path + '.tmp', path)
+
+    def print(self) -> None:
+        """
+        Print the run report on stderr, so that it is not mixed with results
+        """
+        report = self.to_dict()
+        table = Table(title='Requests', title_justify='left')
+        for column in ('Endpoint', 'Calls', 'Statuses', 'Retries', 'KiB', 'p50 (s)', 'p95 (s)', 'Total (s)'):
+            table.add_column(column, no_wrap=True, justify='left' if column in ('Endpoint', 'Statuses') else 'right')
+        for endpoint, stats in report['endpoints'].items():
+            table.add_row(endpoint, str(stats['count']),
+                          ' '.join(f'{status}:{count}' for status, count in stats['statuses'].items()),
+                          str(stats['retries']), f"{stats['bytes'] / 1024:.1f}",
+                          f"{stats['p50']:.3f}", f"{stats['p95']:.3f}", f"{stats['seconds']:.3f}")
+        console = Console(stderr=True)
+        console.print(table)
+        console.print('Time: ' + ', '.join(f'{timer} {seconds:.3f} s' for timer, seconds in report['time'].items()))
+        console.print('Caches: ' + ', '.join(f"{name} {cache['hits']} hits / {cache['misses']} misses"
+                                             for name, cache in report['caches'].items()))
+
+
+# Metrics of every call of the process
+metrics = Metrics()
@@ -4,7 +4,7 @@ Related code to proposal composed by several segments <=> Multiple proposal
 from typing import TYPE_CHECKING
 
 from proposal import console
-from options import SearchOptions, PromptOptions
+from options import SearchOptions
 
 if TYPE_CHECKING:
     from proposal import Proposal
@@ -59,27 +59,22 @@ class MultipleProposals:
             f'| {second.display_seats() if second.get_remaining_seats() < first.get_remaining_seats() else first.display_seats()} ', style='default'+background_style
         )
 
+    def to_dict(self) -> dict:
+        """
+        Returns the multiple proposal as a JSON serializable dict
+        :return: dict with the list of segments
+        """
+        return {'segments': [proposal.to_dict() for proposal in self.proposals]}
+
     @staticmethod
-    def display(segment1, segment2, search_opts: SearchOptions, prompt_opts: PromptOptions) -> None:
+    def join(segment1, segment2) -> ['MultipleProposals']:
         """
-        Display segments of multiple proposal
+        Returns all physically possible connections between proposals of two segments
         :param segment1: list of proposals for the first segment
         :param segment2: list of proposals for the second segment
-        :param search_opts: search options provided by the user
-        :param prompt_opts: prompt options provided by the user
-
-        :return:
+        :return: list of MultipleProposals objects
         """
-        background = 0
-        proposal_found = False
-        for proposal_1 in segment1:
-            for proposal_2 in segment2:
-                if proposal_2.departure_date > proposal_1.arrival_date:
-                    if not proposal_found and prompt_opts.verbosity:
-                        print("Segments 1 & 2 combined :")
-                    MultipleProposals(proposal_1, proposal_2).print(search_opts, background%2==0)
-                    proposal_found = True
-                    background+=1
-
-        if not proposal_found and prompt_opts.verbosity:
-            print("Connection is physically impossible between available proposals")
+        return [MultipleProposals(proposal_1, proposal_2)
+                for proposal_1 in segment1
+                for proposal_2 in segment2
+                if proposal_2.departure_date > proposal_1.arrival_date]
@@ -0,0 +1,101 @@
+"""
+Code related to the stations near the departure or arrival station (--radius), ex: Lyon Saint-Exupéry TGV for Lyon
+or Marne-la-Vallée Chessy for Paris, found with a grid of geographic cells instead of measuring every distance
+"""
+from logging import getLogger
+from math import cos, floor, radians
+from typing import Iterable
+
+from direct_destination import DirectDestination
+from station import Station, great_circle_distance
+
+logger = getLogger(__name__)
+
+# Size of the cells of the grid in degrees, about 55 km of latitude by 40 km of longitude in France
+CELL_SIZE = 0.5
+KM_PER_DEGREE = 111.2  # length of a degree of latitude
+
+
+class SpatialIndex:
+    """
+    Stations bucketed by cell of a latitude and longitude grid, only the cells around a point are looked at
+    to find the stations within a radius
+    """
+    cell_size: float
+    buckets: dict[tuple[int, int], list[Station]]
+
+    def __init__(self, stations: Iterable[Station] = (), cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self.buckets = {}
+        for station in stations:
+            self.add(station)
+
+    def cell(self, coordinates: tuple[float]) -> tuple[int, int]:
+        """
+        Returns the row and column of the cell of a (latitude, longitude) point
+        """
+        return floor(coordinates[0] / self.cell_size), floor(coordinates[1] / self.cell_size)
+
+    def add(self, station: Station) -> None:
+        """
+        Add a station with known coordinates to the index
+        """
+        self.buckets.setdefault(self.cell(station.coordinates), []).append(station)
+
+    def within(self, coordinates: tuple[float], radius: float) -> [tuple[float, Station]]:
+        """
+        Returns the stations within a radius of a point with their distance, nearest first
+        :param coordinates: (latitude, longitude) of the point
+        :param radius: distance as the crow flies in km
+        """
+        latitude_span = radius / KM_PER_DEGREE
+        # a degree of longitude shrinks with the latitude
+        longitude_span = radius / (KM_PER_DEGREE * max(cos(radians(coordinates[0])), 0.01))
+        first_row, first_column = self.cell((coordinates[0] - latitude_span, coordinates[1] - longitude_span))
+        last_row, last_column = self.cell((coordinates[0] + latitude_span, coordinates[1] + longitude_span))
+        found = []
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                for station in self.buckets.get((row, column), ()):
+                    distance = great_circle_distance(coordinates, station.coordinates)
+                    if distance <= radius:
+                        found.append((distance, station))
+        return sorted(found, key=lambda item: item[0])
+
+
+def find_alternatives(departure: Station, arrival: Station, dpt_direct_dest: DirectDestination,
+                      arr_direct_dest: DirectDestination, radius: float) -> [dict]:
+    """
+    Returns the French stations within a radius of the departure with a direct train to the arrival,
+    and the ones within a radius of the arrival with a direct train from the departure,
+    one per SNCF Connect code different from the departure and arrival ones, nearest first
+    :param departure: departure station with its code
+    :param arrival: arrival station with its code
+    :param dpt_direct_dest: direct destinations of the departure
+    :param arr_direct_dest: direct destinations of the arrival
+    :param radius: maximum distance in km
+    :return: dicts with the alternative station, its code, its distance, the end it replaces
+             ('departure' or 'arrival') and the dpt and arr stations of its search
+    """
+    destinations = dpt_direct_dest.destinations | arr_direct_dest.destinations
+    index = SpatialIndex(destination['station'] for destination in destinations.values()
+                         if destination['station'].coordinates is not None)
+    codes = {departure.code, arrival.code}
+    alternatives = []
+    for end, station, reachable in (('departure', departure, arr_direct_dest), ('arrival', arrival, dpt_direct_dest)):
+        station.get_coordinates()
+        for distance, nearby in index.within(station.coordinates, radius):
+            if nearby.identifier not in reachable.destinations or not nearby.is_in_france():
+                continue
+            try:
+                code = nearby.name_to_code()
+            except ValueError as error:
+                logger.info('%s skipped: %s', nearby.name, error)
+                continue
+            if not code or code[0] in codes:
+                continue
+            codes.add(code[0])
+            alternatives.append({'station': nearby, 'code': code[0], 'distance': distance, 'end': end,
+                                 'dpt': nearby if end == 'departure' else departure,
+                                 'arr': arrival if end == 'departure' else nearby})
+    return alternatives
@@ -0,0 +1,96 @@
+"""
+Code related to the segments recently searched without any TGVmax seat, not searched again until their entry expires
+"""
+import json
+import os
+from datetime import datetime
+from threading import Lock
+from time import time
+
+from proposal import Proposal
+
+DEFAULT_PATH = 'negative_cache.json'
+# Seconds an empty search is trusted, by number of days between the search and the departure (last day, seconds):
+# seats are often freed close to departure, far ones rarely change
+TTLS = [(1, 10 * 60), (7, 60 * 60), (30, 6 * 60 * 60), (10000, 24 * 60 * 60)]
+
+
+def ttl(day: datetime, now: datetime = None) -> int:
+    """
+    Returns the number of seconds an empty search of a day is trusted
+    """
+    days = (day.date() - (now or datetime.now()).date()).days
+    return next(seconds for last, seconds in TTLS if days <= last)
+
+
+class NegativeCache:
+    """
+    Expiry time of each segment, day, hour window and maximum duration searched without seats,
+    stored in a JSON file and updated after each search like the hit rates
+    """
+    path: str
+    expiries: dict[str, float]  # key -> expiry timestamp
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.expiries = {}
+        self._lock = Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                self.expiries = json.load(file)
+
+    @staticmethod
+    def key(dep_station: str, arr_station: str, day: datetime, hours: tuple[int, int] = None,
+            max_duration: int = None) -> str:
+        """
+        Returns the key of a segment search, for the whole day without hour window
+        """
+        window = 'day' if hours is None else f'{hours[0]}-{hours[1]}'
+        return f'{dep_station}-{arr_station}|{day.date().isoformat()}|{window}|{max_duration}'
+
+    def record(self, dep_station: str, arr_station: str, day: datetime, proposals: [Proposal], pages: int,
+               hours: tuple[int, int] = None, max_duration: int = None) -> None:
+        """
+        Remember a search without seats, forget it once seats are found
+        :param dep_station: departure station code
+        :param arr_station: arrival station code
+        :param day: day searched
+        :param proposals: proposals found
+        :param pages: number of pages requested, not used
+        :param hours: hour window of the search
+        :param max_duration: maximum duration of the proposals searched, longer ones were filtered out
+        """
+        key = NegativeCache.key(dep_station, arr_station, day, hours, max_duration)
+        with self._lock:
+            if proposals:
+                # no window of the day is without seats anymore, at least for longer maximum durations
+                prefix = f'{dep_station}-{arr_station}|{day.date().isoformat()}|'
+                for stale in [stale for stale in self.expiries if stale.startswith(prefix)]:
+                    del self.expiries[stale]
+            else:
+                self.expiries[key] = time() + ttl(day)
+
+    def expiry(self, dep_station: str, arr_station: str, day: datetime, hours: tuple[int, int] = None,
+               max_duration: int = None) -> float:
+        """
+        Returns when a search without seats of a segment expires, None if it is not known to be without seats.
+        A whole day without seats has no seats in any hour window either
+        """
+        now = time()
+        with self._lock:
+            expiries = [self.expiries.get(NegativeCache.key(dep_station, arr_station, day, window, max_duration))
+                        for window in ({None, hours})]
+        expiries = [expiry for expiry in expiries if expiry is not None and expiry > now]
+        return max(expiries, default=None)
+
+    def save(self) -> None:
+        """
+        Write the entries not expired yet, the file is replaced atomically
+        """
+        now = time()
+        with self._lock:
+            content = json.dumps({key: expiry for key, expiry in self.expiries.items() if expiry > now},
+                                 indent=1, sort_keys=True)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(self.path + '.tmp', self.path)
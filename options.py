@@ -1,6 +1,11 @@
 """
 Code related to search and prompt options
 """
+from datetime import datetime
+
+from budget import Budget
+from heuristics import HitRates
+from negative_cache import NegativeCache
 
 class SearchOptions:
     """
@@ -11,13 +16,68 @@ class SearchOptions:
     long: bool = False
     direct_only: bool = False
     max_duration: int
+    hours: tuple[int, int] = None
+    budget: Budget = None
+    hit_rates: HitRates = None
+    until_found: bool = False
+    negative_cache: NegativeCache = None
+    prefilter: bool = False
+    radius: float = None
+    background: bool = False
 
     def __init__(self, via=None, max_duration=None, berth_only=False,
-                 direct_only=False) -> None:
+                 direct_only=False, hours=None, budget=None, hit_rates=None, until_found=False,
+                 negative_cache=None, prefilter=False, radius=None, background=False) -> None:
         self.via = via
         self.berth_only = berth_only
         self.direct_only = direct_only
         self.max_duration = max_duration
+        self.hours = hours
+        self.budget = budget
+        self.hit_rates = hit_rates
+        self.until_found = until_found  # stop paginating once a proposal is found, the earliest ones
+        self.negative_cache = negative_cache  # segments recently searched without seats are not searched again
+        self.prefilter = prefilter  # vias without connection in HAFAS timetables are not searched
+        self.radius = radius  # km around the departure and arrival where alternative stations are searched too
+        self.background = background  # requests only take request slots left free by other searches (prefetch)
+
+    @staticmethod
+    def parse_hours(hours: str) -> tuple[int, int]:
+        """
+        Parse an hour window given on command line
+        :param hours: window like '7-12', end hour excluded
+        :return: tuple (start hour, end hour)
+        """
+        start, end = (int(hour) for hour in hours.split('-'))
+        if not 0 <= start < end <= 24:
+            raise ValueError(f'Invalid hour window {hours}, expected START-END between 0 and 24')
+        return start, end
+
+    def window_start(self, day: datetime) -> datetime:
+        """
+        Returns the first departure date to search for a given day
+        :param day: day of departure
+        :return: day at the first hour of the window, or day unchanged without window
+        """
+        if self.hours is None:
+            return day
+        return day.replace(hour=self.hours[0], minute=0)
+
+    def is_in_window(self, departure_date: datetime) -> bool:
+        """
+        Check if a departure date is inside the hour window
+        :param departure_date: departure date of a proposal
+        :return: True if there is no window or if the departure is inside it
+        """
+        return self.hours is None or self.hours[0] <= departure_date.hour < self.hours[1]
+
+    def is_after_window(self, departure_date: datetime) -> bool:
+        """
+        Check if a departure date is beyond the end of the hour window
+        :param departure_date: departure date of a proposal
+        :return: True if next departures can't be in the window anymore
+        """
+        return self.hours is not None and departure_date.hour >= self.hours[1]
 
 
 class PromptOptions:
@@ -0,0 +1,168 @@
+"""
+Code related to the speculative prefetch of the searches likely to come next in the search service
+(serve --prefetch): the next day and the reverse direction of each segment searched are searched in the background
+with the request slots left free by other searches, to be answered from the segments cache
+"""
+from collections import deque
+from datetime import date, datetime, time, timedelta
+from logging import getLogger
+from threading import Condition, Thread
+from time import monotonic
+
+from cache import segments
+from options import SearchOptions, PromptOptions
+from search import get_available_seats
+
+logger = getLogger(__name__)
+
+# Number of last prefetches judged, and minimum share of them used by a search before they expire
+WINDOW = 20
+MIN_HIT_RATIO = 0.2
+# Seconds the prefetch is paused when its predictions are not used, doubled at each pause up to the maximum
+MIN_PAUSE = 10 * 60
+MAX_PAUSE = 6 * 60 * 60
+# Predictions waiting for a free request slot, the oldest ones are dropped
+MAX_PENDING = 50
+
+
+class Prefetcher:
+    """
+    Search the segments likely to be searched next in a background thread, idle request slots only,
+    and measure how many prefetched segments are used before they expire from the segments cache
+    """
+    pending: deque  # keys (departure code, arrival code, ISO day, hours, max duration) to prefetch, oldest first
+    prefetched: dict[tuple, float]  # key -> monotonic time of the prefetch, until used or expired
+    outcomes: deque  # whether each of the last prefetches was used
+    hits: int
+    misses: int
+    pause: float
+    paused_until: float
+
+    def __init__(self):
+        self.pending = deque(maxlen=MAX_PENDING)
+        self.prefetched = {}
+        self.outcomes = deque(maxlen=WINDOW)
+        self.hits = 0
+        self.misses = 0
+        self.pause = MIN_PAUSE
+        self.paused_until = 0.0
+        self._condition = Condition()
+        self._thread = None
+
+    @staticmethod
+    def predict(key: tuple) -> [tuple]:
+        """
+        Returns the keys likely to be searched after a key: the same segment the next day, like a search over
+        the following days or a via segment of a connection, and the reverse direction, like a return journey
+        """
+        dep_station, arr_station, day, hours, max_duration = key
+        next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+        return [(dep_station, arr_station, next_day, hours, max_duration),
+                (arr_station, dep_station, day, hours, max_duration)]
+
+    def observe(self, key: tuple) -> None:
+        """
+        Count a search answered by a prefetch, then queue the predictions following it
+        :param key: key of a search answered through the segments cache
+        """
+        with self._condition:
+            self.expire()
+            if self.prefetched.pop(key, None) is not None:
+                self.judge(True)
+            if monotonic() < self.paused_until:
+                return
+            for prediction in self.predict(key):
+                if prediction not in self.prefetched and prediction not in self.pending \
+                        and prediction not in segments:
+                    self.pending.append(prediction)
+            self._condition.notify()
+
+    def expire(self) -> None:
+        """
+        Count the prefetches expired from the segments cache without being used
+        """
+        now = monotonic()
+        for key, prefetched_at in list(self.prefetched.items()):
+            if segments.ttl is not None and now - prefetched_at > segments.ttl:
+                del self.prefetched[key]
+                self.judge(False)
+
+    def judge(self, used: bool) -> None:
+        """
+        Record whether a prefetch was used, and pause the prefetch when too few of the last ones were,
+        for longer and longer
+        """
+        self.outcomes.append(used)
+        if used:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if len(self.outcomes) < WINDOW:
+            return
+        if sum(self.outcomes) / WINDOW < MIN_HIT_RATIO:
+            logger.info('Only %s of the last %s prefetches used, prefetch paused for %s s',
+                        sum(self.outcomes), WINDOW, self.pause)
+            self.paused_until = monotonic() + self.pause
+            self.pause = min(self.pause * 2, MAX_PAUSE)
+            self.pending.clear()
+            self.outcomes.clear()
+        else:
+            self.pause = MIN_PAUSE
+
+    def prefetch(self, key: tuple) -> None:
+        """
+        Search a predicted segment into the segments cache, in the background
+        """
+        dep_station, arr_station, day, hours, max_duration = key
+        search_opts = SearchOptions(max_duration=max_duration, hours=hours, background=True)
+        day = datetime.combine(date.fromisoformat(day), time(0, 0, 1))
+        # a search waiting for this prefetch to finish uses it too
+        with self._condition:
+            self.prefetched[key] = monotonic()
+        try:
+            segments.get_or_compute(key, lambda: get_available_seats(dep_station, arr_station, day, search_opts,
+                                                                     PromptOptions(quiet=True)))
+        except Exception as error:  # pylint: disable=broad-except
+            # a failed prefetch is only a missed opportunity
+            logger.info('Prefetch of %s - %s %s failed: %s', dep_station, arr_station, day.date(), error)
+            with self._condition:
+                self.prefetched.pop(key, None)
+            return
+        with self._condition:
+            if key in self.prefetched:  # its expiry starts once it is stored
+                self.prefetched[key] = monotonic()
+
+    def run(self) -> None:
+        """
+        Prefetch the predictions forever, the most recent ones first
+        """
+        while True:
+            with self._condition:
+                while not self.pending:
+                    self._condition.wait()
+                key = self.pending.pop()
+            if key not in segments:
+                self.prefetch(key)
+
+    def start(self) -> None:
+        """
+        Start prefetching in a daemon thread, once per process
+        """
+        if self._thread is None:
+            self._thread = Thread(target=self.run, name='prefetch', daemon=True)
+            self._thread.start()
+
+    def to_dict(self) -> dict:
+        """
+        Returns the prefetch statistics as a JSON serializable dict
+        """
+        with self._condition:
+            self.expire()
+            judged = self.hits + self.misses
+            return {'hits': self.hits, 'unused': self.misses, 'waiting_use': len(self.prefetched),
+                    'hit_ratio': round(self.hits / judged, 3) if judged else None, 'pending': len(self.pending),
+                    'paused_for': round(max(0.0, self.paused_until - monotonic()), 1)}
+
+
+# Prefetcher of the process, started by serve --prefetch
+prefetcher = Prefetcher()
@@ -0,0 +1,90 @@
+"""
+Code related to the prefilter of intermediate stations with HAFAS timetables (--prefilter): connections via
+a station are only searched on SNCF Connect if TGV or Intercités trains of both segments can connect that day
+"""
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logging import getLogger
+
+from pyhafas.profile import DBProfile
+from pyhafas.types.exceptions import GeneralHafasError
+from requests import RequestException
+
+from cache import timetables
+from metrics import metrics
+from station import Station, client
+
+logger = getLogger(__name__)
+
+# HAFAS products of TGV and Intercités trains, the only ones available with TGVmax
+PRODUCTS = {product: product in ('long_distance_express', 'long_distance') for product in DBProfile.availableProducts}
+# Trains of a day asked to HAFAS, more than on any French high speed line
+MAX_JOURNEYS = 40
+# Timetables requested at the same time
+WORKERS = 4
+
+
+def timetable(departure: Station, arrival: Station, day: datetime, hours: tuple[int, int] = None) \
+        -> [tuple[datetime, datetime]]:
+    """
+    Returns the departure and arrival dates of TGV and Intercités trains without change of a day, by departure
+    :param departure: departure station with its identifier
+    :param arrival: arrival station with its identifier
+    :param day: day of departure
+    :param hours: hour window of departure
+    """
+    return timetables.get_or_compute((departure.identifier, arrival.identifier, day.date().isoformat(), hours),
+                                     lambda: fetch_timetable(departure, arrival, day, hours))
+
+
+def fetch_timetable(departure: Station, arrival: Station, day: datetime, hours: tuple[int, int] = None) \
+        -> [tuple[datetime, datetime]]:
+    """
+    Request the timetable of a day between two stations to HAFAS
+    """
+    start = day.replace(hour=hours[0] if hours else 0, minute=0, second=0)
+    with metrics.measure('hafas_journeys'):
+        journeys = client.journeys(departure.identifier, arrival.identifier, start, max_changes=0,
+                                   products=PRODUCTS, max_journeys=MAX_JOURNEYS)
+    trains = []
+    for journey in journeys:
+        departure_date = journey.legs[0].departure.replace(tzinfo=None)
+        arrival_date = journey.legs[-1].arrival.replace(tzinfo=None)
+        if departure_date.date() == day.date() and (hours is None or hours[0] <= departure_date.hour < hours[1]):
+            trains.append((departure_date, arrival_date))
+    return sorted(trains)
+
+
+def count_connections(first: [tuple[datetime, datetime]], second: [tuple[datetime, datetime]]) -> int:
+    """
+    Returns the number of physically possible connections between trains of two segments, like MultipleProposals.join
+    :param first: departure and arrival dates of the trains of the first segment
+    :param second: departure and arrival dates of the trains of the second segment, by departure
+    """
+    departures = [departure for departure, _ in second]
+    return sum(len(departures) - bisect_right(departures, arrival) for _, arrival in first)
+
+
+def connections(departure: Station, via: Station, arrival: Station, day: datetime,
+                hours: tuple[int, int] = None) -> int:
+    """
+    Returns the number of connections of a day via a station from HAFAS timetables, None if they are not available
+    """
+    try:
+        return count_connections(timetable(departure, via, day, hours), timetable(via, arrival, day, hours))
+    except (GeneralHafasError, RequestException) as error:
+        logger.info('No timetable via %s on %s: %s', via.name, day.date(), error)
+        return None
+
+
+def count_all(departure: Station, arrival: Station, vias: [Station], days: [datetime],
+              hours: tuple[int, int] = None) -> dict[tuple[str, datetime], int]:
+    """
+    Returns the number of connections of each via station and day, timetables being requested at the same time
+    :return: number of connections, None when unknown, by via station name and day
+    """
+    keys = [(via, day) for day in days for via in vias]
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        counts = executor.map(lambda key: connections(departure, key[0], arrival, key[1], hours), keys)
+        return {(via.name, day): count for (via, day), count in zip(keys, counts)}
@@ -0,0 +1,95 @@
+"""
+Code related to profiling hooks: nested timing spans (--trace) and cProfile with peak memory (--profile)
+"""
+import cProfile
+import json
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from os import getpid
+from sys import stderr
+from threading import get_ident
+from time import perf_counter
+
+
+class Tracer:
+    """
+    Record nested timing spans of the main phases, written as Chrome trace events
+    (open the file in chrome://tracing or https://ui.perfetto.dev)
+    """
+    enabled: bool
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._origin = perf_counter()
+
+    def start(self) -> None:
+        """
+        Start recording spans, the trace starts at 0
+        """
+        self.events = []
+        self._origin = perf_counter()
+        self.enabled = True
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """
+        Record the block as a span, spans opened inside it are nested in the trace
+        :param name: name of the phase
+        :param args: details shown with the span, like stations or page number
+        """
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            # complete events, timestamps and durations in microseconds
+            self.events.append({'name': name, 'ph': 'X', 'pid': getpid(), 'tid': get_ident(),
+                                'ts': round((start - self._origin) * 1e6, 3),
+                                'dur': round((perf_counter() - start) * 1e6, 3),
+                                'args': {key: str(value) for key, value in args.items()}})
+
+    def write(self, path: str) -> None:
+        """
+        Write recorded spans in the Chrome trace event format
+        """
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': sorted(self.events, key=lambda event: event['ts']),
+                       'displayTimeUnit': 'ms'}, file)
+
+
+class Profiler:
+    """
+    cProfile of the main thread and peak memory allocated by Python, with tracemalloc
+    """
+
+    def __init__(self, dump_path: str = None):
+        self.dump_path = dump_path
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        """
+        Start profiling and tracing memory allocations
+        """
+        tracemalloc.start()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        """
+        Stop profiling, print the most expensive functions and the peak memory on stderr,
+        and write the pstats dump if a path was given
+        """
+        self.profile.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if self.dump_path:
+            self.profile.dump_stats(self.dump_path)
+        pstats.Stats(self.profile, stream=stderr).sort_stats('cumulative').print_stats(25)
+        print(f'Peak memory allocated by Python: {peak / 1024 / 1024:.1f} MiB', file=stderr)
+
+
+# Tracer of the process, spans cost nothing until it is started (--trace)
+tracer = Tracer()
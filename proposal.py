@@ -3,17 +3,31 @@ Code related to train proposals
 """
 
 from datetime import datetime
-from sys import exit as sys_exit
 import requests
 
 from rich.console import Console
 
-from captcha import resolve
+from session import session
 from station import Station
 from config import Config
 
 console = Console()
 
+
+class SNCFConnectError(Exception):
+    """
+    Exception for requests refused by SNCF Connect
+    """
+    status_code: int
+    captcha_url: str
+
+    def __init__(self, status_code, text, captcha_url=None):
+        super().__init__(f'SNCF Connect refused the request: HTTP {status_code}')
+        self.status_code = status_code
+        self.text = text
+        self.captcha_url = captcha_url
+
+
 class ProposalMetadata:
     """
     Metadata fields for train Proposal
@@ -76,14 +90,14 @@ class Proposal:
         return remaining
 
     @staticmethod
-    def get_next(dpt_station, arr_station, dpt_date, verbosity) -> requests.Response:
+    def get_next(dpt_station, arr_station, dpt_date) -> requests.Response:
         """
         Get next proposal response from oui.sncf API
         :param dpt_station: departure station code (5 letters)
         :param arr_station: arrival station code (5 letters)
         :param dpt_date: departure date (YYYY-MM-DDTHH:MM:SS)
-        :param verbosity: enable verbosity
         :return: JSON response of the request
+        :raise SNCFConnectError: if the request is refused, with the captcha URL to resolve on HTTP 403
         """
 
         headers = {
@@ -152,17 +166,11 @@ class Proposal:
             'strictMode': False,
         }
 
-        response = requests.post('https://www.sncf-connect.com/bff/api/v1/itineraries',
-                                 headers=headers, json=data, timeout=10)
+        response = session.post(Config.SNCFCONNECT_URL + '/bff/api/v1/itineraries',
+                                headers=headers, json=data, timeout=10)
         if response.status_code != 200:
-            console.print(f"Error: HTTP {response.status_code}", style='red')
-            if verbosity:
-                print(response.text)
-            if response.status_code == 403:
-                print("Let's try to resolve the captcha and update your cookies")
-                datadome_cookie = resolve(response.json()['url'])
-                Config.update_cookies_from_dict("SNCFCONNECT_COOKIE", datadome_cookie)
-            sys_exit('Error in the request to get proposal')
+            captcha_url = response.json().get('url') if response.status_code == 403 else None
+            raise SNCFConnectError(response.status_code, response.text, captcha_url)
         return response
 
     @staticmethod
@@ -346,3 +354,35 @@ class Proposal:
         :return: number of seats
         """
         return max(self.metadata.remaining_seats.values())
+
+    def to_dict(self) -> dict:
+        """
+        Returns the proposal as a JSON serializable dict
+        :return: dict with proposal fields
+        """
+        return {
+            'departure_station': self.departure_station.name,
+            'departure_date': self.departure_date.isoformat(),
+            'arrival_station': self.arrival_station.name,
+            'arrival_date': self.arrival_date.isoformat(),
+            'duration': self.duration,
+            'transporter': self.metadata.transporter,
+            'vehicle_number': self.metadata.vehicle_number,
+            'remaining_seats': self.metadata.remaining_seats,
+            'min_price': self.metadata.min_price,
+        }
+
+    @staticmethod
+    def from_dict(proposal: dict) -> 'Proposal':
+        """
+        Returns a Proposal object from a dict built by to_dict
+        :param proposal: dict with proposal fields
+        :return: proposal object
+        """
+        return Proposal(proposal['duration'],
+                        datetime.fromisoformat(proposal['departure_date']),
+                        Station(proposal['departure_station']),
+                        datetime.fromisoformat(proposal['arrival_date']),
+                        Station(proposal['arrival_station']),
+                        ProposalMetadata(proposal['transporter'], proposal['vehicle_number'],
+                                         proposal['remaining_seats'], proposal['min_price']))
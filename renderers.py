@@ -0,0 +1,220 @@
+"""
+Code related to output formats of search results, machine-readable rows or batched rich tables
+"""
+import csv
+import json
+import sys
+from abc import ABC, abstractmethod
+from typing import Iterator, TextIO
+
+from rich.table import Table
+
+from api import DayResult
+from multiple_proposals import MultipleProposals
+from proposal import Proposal, console
+
+FIELDS = ['date', 'kind', 'via', 'departure_station', 'departure_date', 'arrival_station', 'arrival_date',
+          'duration', 'transporter', 'vehicle_number', 'seats', 'seats_label']
+
+
+def has_berth(proposal: Proposal) -> bool:
+    """
+    For the berth only option, Intercites de Nuit proposals without a berth are excluded
+    """
+    return proposal.metadata.transporter != 'IC NUIT' or 'berths' in proposal.metadata.remaining_seats
+
+
+def direct_row(day: str, proposal: Proposal, kind: str = 'direct') -> dict:
+    """
+    Returns the row of a direct proposal, 'nearby' ones being from or to an alternative station
+    """
+    return {'date': day, 'kind': kind, 'via': None,
+            'departure_station': proposal.departure_station.display_name,
+            'departure_date': proposal.departure_date.isoformat(),
+            'arrival_station': proposal.arrival_station.display_name,
+            'arrival_date': proposal.arrival_date.isoformat(),
+            'duration': proposal.duration,
+            'transporter': proposal.metadata.transporter,
+            'vehicle_number': proposal.metadata.vehicle_number,
+            'seats': proposal.get_remaining_seats(),
+            'seats_label': proposal.display_seats()}
+
+
+def connection_row(day: str, via: str, connection: MultipleProposals) -> dict:
+    """
+    Returns the row of a connection, seats are the ones of the most limiting segment
+    """
+    first, last = connection.proposals[0], connection.proposals[-1]
+    limiting = min(connection.proposals, key=Proposal.get_remaining_seats)
+    return {'date': day, 'kind': 'indirect', 'via': via,
+            'departure_station': first.departure_station.display_name,
+            'departure_date': first.departure_date.isoformat(),
+            'arrival_station': last.arrival_station.display_name,
+            'arrival_date': last.arrival_date.isoformat(),
+            'duration': int((last.arrival_date - first.departure_date).total_seconds() // 60),
+            'transporter': '+'.join(proposal.metadata.transporter for proposal in connection.proposals),
+            'vehicle_number': '+'.join(proposal.metadata.vehicle_number for proposal in connection.proposals),
+            'seats': limiting.get_remaining_seats(),
+            'seats_label': limiting.display_seats()}
+
+
+def iter_rows(result: DayResult, berth_only: bool = False) -> Iterator[dict]:
+    """
+    Yield one row per direct proposal, then per nearby direct proposal, then per connection of a day
+    """
+    day = result.day.date().isoformat()
+    for proposal in result.direct:
+        if not berth_only or has_berth(proposal):
+            yield direct_row(day, proposal)
+    for proposals in result.nearby.values():
+        for proposal in proposals:
+            if not berth_only or has_berth(proposal):
+                yield direct_row(day, proposal, 'nearby')
+    for via, connections in result.indirect.items():
+        for connection in connections:
+            if not berth_only or all(has_berth(proposal) for proposal in connection.proposals):
+                yield connection_row(day, via, connection)
+
+
+class Renderer(ABC):
+    """
+    Write results day by day, as soon as each day is searched
+    """
+    berth_only: bool
+
+    def __init__(self, stream: TextIO = None, berth_only: bool = False):
+        self.stream = stream or sys.stdout
+        self.berth_only = berth_only
+
+    @abstractmethod
+    def write_day(self, result: DayResult) -> None:
+        """
+        Write all rows of a day
+        """
+
+    def close(self) -> None:
+        """
+        Write what remains buffered
+        """
+        self.stream.flush()
+
+
+class RowRenderer(Renderer):
+    """
+    Write the rows of a day one by one
+    """
+
+    def write_day(self, result: DayResult) -> None:
+        for row in iter_rows(result, self.berth_only):
+            self.write_row(row)
+        self.stream.flush()
+
+    @abstractmethod
+    def write_row(self, row: dict) -> None:
+        """
+        Write one row
+        """
+
+
+class JsonLinesRenderer(RowRenderer):
+    """
+    One JSON object per line
+    """
+
+    def write_row(self, row: dict) -> None:
+        self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+class CsvRenderer(RowRenderer):
+    """
+    CSV with a header line
+    """
+
+    def __init__(self, stream: TextIO = None, berth_only: bool = False):
+        super().__init__(stream, berth_only)
+        self.writer = csv.DictWriter(self.stream, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write_row(self, row: dict) -> None:
+        self.writer.writerow(row)
+
+
+class ArrowRenderer(Renderer):
+    """
+    Apache Arrow IPC stream, one record batch per day (requires pyarrow)
+    """
+
+    def __init__(self, stream=None, berth_only: bool = False):
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            raise ImportError('pyarrow is required for the arrow format, use jsonl or csv instead') from None
+        super().__init__(stream or sys.stdout.buffer, berth_only)
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([
+            ('date', pyarrow.string()), ('kind', pyarrow.string()), ('via', pyarrow.string()),
+            ('departure_station', pyarrow.string()), ('departure_date', pyarrow.string()),
+            ('arrival_station', pyarrow.string()), ('arrival_date', pyarrow.string()),
+            ('duration', pyarrow.int32()), ('transporter', pyarrow.string()),
+            ('vehicle_number', pyarrow.string()), ('seats', pyarrow.int32()), ('seats_label', pyarrow.string())])
+        self.writer = pyarrow.ipc.new_stream(self.stream, self.schema)
+
+    def write_day(self, result: DayResult) -> None:
+        rows = list(iter_rows(result, self.berth_only))
+        if rows:
+            self.writer.write_batch(self.pyarrow.RecordBatch.from_pylist(rows, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+        super().close()
+
+
+class TableRenderer(Renderer):
+    """
+    One rich table per section (direct journeys, nearby ones, then each via station), printed at once
+    """
+    long: bool
+
+    def __init__(self, stream: TextIO = None, berth_only: bool = False, long: bool = False):
+        super().__init__(stream, berth_only)
+        self.long = long
+        self.console = console if stream is None else type(console)(file=stream)
+
+    def table(self, title: str, rows: [dict]) -> Table:
+        """
+        Returns a table of rows
+        """
+        table = Table(title=title, title_justify='left', row_styles=['on rgb(0,83,167)', 'on rgb(4,39,112)'])
+        # fixed widths spare rich the measurement of every cell
+        table.add_column('Departure', width=23, no_wrap=True)
+        table.add_column('', style='bold yellow', width=5, no_wrap=True)
+        table.add_column('Arrival', width=23, no_wrap=True)
+        table.add_column('', style='bold yellow', width=5, no_wrap=True)
+        if self.long:
+            table.add_column('Transporter', width=10, no_wrap=True)
+            table.add_column('Number', width=11, no_wrap=True)
+        table.add_column('Seats', width=30, no_wrap=True)
+        for row in rows:
+            cells = [row['departure_station'], row['departure_date'][11:16],
+                     row['arrival_station'], row['arrival_date'][11:16]]
+            if self.long:
+                cells += [row['transporter'], row['vehicle_number']]
+            table.add_row(*cells, row['seats_label'])
+        return table
+
+    def write_day(self, result: DayResult) -> None:
+        sections = {}
+        for row in iter_rows(result, self.berth_only):
+            sections.setdefault((row['kind'], row['via']), []).append(row)
+        day = result.day.strftime('%c')
+        titles = {'direct': 'direct', 'nearby': 'direct from or to nearby stations'}
+        for (kind, via), rows in sections.items():
+            self.console.print(self.table(f'{day} — ' + (f'via {via}' if via else titles[kind]), rows))
+
+
+RENDERERS = {
+    'jsonl': JsonLinesRenderer,
+    'csv': CsvRenderer,
+    'arrow': ArrowRenderer,
+    'table': TableRenderer,
+}
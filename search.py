@@ -0,0 +1,113 @@
+"""
+Code related to the search of available seats on SNCF Connect
+"""
+from datetime import datetime
+
+from alive_progress import alive_bar
+
+from cache import segments
+from metrics import metrics
+from options import SearchOptions, PromptOptions
+from profiling import tracer
+from proposal import Proposal
+from throttle import limiter
+
+# Objects with a record(dep_station, arr_station, day, proposals, pages, hours, max_duration) method,
+# notified after each search, like the snapshot store (--store) or the hit rates (--hit-rates)
+recorders = []
+# Objects with an observe(key) method, notified after each search answered through the segments cache,
+# like the prefetcher (serve --prefetch)
+observers = []
+
+
+def get_available_seats(dep_station: str, arr_station: str, day: datetime,
+                        search_opts: SearchOptions, prompt_opts: PromptOptions) -> [Proposal]:
+    """
+    Returns train proposals for a given day
+    :param dep_station: station of departure
+    :param arr_station: station of arrival
+    :param day: date of departure wished
+    :param search_opts: search options specified by the user
+    :param prompt_opts: display options specified by the user
+
+    :return: List of journey 'Proposal' objects
+    """
+    all_proposals = []
+    pages = 1
+    # With a budget (--deadline, --max-requests), the search stops as soon as no request is left for it
+    budget = search_opts.budget
+    if budget is not None and not budget.spend():
+        budget.note(f'{dep_station} - {arr_station} {day.date()}')
+        return []
+    complete = True
+    # With an hour window (--hours), start directly at the first watched hour
+    # and stop paginating once the last page goes beyond the last watched hour
+    start = search_opts.window_start(day)
+    with alive_bar(title='Searching', stats=False, disable=prompt_opts.quiet, monitor="Page {count}") as progress_bar:
+        with tracer.span('throttle'):
+            metrics.add_time('sleep', limiter.wait(search_opts.background))
+        with tracer.span('page', dpt=dep_station, arr=arr_station, page=pages):
+            response = Proposal.get_next(dep_station, arr_station, start.strftime('%Y-%m-%dT%H:%M:00'))
+        progress_bar()  # pylint: disable=not-callable
+        if response:
+            with metrics.timed('parse'), tracer.span('parse'):
+                response_json = response.json()['longDistance']
+
+            if response_json is not None and response_json['proposals'] and response_json['proposals']['proposals']:
+                with metrics.timed('parse'), tracer.span('filter'):
+                    all_proposals = Proposal.filter(response_json['proposals']['proposals'],
+                                                    search_opts.max_duration)
+                if prompt_opts.debug:
+                    print(response_json['proposals'])
+                while response_json['proposals']['pagination']['next']['changeDay'] is False:
+                    last_timetable = Proposal.get_last_timetable(response)
+                    if search_opts.is_after_window(datetime.strptime(last_timetable, '%Y-%m-%dT%H:%M:%S')):
+                        break
+                    if search_opts.until_found and any(search_opts.is_in_window(proposal.departure_date)
+                                                       for proposal in all_proposals):
+                        complete = False
+                        break
+                    if budget is not None and not budget.spend(first_page=False):
+                        budget.note(f'{dep_station} - {arr_station} {day.date()} after {last_timetable[11:16]}')
+                        complete = False
+                        break
+                    with tracer.span('throttle'):
+                        metrics.add_time('sleep', limiter.wait(search_opts.background))
+                    pages += 1
+                    with tracer.span('page', dpt=dep_station, arr=arr_station, page=pages):
+                        response = Proposal.get_next(dep_station, arr_station, last_timetable)
+                    progress_bar()  # pylint: disable=not-callable
+                    with metrics.timed('parse'), tracer.span('filter'):
+                        response_json = response.json()['longDistance']
+                        all_proposals.extend(
+                            Proposal.filter(response_json['proposals']['proposals'], search_opts.max_duration))
+        progress_bar.title = 'Search has finished'
+    all_proposals = [proposal for proposal in all_proposals
+                     if search_opts.is_in_window(proposal.departure_date)]
+    all_proposals = Proposal.remove_duplicates(all_proposals, prompt_opts.verbosity) if all_proposals else []
+    if complete:  # a search stopped early would hide trains of the last pages
+        for recorder in recorders:
+            recorder.record(dep_station, arr_station, day, all_proposals, pages, search_opts.hours,
+                            search_opts.max_duration)
+    return all_proposals
+
+
+def get_cached_seats(dep_station: str, arr_station: str, day: datetime,
+                     search_opts: SearchOptions, prompt_opts: PromptOptions) -> [Proposal]:
+    """
+    Returns train proposals for a given day from the segments cache,
+    concurrent identical searches are coalesced into one search
+    :param dep_station: station of departure
+    :param arr_station: station of arrival
+    :param day: date of departure wished
+    :param search_opts: search options specified by the user
+    :param prompt_opts: display options specified by the user
+
+    :return: List of journey 'Proposal' objects
+    """
+    key = (dep_station, arr_station, day.date().isoformat(), search_opts.hours, search_opts.max_duration)
+    proposals = segments.get_or_compute(
+        key, lambda: get_available_seats(dep_station, arr_station, day, search_opts, prompt_opts))
+    for observer in observers:
+        observer.observe(key)
+    return proposals
@@ -0,0 +1,152 @@
+"""
+Code related to the local HTTP search service, answering in JSON with warm caches
+"""
+import json
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Lock
+from time import perf_counter
+from urllib.parse import urlparse, parse_qs
+
+from batch import BatchRoute, QueryPlanner
+from direct_destination import DirectDestination
+from options import PromptOptions
+from prefetch import prefetcher
+from station import Station
+
+
+class LatencyHistogram:
+    """
+    Cumulative histogram of request latencies, in seconds
+    """
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        self.counts = [0] * (len(LatencyHistogram.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, seconds: float) -> None:
+        """
+        Add a latency to the histogram
+        """
+        with self._lock:
+            self.counts[bisect_left(LatencyHistogram.BUCKETS, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def to_dict(self) -> dict:
+        """
+        Returns the histogram with cumulative bucket counts, as Prometheus does
+        """
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(LatencyHistogram.BUCKETS + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'count': self.count, 'sum': round(self.sum, 6), 'buckets': buckets}
+
+
+def search_endpoint(params: dict) -> dict:
+    """
+    /search?origin=Paris&destination=Lyon[&date=YYYY-MM-DD|&timedelta=N][&period=N][&via=X][&direct_only=true][&hours=7-12]
+    """
+    route = BatchRoute.from_row(params)
+    return QueryPlanner([route], PromptOptions(quiet=True)).run()[route.name]
+
+
+def stations_endpoint(params: dict) -> dict:
+    """
+    /stations?name=Lyon
+    """
+    station = Station(params['name'])
+    station.get_code()
+    station.get_identifier()
+    return {'name': station.name, 'code': station.code, 'formal_name': station.formal_name,
+            'identifier': station.identifier}
+
+
+def direct_destinations_endpoint(params: dict) -> list:
+    """
+    /direct-destinations?station=Lyon
+    """
+    station = Station(params['station'])
+    station.get_identifier()
+    destinations = DirectDestination.get(station).destinations.values()
+    return [{'name': destination['station'].name,
+             'identifier': destination['station'].identifier,
+             'coordinates': destination['station'].coordinates,
+             'duration': destination['duration']}
+            for destination in sorted(destinations, key=lambda destination: destination['duration'])]
+
+
+ENDPOINTS = {
+    '/search': search_endpoint,
+    '/stations': stations_endpoint,
+    '/direct-destinations': direct_destinations_endpoint,
+}
+
+histograms = {path: LatencyHistogram() for path in ENDPOINTS}
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handle GET requests of the search service
+    """
+    verbose = False
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Dispatch the request to its endpoint and answer in JSON
+        """
+        url = urlparse(self.path)
+        if url.path == '/metrics':
+            self.send_json(200, {path: histogram.to_dict() for path, histogram in histograms.items()}
+                           | {'prefetch': prefetcher.to_dict()})
+            return
+        if url.path not in ENDPOINTS:
+            self.send_json(404, {'error': f'Unknown endpoint {url.path}', 'endpoints': list(ENDPOINTS)})
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        start = perf_counter()
+        try:
+            status, body = 200, ENDPOINTS[url.path](params)
+        except KeyError as error:
+            status, body = 400, {'error': f'Missing parameter {error}'}
+        except ValueError as error:
+            status, body = 400, {'error': str(error)}
+        except Exception as error:  # pylint: disable=broad-except
+            # upstream errors must not stop the server
+            status, body = 502, {'error': str(error) or type(error).__name__}
+        histograms[url.path].observe(perf_counter() - start)
+        self.send_json(status, body)
+
+    def send_json(self, status: int, body) -> None:
+        """
+        Send a JSON response
+        """
+        content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def serve(host: str, port: int, verbose: bool = False) -> None:
+    """
+    Run the search service until interrupted
+    """
+    SearchRequestHandler.verbose = verbose
+    server = ThreadingHTTPServer((host, port), SearchRequestHandler)
+    print(f"Serving on http://{host}:{port} ({', '.join(ENDPOINTS)}, /metrics)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
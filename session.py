@@ -0,0 +1,41 @@
+"""
+Code related to the HTTP session shared by all requests of the process
+"""
+from http.cookiejar import DefaultCookiePolicy
+from time import perf_counter
+
+from requests import Session, RequestException
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from metrics import metrics, endpoint_name
+
+
+class MeasuredSession(Session):
+    """
+    Session recording latency, status, size and retries of every request in the process metrics
+    """
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        start = perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except RequestException:
+            metrics.observe(endpoint_name(url), perf_counter() - start, 'error')
+            raise
+        retries = getattr(response.raw, 'retries', None)
+        # a streamed body is read by the caller, its size is the announced one and its latency the headers one
+        size = int(response.headers.get('Content-Length', 0)) if kwargs.get('stream') else len(response.content)
+        metrics.observe(endpoint_name(url), perf_counter() - start, response.status_code, size,
+                        len(retries.history) if retries else 0)
+        return response
+
+
+session = MeasuredSession()
+# Keep connections open between requests, with enough of them for concurrent searches.
+# Only failed connections are retried, a request which reached the server is never sent twice
+retry = Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.5)
+session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+# Cookies are sent explicitly by each request, cookies set by responses are not kept
+session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
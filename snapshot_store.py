@@ -0,0 +1,211 @@
+"""
+Code related to the local history of seats availability, stored in a SQLite database
+"""
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from threading import Lock
+
+from cache import station_codes
+from proposal import Proposal
+
+DEFAULT_PATH = 'snapshots.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    scanned_at TEXT NOT NULL,
+    route TEXT NOT NULL,
+    departure_day TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    proposals INTEGER NOT NULL,
+    hours TEXT
+);
+CREATE INDEX IF NOT EXISTS scans_route ON scans (route, departure_day, scanned_at);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    scan_id INTEGER NOT NULL,
+    scanned_at TEXT NOT NULL,
+    route TEXT NOT NULL,
+    departure_date TEXT NOT NULL,
+    vehicle_number TEXT NOT NULL,
+    arrival_date TEXT NOT NULL,
+    departure_station TEXT NOT NULL,
+    arrival_station TEXT NOT NULL,
+    transporter TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    min_price REAL NOT NULL,
+    seats INTEGER NOT NULL,
+    remaining_seats TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_route ON snapshots (route, departure_date, vehicle_number);
+
+CREATE TABLE IF NOT EXISTS stations (
+    name TEXT PRIMARY KEY,
+    code TEXT NOT NULL
+);
+"""
+
+
+class SnapshotStore:
+    """
+    Timestamped snapshots of every search, queryable without network
+    """
+    path: str
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        # the same connection is shared by the threads of batch mode, writes are serialized by the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        # stores created before the hour window of scans was kept only have whole day scans
+        if 'hours' not in [column[1] for column in self.connection.execute('PRAGMA table_info(scans)')]:
+            self.connection.execute('ALTER TABLE scans ADD COLUMN hours TEXT')
+        self._lock = Lock()
+        self._known_stations = set()
+
+    @staticmethod
+    def route(dep_station: str, arr_station: str) -> str:
+        """
+        Returns the route key of a segment
+        :param dep_station: departure station code
+        :param arr_station: arrival station code
+        """
+        return f'{dep_station}-{arr_station}'
+
+    def record(self, dep_station: str, arr_station: str, day: datetime, proposals: [Proposal], pages: int,
+               hours: tuple[int, int] = None, max_duration: int = None) -> None:
+        """
+        Store the result of a search as one scan, even if no proposal was found
+        :param dep_station: departure station code
+        :param arr_station: arrival station code
+        :param day: day searched
+        :param proposals: proposals found
+        :param pages: number of pages requested
+        :param hours: hour window of the search, None for the whole day
+        :param max_duration: maximum duration of the proposals searched, not stored
+        """
+        self.record_many([(dep_station, arr_station, day, proposals, pages, hours)])
+
+    def record_many(self, searches: [tuple]) -> None:
+        """
+        Store several searches in a single transaction
+        :param searches: tuples of record() arguments, the hour window last and optional
+        """
+        scanned_at = datetime.now().isoformat()
+        with self._lock, self.connection:
+            for dep_station, arr_station, day, proposals, pages, *hours in searches:
+                route = SnapshotStore.route(dep_station, arr_station)
+                window = f'{hours[0][0]}-{hours[0][1]}' if hours and hours[0] is not None else None
+                scan_id = self.connection.execute(
+                    'INSERT INTO scans (scanned_at, route, departure_day, pages, proposals, hours)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (scanned_at, route, day.date().isoformat(), pages, len(proposals), window)).lastrowid
+                self.connection.executemany(
+                    'INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(scan_id, scanned_at, route,
+                      proposal.departure_date.isoformat(), proposal.metadata.vehicle_number,
+                      proposal.arrival_date.isoformat(), proposal.departure_station.name,
+                      proposal.arrival_station.name, proposal.metadata.transporter, proposal.duration,
+                      proposal.metadata.min_price, proposal.get_remaining_seats(),
+                      json.dumps(proposal.metadata.remaining_seats))
+                     for proposal in proposals])
+            self._record_stations()
+
+    def _record_stations(self) -> None:
+        """
+        Keep station names resolved during the run, so that queries can use names offline
+        """
+        new_stations = [(name, code_and_name[0]) for name, code_and_name in station_codes.items()
+                        if code_and_name and name not in self._known_stations]
+        self.connection.executemany('INSERT OR REPLACE INTO stations VALUES (?, ?)', new_stations)
+        self._known_stations.update(name for name, _ in new_stations)
+
+    def resolve(self, station_name: str) -> str:
+        """
+        Returns the code of a station name already searched, or the name itself if unknown (like FRPAR)
+        """
+        row = self.connection.execute('SELECT code FROM stations WHERE name = ?',
+                                      (station_name.lower(),)).fetchone()
+        return row[0] if row else station_name.upper()
+
+    def query(self, dpt_name: str, arr_name: str, day: datetime, max_age: int = None) -> [Proposal]:
+        """
+        Returns the trains of the last whole day scan of a route for a day, trains missing from it being sold out
+        or cancelled. Scans of an hour window (--hours) are not used, they miss the trains of the other hours
+        :param dpt_name: departure station name or code
+        :param arr_name: arrival station name or code
+        :param day: day of departure
+        :param max_age: ignore scans older than this number of minutes
+        :return: proposals of the last scan
+        """
+        route = SnapshotStore.route(self.resolve(dpt_name), self.resolve(arr_name))
+        since = (datetime.now() - timedelta(minutes=max_age)).isoformat() if max_age else ''
+        rows = self.connection.execute(
+            """
+            SELECT departure_station, departure_date, arrival_station, arrival_date, duration,
+                   transporter, vehicle_number, remaining_seats, min_price
+            FROM snapshots
+            WHERE scan_id = (
+                SELECT MAX(id) FROM scans
+                WHERE route = ? AND departure_day = ? AND scanned_at >= ? AND hours IS NULL
+            )
+            ORDER BY departure_date
+            """,
+            (route, day.date().isoformat(), since)).fetchall()
+        return [Proposal.from_dict({
+            'departure_station': row[0], 'departure_date': row[1], 'arrival_station': row[2],
+            'arrival_date': row[3], 'duration': row[4], 'transporter': row[5], 'vehicle_number': row[6],
+            'remaining_seats': json.loads(row[7]), 'min_price': row[8]}) for row in rows]
+
+    def scan_statistics(self, dep_station: str = None, arr_station: str = None) -> (int, float, float, str):
+        """
+        Returns statistics of the scans of a route, or of all routes without stations
+        :param dep_station: departure station code
+        :param arr_station: arrival station code
+        :return: number of scans, mean number of pages, share of scans with proposals and date of the last scan,
+        None instead of the last three values without any scan
+        """
+        if dep_station is None:
+            where, parameters = '', ()
+        else:
+            where, parameters = 'WHERE route = ?', (SnapshotStore.route(dep_station, arr_station),)
+        return tuple(self.connection.execute(
+            f'SELECT COUNT(*), AVG(pages), AVG(proposals > 0), MAX(scanned_at) FROM scans {where}',
+            parameters).fetchone())
+
+    def apply_retention(self, days: int) -> int:
+        """
+        Delete snapshots and scans older than a number of days
+        :return: number of deleted snapshots
+        """
+        limit = (datetime.now() - timedelta(days=days)).isoformat()
+        with self._lock, self.connection:
+            deleted = self.connection.execute('DELETE FROM snapshots WHERE scanned_at < ?', (limit,)).rowcount
+            self.connection.execute('DELETE FROM scans WHERE scanned_at < ?', (limit,))
+        return deleted
+
+    def compact(self, older_than_hours: int = 24) -> int:
+        """
+        Keep only the last snapshot per train and per hour for snapshots older than a number of hours
+        :return: number of deleted snapshots
+        """
+        limit = (datetime.now() - timedelta(hours=older_than_hours)).isoformat()
+        with self._lock, self.connection:
+            deleted = self.connection.execute(
+                """
+                DELETE FROM snapshots WHERE scanned_at < ? AND rowid NOT IN (
+                    SELECT MAX(rowid) FROM snapshots WHERE scanned_at < ?
+                    GROUP BY route, departure_date, vehicle_number, substr(scanned_at, 1, 13)
+                )
+                """, (limit, limit)).rowcount
+        self.connection.execute('VACUUM')
+        return deleted
+
+    def close(self) -> None:
+        """
+        Close the database connection
+        """
+        self.connection.close()
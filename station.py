@@ -1,18 +1,33 @@
 """
 Code related to train stations
 """
+from math import asin, cos, radians, sin, sqrt
 from typing import TYPE_CHECKING
 
-import requests
 from pyhafas import HafasClient
 from pyhafas.profile import DBProfile
 
+from cache import station_codes, station_identifiers, station_coordinates
+from config import Config
+from metrics import metrics
+from session import session
+
 client = HafasClient(DBProfile())
+client.profile.baseUrl = Config.HAFAS_URL
 
 if TYPE_CHECKING:
     from direct_destination import DirectDestination
 
 
+def great_circle_distance(coordinates_1: tuple[float], coordinates_2: tuple[float]) -> float:
+    """
+    Returns the distance between two (latitude, longitude) points, in km
+    """
+    lat_1, lon_1, lat_2, lon_2 = map(radians, (*coordinates_1, *coordinates_2))
+    return 2 * 6371 * asin(sqrt(sin((lat_2 - lat_1) / 2) ** 2
+                                + cos(lat_1) * cos(lat_2) * sin((lon_2 - lon_1) / 2) ** 2))
+
+
 class Station:
     """
     Class for a station.
@@ -42,6 +57,13 @@ class Station:
         # See https://en.wikipedia.org/wiki/List_of_UIC_country_codes
         return self.identifier[:2] == '87'
 
+    def is_paris(self):
+        """
+        Check if the station is one of Paris stations, all of them share the FRPAR code on SNCF Connect
+        :return: True if the station is in Paris, False otherwise
+        """
+        return self.name.lower().startswith('paris') or self.code in ('FRPAR', PARIS['station'].code)
+
     # noinspection SpellCheckingInspection
     def name_to_code(self) -> (str, str) or None:
         """
@@ -97,11 +119,20 @@ class Station:
     @staticmethod
     def get_station_code(station_name):
         """
-        Get the station code from the station name
+        Get the station code from the station name, looked up once per process
         The station code is necessary to request SNCF Connect API
         :param station_name: Station official name
         :return: Station code (5 letters), exemple FRPAR for all Paris Stations
         """
+        return station_codes.get_or_compute(station_name, lambda: Station.fetch_station_code(station_name))
+
+    @staticmethod
+    def fetch_station_code(station_name):
+        """
+        Request the station code matching the station name to SNCF Connect autocomplete API
+        :param station_name: Station official name
+        :return: Station code (5 letters) and station label
+        """
 
         cookies = {
             'x-visitor-id': 'fbae435c1650f2c4e99b983ed0a4ab204e7',
@@ -120,8 +151,8 @@ class Station:
             'searchTerm': station_name,
             'keepStationsOnly': True,
         }
-        station_match = requests.post(
-            'https://www.sncf-connect.com/bff/api/v1/autocomplete',
+        station_match = session.post(
+            Config.SNCFCONNECT_URL + '/bff/api/v1/autocomplete',
             json=json_data,
             cookies=cookies,
             headers=headers,
@@ -147,7 +178,8 @@ class Station:
         :param intermediate_station:
         :return:
         """
-        if intermediate_station['station'] in departure.destinations and \
+        if intermediate_station['station'].identifier in departure.destinations and \
+                intermediate_station['station'].identifier in arrival.destinations and \
                 departure.destinations[intermediate_station['station'].identifier]['duration'] > \
                 arrival.destinations[intermediate_station['station'].identifier]['duration']:
             return departure.station
@@ -183,7 +215,36 @@ class Station:
         This identifier will be used to identify direct destinations thanks to api.direkt.bahn
         """
         if self.identifier is None:
-            self.identifier = client.locations(self.name)[0].__dict__['id']
+            self.identifier = station_identifiers.get_or_compute(self.name, self.fetch_identifier)
+
+    def fetch_identifier(self) -> str:
+        """
+        Get the identifier of the station from Hafas API
+        """
+        with metrics.measure('hafas_locations'):
+            locations = client.locations(self.name)
+        return locations[0].__dict__['id']
+
+    def get_coordinates(self):
+        """
+        Get the coordinates of the station from Hafas API if they are not known yet
+        """
+        if self.coordinates is None:
+            self.coordinates = station_coordinates.get_or_compute(self.name, self.fetch_coordinates)
+
+    def fetch_coordinates(self) -> tuple[float]:
+        """
+        Get the (latitude, longitude) of the station from Hafas API
+        """
+        with metrics.measure('hafas_locations'):
+            location = client.locations(self.name)[0]
+        return location.latitude, location.longitude
+
+    def distance(self, other: 'Station') -> float:
+        """
+        Returns the distance to another station as the crow flies in km, both coordinates must be known
+        """
+        return great_circle_distance(self.coordinates, other.coordinates)
 
     def get_display_name(self, preserve_official_name=False):
         """
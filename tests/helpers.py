@@ -0,0 +1,21 @@
+"""
+Proposals and days shared by the tests
+"""
+from datetime import datetime, time
+
+from proposal import Proposal, ProposalMetadata
+from station import Station
+
+DAY = datetime(2030, 1, 10, 0, 0, 1)  # a Thursday
+
+
+def make_proposal(departure: str = 'Nimes', arrival: str = 'Paris', dpt_hour: int = 7, arr_hour: int = None,
+                  transporter: str = 'TGV INOUI', seats: int = 3, vehicle_number: str = '6601',
+                  day: datetime = DAY) -> Proposal:
+    """
+    Returns a TGVmax proposal of a day departing and arriving on the hour, 3 hours long by default
+    """
+    arr_hour = dpt_hour + 3 if arr_hour is None else arr_hour
+    return Proposal((arr_hour - dpt_hour) * 60, datetime.combine(day.date(), time(dpt_hour)), Station(departure),
+                    datetime.combine(day.date(), time(arr_hour)), Station(arrival),
+                    ProposalMetadata(transporter, vehicle_number, {'seats': seats}, 0))
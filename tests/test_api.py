@@ -0,0 +1,211 @@
+import unittest
+from datetime import date, datetime, timedelta
+from threading import Thread, local
+from unittest.mock import patch
+
+from api import DayResult, RoundTrip, Search, normalize_dates
+from direct_destination import DirectDestination
+from helpers import DAY, make_proposal
+from options import SearchOptions
+from station import Station
+
+
+class SearchViaTest(unittest.TestCase):
+    """
+    Test the search of connections via an intermediate station
+    """
+
+    def setUp(self):
+        self.search = Search('Beziers', 'Paris')
+        nimes = Station('Nimes', identifier='8700001', code='FRFNI')
+        self.via = {'station': nimes}
+        self.search.departure.code, self.search.arrival.code = 'FRBZR', 'FRPAR'
+        # Nimes -> Paris is longer than Beziers -> Nimes
+        self.search.dpt_direct_dest = DirectDestination(self.search.departure,
+                                                        {'8700001': {'station': nimes, 'duration': 60}})
+        self.search.arr_direct_dest = DirectDestination(self.search.arrival,
+                                                        {'8700001': {'station': nimes, 'duration': 180}})
+
+    def test_longest_segment_first(self):
+        """
+        The longest segment is searched first, connections are in travel order
+        """
+        results = {('FRFNI', 'FRPAR'): [make_proposal('Nimes', 'Paris', 10, 13)],
+                   ('FRBZR', 'FRFNI'): [make_proposal('Beziers', 'Nimes', 8, 9)]}
+        with patch('api.get_available_seats', side_effect=lambda dpt, arr, *_: results[(dpt, arr)]) as mock:
+            connections = self.search.search_via(self.via, DAY)
+        self.assertEqual([call.args[:2] for call in mock.call_args_list],
+                         [('FRFNI', 'FRPAR'), ('FRBZR', 'FRFNI')])
+        self.assertEqual([proposal.departure_station.name for proposal in connections[0].proposals],
+                         ['Beziers', 'Nimes'])
+
+    def test_stop_on_empty_segment(self):
+        """
+        The second segment is not searched when the first one has no seat
+        """
+        with patch('api.get_available_seats', return_value=[]) as mock:
+            self.assertEqual(self.search.search_via(self.via, DAY), [])
+        self.assertEqual(mock.call_count, 1)
+
+
+class SearchTimingsTest(unittest.TestCase):
+    """
+    Test the timings of the search phases
+    """
+
+    def test_concurrent_phases(self):
+        """
+        Time spent in phases running in worker threads is not lost
+        """
+        search = Search('Beziers', 'Paris')
+        clock = local()
+
+        def perf_counter():
+            # every block lasts exactly one second in each thread
+            clock.now = getattr(clock, 'now', -1) + 1
+            return float(clock.now)
+
+        def run():
+            for _ in range(500):
+                with search.timed('via'):
+                    pass
+
+        with patch('api.perf_counter', side_effect=perf_counter):
+            threads = [Thread(target=run) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(search.timings['via'], 4000.0)
+
+
+class RoundTripTest(unittest.TestCase):
+    """
+    Test the search of outbound and return journeys
+    """
+
+    def setUp(self):
+        outbound = Search('Beziers', 'Paris', SearchOptions(direct_only=True))
+        outbound.departure.code, outbound.arrival.code = 'FRBZR', 'FRPAR'
+        self.round_trip = RoundTrip(outbound, 0, 2)
+
+    def test_reverse_shares_stations(self):
+        """
+        The return search uses the stations resolved for the outbound one
+        """
+        inbound = self.round_trip.outbound.reverse()
+        self.assertIs(inbound.departure, self.round_trip.outbound.arrival)
+        self.assertIs(inbound.arrival, self.round_trip.outbound.departure)
+
+    def test_return_days(self):
+        """
+        Return days start on the day of arrival, none without outbound itinerary
+        """
+        self.assertEqual(self.round_trip.return_days(DayResult(DAY)), [])
+        overnight = make_proposal('Beziers', 'Paris', 22, 23)
+        overnight.arrival_date += timedelta(days=1)
+        self.assertEqual(self.round_trip.return_days(DayResult(DAY, [overnight])), [DAY + timedelta(days=1)])
+
+    def test_run(self):
+        """
+        Return days are searched once for all outbound days, after the earliest arrival
+        """
+        next_day = make_proposal('Paris', 'Beziers', 9, 13)
+        next_day.departure_date += timedelta(days=1)
+        results = {('FRBZR', 'FRPAR', 10): [make_proposal('Beziers', 'Paris', 8, 12)],
+                   ('FRPAR', 'FRBZR', 10): [make_proposal('Paris', 'Beziers', 9, 13),
+                                            make_proposal('Paris', 'Beziers', 17, 21)],
+                   ('FRPAR', 'FRBZR', 11): [next_day]}
+        with patch('api.get_available_seats',
+                   side_effect=lambda dpt, arr, day, *_: results.get((dpt, arr, day.day), [])) as mock:
+            trips = list(self.round_trip.run([DAY, DAY + timedelta(days=1)]))
+        self.assertEqual(mock.call_count, 4)  # 2 outbound days, then the return on the 10th and the 11th
+        (first, first_returns), (second, second_returns) = trips
+        self.assertEqual(len(first.direct), 1)
+        # the morning return of the 10th leaves before the outbound arrival
+        self.assertEqual([len(result.direct) for result in first_returns], [1, 1])
+        self.assertEqual(second_returns, [])
+
+
+class FirstAvailableTest(unittest.TestCase):
+    """
+    Test the search of the earliest day with an itinerary
+    """
+
+    def setUp(self):
+        self.search = Search('Beziers', 'Paris')
+        nimes = Station('Nimes', identifier='8700001', code='FRFNI')
+        self.search.departure.code, self.search.arrival.code = 'FRBZR', 'FRPAR'
+        self.search.dpt_direct_dest = DirectDestination(self.search.departure,
+                                                        {'8700001': {'station': nimes, 'duration': 60}})
+        self.search.arr_direct_dest = DirectDestination(self.search.arrival,
+                                                        {'8700001': {'station': nimes, 'duration': 180}})
+        self.search.intermediate_stations = [{'station': nimes}]
+        self.days = [DAY + timedelta(days=offset) for offset in range(5)]
+
+    def test_direct(self):
+        """
+        Days following the earliest day with a direct proposal are not searched, the day found is searched
+        again in full, and the options of the search are left as they were
+        """
+        self.search.search_opts.direct_only = True
+        self.search.intermediate_stations = None  # not resolved for direct searches
+        with patch('api.get_available_seats', side_effect=lambda dpt, arr, day, *_:
+                   [make_proposal('Beziers', 'Paris', 8, 12)] if day.day >= 13 else []) as mock:
+            result = self.search.first_available(self.days, in_flight=1)
+        self.assertEqual(result.day, self.days[3])
+        self.assertEqual([call.args[2].day for call in mock.call_args_list], [10, 11, 12, 13, 13])
+        self.assertEqual([call.args[3].until_found for call in mock.call_args_list], [True] * 4 + [False])
+        self.assertFalse(self.search.search_opts.until_found)
+
+    def test_via(self):
+        """
+        Connections of a day are searched right after its direct proposals
+        """
+        results = {('FRFNI', 'FRPAR', 11): [make_proposal('Nimes', 'Paris', 10, 13)],
+                   ('FRBZR', 'FRFNI', 11): [make_proposal('Beziers', 'Nimes', 8, 9)]}
+        with patch('api.get_available_seats',
+                   side_effect=lambda dpt, arr, day, *_: results.get((dpt, arr, day.day), [])) as mock:
+            result = self.search.first_available(self.days, in_flight=1)
+        self.assertEqual((result.day, len(result.indirect['Nimes'])), (self.days[1], 1))
+        # direct and the longest segment on the 10th, direct and both segments on the 11th
+        self.assertEqual([(call.args[:2], call.args[2].day) for call in mock.call_args_list],
+                         [(('FRBZR', 'FRPAR'), 10), (('FRFNI', 'FRPAR'), 10), (('FRBZR', 'FRPAR'), 11),
+                          (('FRFNI', 'FRPAR'), 11), (('FRBZR', 'FRFNI'), 11)])
+        # only direct searches stop at their first page with seats
+        self.assertEqual([call.args[3].until_found for call in mock.call_args_list],
+                         [True, False, True, False, False])
+
+    def test_via_before_direct(self):
+        """
+        An earlier day with only a connection is found before a later day with a direct proposal
+        """
+        results = {('FRFNI', 'FRPAR', 11): [make_proposal('Nimes', 'Paris', 10, 13)],
+                   ('FRBZR', 'FRFNI', 11): [make_proposal('Beziers', 'Nimes', 8, 9)],
+                   ('FRBZR', 'FRPAR', 14): [make_proposal('Beziers', 'Paris', 8, 12)]}
+        with patch('api.get_available_seats',
+                   side_effect=lambda dpt, arr, day, *_: results.get((dpt, arr, day.day), [])):
+            result = self.search.first_available(self.days)
+        self.assertEqual((result.day, result.direct, len(result.indirect['Nimes'])), (self.days[1], [], 1))
+
+    def test_none(self):
+        """
+        Without any itinerary, every day is searched
+        """
+        with patch('api.get_available_seats', return_value=[]) as mock:
+            self.assertIsNone(self.search.first_available(self.days))
+        self.assertEqual(mock.call_count, 10)
+
+
+class NormalizeDatesTest(unittest.TestCase):
+    """
+    Test dates accepted by the search API
+    """
+
+    def test_dates(self):
+        """
+        Dates and datetimes, alone or in a list, are searched from midnight
+        """
+        self.assertEqual(normalize_dates(date(2030, 1, 10)), [DAY])
+        self.assertEqual(normalize_dates([datetime(2030, 1, 10, 15, 30), date(2030, 1, 11)]),
+                         [DAY, datetime(2030, 1, 11, 0, 0, 1)])
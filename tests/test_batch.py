@@ -0,0 +1,75 @@
+import unittest
+from datetime import datetime
+from os import remove
+from tempfile import NamedTemporaryFile
+
+from batch import BatchRoute, QueryPlanner, load_routes
+from options import PromptOptions
+
+
+class LoadRoutesTest(unittest.TestCase):
+    """
+    Test the batch file loading
+    """
+
+    def test_csv(self):
+        """
+        Test a CSV file with optional columns left empty
+        """
+        with NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as file:
+            file.write('origin,destination,date,period,via,direct_only,hours\n'
+                       'Paris,Lyon,2030-01-10,3,,true,7-12\n'
+                       'Nice,Marseille,,,Toulon,,\n')
+        routes = load_routes(file.name)
+        remove(file.name)
+
+        self.assertEqual([(route.origin, route.destination) for route in routes],
+                         [('Paris', 'Lyon'), ('Nice', 'Marseille')])
+        self.assertEqual(routes[0].start.date(), datetime(2030, 1, 10).date())
+        self.assertEqual(len(routes[0].days()), 3)
+        self.assertEqual(routes[0].direct_only, True)
+        self.assertEqual(routes[0].hours, (7, 12))
+        self.assertEqual(routes[1].via, 'Toulon')
+        self.assertEqual(routes[1].direct_only, False)
+
+    def test_duplicates(self):
+        """
+        Routes differing by an option are kept apart, the same route listed twice is refused
+        """
+        with NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as file:
+            file.write('origin,destination,date,hours\n'
+                       'Paris,Lyon,2030-01-10,7-12\n'
+                       'Paris,Lyon,2030-01-10,\n'
+                       'Paris,Lyon,2030-01-10,7-12\n')
+        with self.assertRaisesRegex(ValueError, 'Paris_Lyon_2030-01-10_7-12h'):
+            load_routes(file.name)
+        remove(file.name)
+
+
+class QueryPlannerTest(unittest.TestCase):
+    """
+    Test the merge of identical fetches in the query plan
+    """
+
+    def test_identical_queries(self):
+        """
+        Same segment on the same day is planned only once
+        """
+        planner = QueryPlanner([], PromptOptions(quiet=True))
+        first = planner.query('FRPAR', 'FRLYS', datetime(2030, 1, 10, 0, 0, 1), None)
+        second = planner.query('FRPAR', 'FRLYS', datetime(2030, 1, 10, 0, 0, 1), None)
+        other_day = planner.query('FRPAR', 'FRLYS', datetime(2030, 1, 11, 0, 0, 1), None)
+        shorter = planner.query('FRPAR', 'FRLYS', datetime(2030, 1, 10, 0, 0, 1), None, 120)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other_day)
+        self.assertNotEqual(first, shorter)
+        self.assertEqual(len(planner.queries), 3)
+
+    def test_route_name(self):
+        """
+        Route name is usable as file name
+        """
+        route = BatchRoute('Paris', 'Aix en Provence', datetime(2030, 1, 10))
+        self.assertEqual(route.name, 'Paris_Aix-en-Provence_2030-01-10')
+        route = BatchRoute('Paris', 'Lyon', datetime(2030, 1, 10), hours=(7, 12), max_duration=300)
+        self.assertEqual(route.name, 'Paris_Lyon_2030-01-10_7-12h_max300')
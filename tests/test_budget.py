@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch
+
+from budget import Budget
+
+
+class BudgetTest(unittest.TestCase):
+    """
+    Test the budget of a best-effort search
+    """
+
+    def test_unlimited(self):
+        """
+        Without limits, every request is allowed
+        """
+        budget = Budget()
+        self.assertTrue(all(budget.spend(first_page=False) for _ in range(100)))
+        self.assertFalse(budget.exhausted)
+
+    def test_max_requests(self):
+        """
+        Further pages are only allowed while first pages of planned searches can still be sent
+        """
+        budget = Budget(max_requests=4)
+        budget.reserve(2)
+        self.assertTrue(budget.spend())  # 1 reserved first page left
+        self.assertTrue(budget.spend(first_page=False))
+        self.assertTrue(budget.spend(first_page=False))
+        self.assertFalse(budget.spend(first_page=False))  # the last request is kept for the reserved first page
+        self.assertTrue(budget.spend())
+        self.assertTrue(budget.exhausted)
+        self.assertFalse(budget.spend())
+        self.assertEqual(budget.summary(), '4/4 requests')
+
+    def test_deadline(self):
+        """
+        Further pages are only allowed if the reserved first pages can be sent before the deadline
+        """
+        budget = Budget(deadline=10)
+        budget.reserve(4)
+        with patch('budget.monotonic', return_value=budget._started + 2):  # pylint: disable=protected-access
+            self.assertTrue(budget.spend())  # 2s per request from now on
+            self.assertFalse(budget.spend(first_page=False))  # 8s left, this page and 3 first pages take 8s
+            budget.release()
+            self.assertTrue(budget.spend(first_page=False))
+        with patch('budget.monotonic', return_value=budget._started + 10):  # pylint: disable=protected-access
+            self.assertTrue(budget.exhausted)
+            self.assertFalse(budget.spend())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from threading import Thread, Event
+from time import sleep
+
+from cache import MemoryCache
+
+
+class MemoryCacheTest(unittest.TestCase):
+    """
+    Test the in-memory cache shared by searches
+    """
+
+    def test_ttl(self):
+        """
+        Expired entries are computed again
+        """
+        cache = MemoryCache(ttl=0)
+        cache.set('key', 1)
+        sleep(0.01)
+        self.assertNotIn('key', cache)
+        self.assertEqual(cache.get_or_compute('key', lambda: 2), 2)
+
+    def test_coalescing(self):
+        """
+        Concurrent calls for the same key compute the value only once
+        """
+        cache = MemoryCache()
+        calls = []
+        release = Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(1)
+            return 'value'
+
+        results = []
+        threads = [Thread(target=lambda: results.append(cache.get_or_compute('key', compute))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def test_error(self):
+        """
+        Errors are not cached
+        """
+        cache = MemoryCache()
+        with self.assertRaises(ValueError):
+            cache.get_or_compute('key', lambda: int('not a number'))
+        self.assertEqual(cache.get_or_compute('key', lambda: 3), 3)
+
+    def test_hits(self):
+        """
+        Calls answered without computing are counted as hits
+        """
+        cache = MemoryCache()
+        for _ in range(3):
+            cache.get_or_compute('key', lambda: 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime
+from os import remove
+from tempfile import mkstemp
+
+from crawler import WorkQueue, priority, load_corridors
+
+
+class WorkQueueTest(unittest.TestCase):
+    """
+    Test the crawler work queue and its leases
+    """
+
+    def setUp(self):
+        _, self.path = mkstemp(suffix='.sqlite')
+        self.queue = WorkQueue(self.path)
+        self.queue.seed([('FRPAR', 'FRLYS', 3), ('FRLYS', 'FRMRS', 1)], 2, datetime(2030, 1, 10))
+
+    def tearDown(self):
+        self.queue.close()
+        remove(self.path)
+
+    def test_priority_order(self):
+        """
+        Near dates of high demand corridors are claimed first
+        """
+        claimed = [self.queue.claim('test')[1:] for _ in range(4)]
+        self.assertEqual(claimed, [('FRPAR', 'FRLYS', '2030-01-10'), ('FRPAR', 'FRLYS', '2030-01-11'),
+                                   ('FRLYS', 'FRMRS', '2030-01-10'), ('FRLYS', 'FRMRS', '2030-01-11')])
+        self.assertIsNone(self.queue.claim('test'), "Leased items can't be claimed twice")
+
+    def test_complete(self):
+        """
+        Completed items are not due before their refresh interval, released ones are retried
+        """
+        item = self.queue.claim('test')
+        self.queue.complete(item[0], item[3])
+        second = self.queue.claim('test')
+        self.assertNotEqual(item[0], second[0])
+        self.queue.release(second[0], retry_after=0)
+        self.assertEqual(self.queue.claim('other')[0], second[0])
+
+    def test_reseed(self):
+        """
+        Past days are removed when seeding again
+        """
+        self.queue.seed([('FRPAR', 'FRLYS', 3)], 1, datetime(2030, 1, 11))
+        days = {row[0] for row in self.queue.connection.execute('SELECT day FROM crawl_queue')}
+        self.assertEqual(days, {'2030-01-11'})
+
+
+class CorridorTest(unittest.TestCase):
+    """
+    Test corridors and priorities
+    """
+
+    def test_default_corridors(self):
+        """
+        Default hub corridors are crawled in both directions
+        """
+        pairs = {(corridor.origin, corridor.destination) for corridor in load_corridors()}
+        self.assertIn(('Paris', 'Lyon'), pairs)
+        self.assertIn(('Lyon', 'Paris'), pairs)
+
+    def test_priority(self):
+        """
+        Tomorrow on a busy corridor is more important than next month
+        """
+        self.assertGreater(priority(3, 1), priority(3, 20))
+        self.assertGreater(priority(3, 5), priority(1, 5))
@@ -0,0 +1,152 @@
+import unittest
+from datetime import datetime, timedelta
+from threading import Lock
+from time import sleep
+from unittest.mock import patch
+
+from api import Search
+from budget import Budget
+from dag import TaskGraph, Task
+from direct_destination import DirectDestination
+from station import Station
+
+DAY = datetime(2030, 1, 10, 0, 0, 1)
+
+
+class TaskGraphTest(unittest.TestCase):
+    """
+    Test the execution of a graph of dependent tasks
+    """
+
+    def test_rank(self):
+        """
+        Ready tasks run by rank, then in insertion order
+        """
+        graph = TaskGraph()
+        order = []
+        for name, rank in [('c', (2,)), ('a', (0,)), ('b', (1,)), ('b2', (1,))]:
+            graph.add(name, lambda name=name: order.append(name) or True, rank=rank)
+        self.assertEqual([task.name for task in graph.run()], ['a', 'b', 'b2', 'c'])
+        self.assertEqual(order, ['a', 'b', 'b2', 'c'])
+
+    def test_needs(self):
+        """
+        A task runs with the results of the tasks it needs
+        """
+        graph = TaskGraph()
+        first = graph.add('first', lambda: [1])
+        second = graph.add('second', lambda: [2])
+        total = graph.add('total', lambda a, b: a + b, needs=[first, second])
+        list(graph.run(workers=2))
+        self.assertEqual(total.result, [1, 2])
+
+    def test_skip_dependents(self):
+        """
+        Tasks which need an empty result are skipped, and the tasks which need them too
+        """
+        graph = TaskGraph()
+        calls = []
+        first = graph.add('first', lambda: [])
+        second = graph.add('second', lambda _: calls.append('second'), needs=[first])
+        third = graph.add('third', lambda *_: calls.append('third'), needs=[first, second])
+        other = graph.add('other', lambda: ['ok'])
+        list(graph.run())
+        self.assertEqual(calls, [])
+        self.assertEqual([second.state, third.state, other.state], [Task.SKIPPED, Task.SKIPPED, Task.DONE])
+        self.assertEqual(second.reason, 'first is empty')
+        self.assertEqual(graph.skipped, [second, third])
+
+    def test_workers(self):
+        """
+        Independent tasks run at the same time, never more than workers
+        """
+        graph = TaskGraph()
+        lock, running = Lock(), []
+        peak = [0]
+
+        def work():
+            with lock:
+                running.append(1)
+                peak[0] = max(peak[0], len(running))
+            sleep(0.05)
+            with lock:
+                running.pop()
+            return True
+
+        for index in range(6):
+            graph.add(str(index), work)
+        list(graph.run(workers=3))
+        self.assertEqual(peak[0], 3)
+
+    def test_error(self):
+        """
+        The error of a failed task is raised, and tasks waiting for it are not run
+        """
+        graph = TaskGraph()
+        failing = graph.add('failing', lambda: 1 / 0)
+        dependent = graph.add('dependent', lambda _: True, needs=[failing])
+        with self.assertRaises(ZeroDivisionError):
+            list(graph.run())
+        self.assertEqual([failing.state, dependent.state], [Task.FAILED, Task.PENDING])
+
+    def test_stop(self):
+        """
+        Tasks are cancelled with their dependents once stop returns True
+        """
+        graph = TaskGraph()
+        calls = []
+        first = graph.add('first', lambda: calls.append('first') or [1], rank=(0,))
+        second = graph.add('second', lambda: calls.append('second') or [2], rank=(1,))
+        both = graph.add('both', lambda a, b: a + b, needs=[first, second])
+        list(graph.run(stop=lambda task: task.name == 'second'))
+        self.assertEqual(calls, ['first'])
+        self.assertEqual([task.state for task in graph.tasks], [Task.DONE, Task.CANCELLED, Task.CANCELLED])
+        self.assertEqual(both.reason, 'second was cancelled')
+        self.assertEqual(graph.cancelled, [second, both])
+
+
+class SearchGraphTest(unittest.TestCase):
+    """
+    Test the search of days as a graph
+    """
+
+    def setUp(self):
+        self.search = Search('Beziers', 'Paris', workers=2)
+        nimes = Station('Nimes', identifier='8700001', code='FRFNI')
+        self.search.departure.code, self.search.arrival.code = 'FRBZR', 'FRPAR'
+        self.search.dpt_direct_dest = DirectDestination(self.search.departure,
+                                                        {'8700001': {'station': nimes, 'duration': 60}})
+        self.search.arr_direct_dest = DirectDestination(self.search.arrival,
+                                                        {'8700001': {'station': nimes, 'duration': 180}})
+        self.search.intermediate_stations = [{'station': nimes}]
+
+    def test_skip_segment(self):
+        """
+        The shortest segment is not searched when the longest one has no seat, and is reported
+        """
+        with patch('api.get_available_seats', return_value=[]) as mock:
+            days = list(self.search.iter_days([DAY]))
+        self.assertEqual(sorted(call.args[:2] for call in mock.call_args_list),
+                         [('FRBZR', 'FRPAR'), ('FRFNI', 'FRPAR')])
+        self.assertEqual(days[0].indirect, {'Nimes': []})
+        self.assertEqual(len(self.search.skipped), 1)
+        self.assertIn('Beziers - Nimes', self.search.skipped[0])
+
+    def test_budget(self):
+        """
+        With a budget, direct proposals of every day are searched first, then vias until the budget is exhausted
+        """
+        self.search.search_opts.budget = Budget(max_requests=2)
+        day_after = DAY + timedelta(days=1)
+        with patch('search.limiter.wait', return_value=0), \
+                patch('search.Proposal.get_next', return_value=None) as mock:
+            days = list(self.search.iter_days([DAY, day_after]))
+        self.assertEqual([call.args[:2] for call in mock.call_args_list], [('FRBZR', 'FRPAR')] * 2)
+        self.assertEqual([day.unexplored for day in days], [['Nimes'], ['Nimes']])
+        self.assertEqual(self.search.search_opts.budget.unexplored,
+                         [f'Segment Nimes - Paris {DAY.date()}', f'Segment Beziers - Nimes {DAY.date()}',
+                          f'Segment Nimes - Paris {day_after.date()}', f'Segment Beziers - Nimes {day_after.date()}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from datetime import datetime, timedelta
+
+from api import Search
+from batch import BatchRoute, QueryPlanner
+from config import Config
+from direct_destination import DirectDestination
+from emulator import Emulator, STATIONS, use_emulator
+from options import SearchOptions, PromptOptions
+from prefilter import fetch_timetable
+from proposal import Proposal, SNCFConnectError
+from search import get_available_seats
+from station import Station, client
+from throttle import limiter
+
+DAY = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=1, microsecond=0)
+
+
+class EmulatorTest(unittest.TestCase):
+    """
+    Test the client against the offline emulator
+    """
+
+    def setUp(self):
+        self.urls = (Config.SNCFCONNECT_URL, Config.DIREKT_BAHN_GURU_URL, Config.HAFAS_URL)
+        self.intervals = (limiter.min_interval, limiter.max_interval)
+        self.emulator = Emulator(page_size=3, seed=1)
+        self.server = self.emulator.start()
+        use_emulator(f'http://127.0.0.1:{self.server.server_port}')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        Config.SNCFCONNECT_URL, Config.DIREKT_BAHN_GURU_URL, Config.HAFAS_URL = self.urls
+        client.profile.baseUrl = Config.HAFAS_URL
+        limiter.min_interval, limiter.max_interval = self.intervals
+
+    def test_stations(self):
+        """
+        Station codes, HAFAS identifiers and direct destinations are emulated
+        """
+        station = Station('Montpellier Saint-Roch')
+        self.assertEqual(Station.fetch_station_code('montpellier saint-roch'), ('FRMPL', 'Montpellier'))
+        self.assertEqual(station.fetch_identifier(), '8777300')
+        station.identifier = '8777300'
+        destinations = DirectDestination.fetch(station).destinations
+        self.assertIn('8796001', destinations)  # Paris
+        self.assertNotIn('8722326', destinations)  # Lille is too far
+
+    def test_timetable(self):
+        """
+        HAFAS trips are the trains of the SNCF Connect timetable
+        """
+        paris, lyon = Station('Paris', identifier='8796001'), Station('Lyon', identifier='8772319')
+        trains = fetch_timetable(paris, lyon, DAY, (12, 24))
+        stations = {station[1]: station for station in STATIONS}
+        timetable = self.emulator.timetable(stations['FRPAR'], stations['FRLYS'], DAY)
+        self.assertEqual([departure.strftime('%Y-%m-%dT%H:%M') for departure, _ in trains],
+                         [proposal['travelId'][:16] for proposal in timetable if proposal['travelId'][11:13] >= '12'])
+
+    def test_batch(self):
+        """
+        Batch routes are searched with their maximum duration
+        """
+        route = BatchRoute('Paris', 'Lyon', DAY, direct_only=True, max_duration=300)
+        planner = QueryPlanner([route], PromptOptions(quiet=True), workers=1)
+        days = planner.run()[route.name]['days']
+        self.assertTrue(days[0]['direct'])
+        self.assertEqual([key[4] for key in planner.queries], [300])
+
+    def test_first_available(self):
+        """
+        The earliest day with a connection is the one of a full search, segments are not cut at their first page
+        """
+        limiter.min_interval = limiter.max_interval = 0
+        days = [DAY + timedelta(days=offset) for offset in range(4)]
+        search = Search('Marseille', 'Lille', SearchOptions(via='Paris', max_duration=600))
+        search.resolve()
+        expected = next((result.day for result in search.iter_days(days) if any(result.indirect.values())), None)
+        result = search.first_available(days)
+        self.assertEqual(result.day if result is not None else None, expected)
+        full = next(search.iter_days([expected]))
+        self.assertEqual({via: len(connections) for via, connections in result.indirect.items()},
+                         {via: len(connections) for via, connections in full.indirect.items()})
+
+    def test_pagination(self):
+        """
+        A day is searched page by page until changeDay, with the same timetable as the emulator
+        """
+        proposals = get_available_seats('FRPAR', 'FRLYS', DAY, SearchOptions(max_duration=600),
+                                        PromptOptions(quiet=True))
+        stations = {station[1]: station for station in STATIONS}
+        timetable = self.emulator.timetable(stations['FRPAR'], stations['FRLYS'], DAY)
+        self.assertGreater(len(timetable), 3)
+        self.assertEqual([proposal.metadata.vehicle_number for proposal in proposals],
+                         [proposal['travelId'].split('_')[1] for proposal in timetable
+                          if proposal['bestPriceLabel'] == '0 €'])
+
+    def test_captcha(self):
+        """
+        Injected captchas are refused requests with the captcha URL
+        """
+        self.emulator.captcha_rate = 1
+        with self.assertRaises(SNCFConnectError) as context:
+            Proposal.get_next('FRPAR', 'FRLYS', DAY.strftime('%Y-%m-%dT%H:%M:00'))
+        self.assertEqual(context.exception.status_code, 403)
+        self.assertTrue(context.exception.captcha_url.endswith('/captcha'))
+
+
+if __name__ == '__main__':
+    unittest.main()
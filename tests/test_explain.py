@@ -0,0 +1,59 @@
+import unittest
+from datetime import datetime, timedelta
+
+from api import Search
+from direct_destination import DirectDestination
+from explain import Explanation, DEFAULT_PAGES
+from snapshot_store import SnapshotStore
+from station import Station
+
+DAY = datetime(2030, 1, 10, 0, 0, 1)
+
+
+class ExplanationTest(unittest.TestCase):
+    """
+    Test the estimated cost of a search
+    """
+
+    def setUp(self):
+        self.store = SnapshotStore(':memory:')
+        search = Search('Beziers', 'Paris')
+        nimes = Station('Nimes', identifier='8700001', code='FRFNI')
+        search.departure.code, search.arrival.code = 'FRBZR', 'FRPAR'
+        search.dpt_direct_dest = DirectDestination(search.departure, {'8700001': {'station': nimes, 'duration': 60}})
+        search.arr_direct_dest = DirectDestination(search.arrival, {'8700001': {'station': nimes, 'duration': 180}})
+        search.intermediate_stations = [{'station': nimes}]
+        self.explanation = Explanation(search, [DAY, DAY + timedelta(days=1)], self.store)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_history(self):
+        """
+        Pages come from the scans of the route, or of all routes, and the second segment is weighted
+        by the chance that the first one has seats
+        """
+        self.store.record('FRBZR', 'FRPAR', DAY, [], 3)
+        self.store.record('FRFNI', 'FRPAR', DAY, [], 2)
+        self.store.record('FRFNI', 'FRPAR', DAY, [], 4)
+        self.assertEqual(self.store.scan_statistics('FRFNI', 'FRPAR')[:3], (2, 3.0, 0.0))
+        first_day, requests = self.explanation.plan()
+        self.assertEqual([(task.name, estimate.pages, expected) for task, estimate, expected in first_day],
+                         [(f'Direct Beziers - Paris {DAY.date()}', 3.0, 3.0),
+                          (f'Segment Nimes - Paris {DAY.date()}', 3.0, 3.0),
+                          (f'Segment Beziers - Nimes {DAY.date()}', 3.0, 0.0)])
+        self.assertEqual(requests, 12.0)
+
+    def test_without_history(self):
+        """
+        Routes never scanned are assumed to have seats and DEFAULT_PAGES pages, less with an hour window
+        """
+        self.explanation.store = None
+        _, requests = self.explanation.plan()
+        self.assertEqual(requests, 2 * 3 * DEFAULT_PAGES)
+        self.explanation.search.search_opts.hours = (6, 12)
+        self.assertEqual(self.explanation.estimate('FRBZR', 'FRPAR').pages, DEFAULT_PAGES / 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from config import Config
+from emulator import Emulator, use_emulator
+from explore import Explorer
+from options import SearchOptions
+from station import Station, client
+from throttle import limiter
+
+DAY = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=1, microsecond=0)
+
+
+class ExplorerTest(unittest.TestCase):
+    """
+    Test the exploration of direct destinations against the offline emulator
+    """
+
+    def setUp(self):
+        self.urls = (Config.SNCFCONNECT_URL, Config.DIREKT_BAHN_GURU_URL, Config.HAFAS_URL)
+        self.intervals = (limiter.min_interval, limiter.max_interval)
+        self.emulator = Emulator(page_size=3, seed=1)
+        self.server = self.emulator.start()
+        use_emulator(f'http://127.0.0.1:{self.server.server_port}')
+        self.explorer = Explorer('Lyon', SearchOptions(max_duration=600), workers=2)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        Config.SNCFCONNECT_URL, Config.DIREKT_BAHN_GURU_URL, Config.HAFAS_URL = self.urls
+        client.profile.baseUrl = Config.HAFAS_URL
+        limiter.min_interval, limiter.max_interval = self.intervals
+
+    def test_destinations(self):
+        """
+        Destinations are the nearest direct ones, by duration or distance, without the origin
+        """
+        by_duration = self.explorer.destinations(3)
+        self.assertEqual(len(by_duration), 3)
+        durations = [destination['duration'] for destination in by_duration]
+        self.assertEqual(durations, sorted(durations))
+        self.assertNotIn(self.explorer.origin.code, [destination['code'] for destination in by_duration])
+        by_distance = self.explorer.destinations(3, 'distance')
+        distances = [self.explorer.origin.distance(destination['station']) for destination in by_distance]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_resolve_top_only(self):
+        """
+        Codes are only resolved for the nearest destinations until enough unique ones are found
+        """
+        name_to_code = Station.name_to_code
+        with patch.object(Station, 'name_to_code', autospec=True, side_effect=name_to_code) as mock_name_to_code:
+            self.assertEqual(len(self.explorer.destinations(1)), 1)
+            resolved = mock_name_to_code.call_count
+            self.assertGreater(len(self.explorer.destinations()), resolved)
+
+    def test_first_page(self):
+        """
+        Each destination is searched until a page has seats, results are sorted by departure
+        """
+        destinations = self.explorer.destinations(2)
+        results = list(self.explorer.run(destinations, DAY))
+        self.assertCountEqual([destination['code'] for destination, _ in results],
+                              [destination['code'] for destination in destinations])
+        for destination, proposals in results:
+            departures = [proposal.departure_date for proposal in proposals]
+            self.assertEqual(departures, sorted(departures))
+            self.assertLessEqual(len(proposals), 3)  # only the first page with seats
+
+
+if __name__ == '__main__':
+    unittest.main()
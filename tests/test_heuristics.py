@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from api import Search
+from direct_destination import DirectDestination
+from unittest.mock import patch
+
+from heuristics import HitRates, MIN_SEARCHES, RETRY_AFTER, horizon, windows
+from options import SearchOptions
+from station import Station
+import helpers
+from helpers import make_proposal
+
+DAY = helpers.DAY + timedelta(days=1)  # a Friday
+
+
+class HitRatesTest(unittest.TestCase):
+    """
+    Test hit rates learned from past searches
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.hit_rates = HitRates(os.path.join(self.directory.name, 'hit_rates.json'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_buckets(self):
+        """
+        Days are bucketed by horizon, hour windows by the windows they overlap
+        """
+        self.assertEqual(horizon(DAY, DAY - timedelta(days=10)), '8-14')
+        self.assertEqual(horizon(DAY, DAY), '0-1')
+        self.assertEqual(windows((7, 19)), ['morning', 'afternoon', 'evening'])
+        self.assertEqual(len(windows()), 4)
+
+    def test_rate(self):
+        """
+        Windows rates are used once searched enough, the route rate before
+        """
+        self.assertIsNone(self.hit_rates.rate('FRFNI', 'FRPAR', DAY))
+        for _ in range(MIN_SEARCHES):
+            self.hit_rates.record('FRFNI', 'FRPAR', DAY, [make_proposal(day=DAY)], 1, (6, 24))
+        self.assertAlmostEqual(self.hit_rates.rate('FRFNI', 'FRPAR', DAY), 6 / 7)  # no whole day search yet
+        self.assertAlmostEqual(self.hit_rates.rate('FRFNI', 'FRPAR', DAY, (18, 22)), 1 / 7)
+        self.assertAlmostEqual(self.hit_rates.rate('FRFNI', 'FRPAR', DAY, (7, 9)), 6 / 7)
+        self.assertAlmostEqual(self.hit_rates.rate('FRFNI', 'FRPAR', DAY, (1, 3)), 6 / 7)  # night never searched
+
+    def test_save(self):
+        """
+        Counts are kept in the JSON file
+        """
+        self.hit_rates.record('FRFNI', 'FRPAR', DAY, [], 1)
+        self.hit_rates.save()
+        self.assertEqual(HitRates(self.hit_rates.path).counts, self.hit_rates.counts)
+        self.assertEqual(HitRates(self.hit_rates.path).searched_at, self.hit_rates.searched_at)
+        self.assertEqual(self.hit_rates.counts[HitRates.key('FRFNI', 'FRPAR')], [1, 0])
+
+    def test_weekday(self):
+        """
+        Weekdays are keyed by English name whatever the locale
+        """
+        with patch('heuristics.datetime') as mock_datetime:
+            mock_datetime.now.return_value = DAY
+            self.hit_rates.record('FRFNI', 'FRPAR', DAY, [], 1)
+        self.assertIn(HitRates.key('FRFNI', 'FRPAR', 'Fri', 'day', '0-1'), self.hit_rates.counts)
+
+    def test_stale(self):
+        """
+        Segments not searched for RETRY_AFTER seconds are stale
+        """
+        self.assertTrue(self.hit_rates.stale('FRFNI', 'FRPAR'))
+        self.hit_rates.record('FRFNI', 'FRPAR', DAY, [], 1)
+        self.assertFalse(self.hit_rates.stale('FRFNI', 'FRPAR'))
+        self.hit_rates.searched_at[HitRates.key('FRFNI', 'FRPAR')] -= RETRY_AFTER + 1
+        self.assertTrue(self.hit_rates.stale('FRFNI', 'FRPAR'))
+
+
+class SearchHeuristicsTest(unittest.TestCase):
+    """
+    Test the search plan with learned hit rates
+    """
+
+    def setUp(self):
+        self.hit_rates = HitRates('not-saved.json')
+        self.search = Search('Beziers', 'Paris', SearchOptions(max_duration=600, hit_rates=self.hit_rates))
+        self.nimes = {'station': Station('Nimes', identifier='8700001', code='FRFNI')}
+        self.search.departure.code, self.search.arrival.code = 'FRBZR', 'FRPAR'
+        # Nimes -> Paris is longer than Beziers -> Nimes
+        self.search.dpt_direct_dest = DirectDestination(self.search.departure,
+                                                        {'8700001': {'station': self.nimes['station'],
+                                                                     'duration': 60}})
+        self.search.arr_direct_dest = DirectDestination(self.search.arrival,
+                                                        {'8700001': {'station': self.nimes['station'],
+                                                                     'duration': 180}})
+        self.search.intermediate_stations = [self.nimes]
+
+    def learn(self, dep_station, arr_station, searches, hits):
+        for index in range(searches):
+            self.hit_rates.record(dep_station, arr_station, DAY, [make_proposal(day=DAY)] if index < hits else [], 1)
+
+    def test_order(self):
+        """
+        The segment with the lowest hit rate is searched first, the longest one without hit rates
+        """
+        self.assertEqual(self.search.ordered_segments(self.nimes, DAY)[0][0]['dpt'].name, 'Nimes')
+        self.learn('FRBZR', 'FRFNI', 10, 2)
+        self.learn('FRFNI', 'FRPAR', 10, 9)
+        segments, reverse, _ = self.search.ordered_segments(self.nimes, DAY)
+        self.assertEqual((segments[0]['dpt'].name, reverse), ('Beziers', False))
+
+    def test_skip_hopeless(self):
+        """
+        Connections with a segment almost never available are not planned, and are reported as skipped
+        """
+        self.learn('FRBZR', 'FRFNI', 30, 0)
+        graph = self.search.plan([DAY])
+        self.assertEqual([task.details['kind'] for task in graph.tasks], ['direct'])
+        self.assertEqual(len(self.search.skipped), 1)
+        self.assertIn('via Nimes', self.search.skipped[0])
+
+    def test_retry_hopeless(self):
+        """
+        Connections skipped for a while are searched again so that their hit rates can recover
+        """
+        self.learn('FRBZR', 'FRFNI', 30, 0)
+        self.hit_rates.searched_at[HitRates.key('FRBZR', 'FRFNI')] -= RETRY_AFTER + 1
+        graph = self.search.plan([DAY])
+        self.assertIn('segment', [task.details['kind'] for task in graph.tasks])
+        self.assertEqual(self.search.skipped, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+
+from metrics import Metrics, endpoint_name, percentile
+
+
+class MetricsTest(unittest.TestCase):
+    """
+    Test the instrumentation of outbound calls and the run report
+    """
+
+    def test_endpoint_name(self):
+        """
+        Known URLs have a label, identifiers are removed from others
+        """
+        self.assertEqual(endpoint_name('https://www.sncf-connect.com/bff/api/v1/itineraries'), 'itineraries')
+        self.assertEqual(endpoint_name('https://api.direkt.bahn.guru/8796001'), 'direct_destinations')
+        self.assertEqual(endpoint_name('http://localhost:8000/stations/8796001'), 'localhost:8000/stations/{id}')
+
+    def test_percentile(self):
+        """
+        Percentiles are interpolated between values
+        """
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([2.0], 95), 2.0)
+        self.assertAlmostEqual(percentile([float(value) for value in range(1, 101)], 95), 95.05)
+
+    def test_report(self):
+        """
+        The report sums calls per endpoint and network time, and is written in JSON or Prometheus format
+        """
+        metrics = Metrics()
+        metrics.observe('itineraries', 1.0, 200, 1000)
+        metrics.observe('itineraries', 3.0, 403, 10, retries=1)
+        metrics.add_time('sleep', 2.5)
+        with self.assertRaises(OSError), metrics.measure('hafas_locations'):
+            raise OSError()
+        report = metrics.to_dict()
+        self.assertEqual(report['endpoints']['itineraries']['statuses'], {'200': 1, '403': 1})
+        self.assertEqual(report['endpoints']['itineraries']['bytes'], 1010)
+        self.assertEqual(report['endpoints']['itineraries']['retries'], 1)
+        self.assertEqual(report['endpoints']['hafas_locations']['statuses'], {'error': 1})
+        self.assertEqual(report['time']['sleep'], 2.5)
+        self.assertGreaterEqual(report['time']['network'], 4.0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            metrics.write(os.path.join(directory, 'report.json'))
+            with open(os.path.join(directory, 'report.json'), encoding='utf-8') as file:
+                self.assertEqual(json.load(file)['endpoints']['itineraries']['count'], 2)
+            metrics.write(os.path.join(directory, 'report.prom'))
+            with open(os.path.join(directory, 'report.prom'), encoding='utf-8') as file:
+                self.assertIn('tgvmax_requests_total{endpoint="itineraries",status="403"} 1', file.read())
+            self.assertEqual(sorted(os.listdir(directory)), ['report.json', 'report.prom'])
+
+
+if __name__ == '__main__':
+    unittest.main()
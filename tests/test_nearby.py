@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime
+
+from api import Search
+from direct_destination import DirectDestination
+from nearby import SpatialIndex, find_alternatives
+from options import SearchOptions
+from station import Station, great_circle_distance
+
+DAY = datetime(2030, 1, 10, 0, 0, 1)
+
+LYON = Station('Lyon Part-Dieu', (45.7606, 4.8597), '8772319', 'FRLYS')
+PARIS = Station('Paris Gare de Lyon', (48.8443, 2.3743), '8768600', 'FRPAR')
+SAINT_EXUPERY = Station('Lyon Saint-Exupery TGV', (45.7209, 5.0759), '8762906', 'FRLSE')
+PERRACHE = Station('Lyon Perrache', (45.7485, 4.8262), '8772300', 'FRLYS')
+MARNE = Station('Marne-la-Vallee Chessy', (48.8705, 2.7827), '8711184', 'FRMLV')
+VALENCE = Station('Valence TGV', (44.9911, 4.9783), '8776302', 'FRVAF')
+
+
+def direct_destination(station: Station, destinations: [Station]) -> DirectDestination:
+    return DirectDestination(station, {destination.identifier: {'station': destination, 'duration': 120}
+                                       for destination in destinations})
+
+
+class NearbyTest(unittest.TestCase):
+    """
+    Test the stations found near the departure and arrival stations
+    """
+
+    def test_within(self):
+        """
+        The stations within a radius are the ones found by measuring every distance, nearest first
+        """
+        stations = [LYON, PARIS, SAINT_EXUPERY, PERRACHE, MARNE, VALENCE]
+        index = SpatialIndex(stations)
+        for radius in (1, 20, 100, 500):
+            expected = sorted(station.name for station in stations
+                              if great_circle_distance(LYON.coordinates, station.coordinates) <= radius)
+            found = index.within(LYON.coordinates, radius)
+            self.assertEqual(sorted(station.name for _, station in found), expected)
+            self.assertEqual([distance for distance, _ in found], sorted(distance for distance, _ in found))
+
+    def test_find_alternatives(self):
+        """
+        Alternatives have a direct train to the other end and a code different from the searched stations
+        """
+        lyon = direct_destination(LYON, [PARIS, MARNE, VALENCE])
+        paris = direct_destination(PARIS, [LYON, SAINT_EXUPERY, PERRACHE])
+        alternatives = find_alternatives(LYON, PARIS, lyon, paris, 50)
+        self.assertEqual([(alternative['station'].name, alternative['end']) for alternative in alternatives],
+                         [('Lyon Saint-Exupery TGV', 'departure'), ('Marne-la-Vallee Chessy', 'arrival')])
+        self.assertEqual((alternatives[0]['dpt'], alternatives[0]['arr']), (SAINT_EXUPERY, PARIS))
+        self.assertEqual((alternatives[1]['dpt'], alternatives[1]['arr']), (LYON, MARNE))
+
+    def test_plan(self):
+        """
+        Alternatives are searched right after the direct proposals of each day, and reversed for the return
+        """
+        search = Search('Lyon', 'Paris', SearchOptions(max_duration=600, direct_only=True, radius=50))
+        search.departure, search.arrival = LYON, PARIS
+        search.alternatives = find_alternatives(LYON, PARIS, direct_destination(LYON, [PARIS, MARNE]),
+                                                direct_destination(PARIS, [LYON, SAINT_EXUPERY]), 50)
+        graph = search.plan([DAY, DAY.replace(day=11)])
+        self.assertEqual([task.name for task in sorted(graph.tasks, key=lambda task: task.rank)][:3],
+                         ['Direct Lyon Part-Dieu - Paris Gare de Lyon 2030-01-10',
+                          'Direct Lyon Saint-Exupery TGV - Paris Gare de Lyon 2030-01-10',
+                          'Direct Lyon Part-Dieu - Marne-la-Vallee Chessy 2030-01-10'])
+        inbound = search.reverse()
+        self.assertEqual([(alternative['dpt'].name, alternative['arr'].name, alternative['end'])
+                          for alternative in inbound.alternatives],
+                         [('Paris Gare de Lyon', 'Lyon Saint-Exupery TGV', 'arrival'),
+                          ('Marne-la-Vallee Chessy', 'Lyon Part-Dieu', 'departure')])
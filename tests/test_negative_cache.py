@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from api import Search
+from helpers import DAY, make_proposal
+from negative_cache import NegativeCache, ttl
+from options import SearchOptions
+from station import Station
+
+
+class NegativeCacheTest(unittest.TestCase):
+    """
+    Test segments remembered without seats
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.negative_cache = NegativeCache(os.path.join(self.directory.name, 'negative_cache.json'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_ttl(self):
+        """
+        Empty searches are trusted longer far from departure
+        """
+        self.assertEqual(ttl(DAY, DAY), 600)
+        self.assertEqual(ttl(DAY, DAY - timedelta(days=5)), 3600)
+        self.assertGreater(ttl(DAY, DAY - timedelta(days=60)), ttl(DAY, DAY - timedelta(days=20)))
+
+    def test_record(self):
+        """
+        Empty searches are remembered until seats are found, a day without seats covers its hour windows
+        """
+        self.negative_cache.record('FRFNI', 'FRPAR', DAY, [], 1)
+        self.assertIsNotNone(self.negative_cache.expiry('FRFNI', 'FRPAR', DAY))
+        self.assertIsNotNone(self.negative_cache.expiry('FRFNI', 'FRPAR', DAY, (7, 12)))
+        self.assertIsNone(self.negative_cache.expiry('FRPAR', 'FRFNI', DAY))
+        self.negative_cache.record('FRFNI', 'FRPAR', DAY, [make_proposal(dpt_hour=8)], 1, (7, 12))
+        self.assertIsNone(self.negative_cache.expiry('FRFNI', 'FRPAR', DAY))
+
+    def test_max_duration(self):
+        """
+        A search without seats only covers searches with the same maximum duration,
+        seats found forget the segment for every maximum duration
+        """
+        self.negative_cache.record('FRFNI', 'FRPAR', DAY, [], 1, None, 180)
+        self.negative_cache.record('FRFNI', 'FRPAR', DAY, [], 1, (7, 12), 600)
+        self.assertIsNotNone(self.negative_cache.expiry('FRFNI', 'FRPAR', DAY, None, 180))
+        self.assertIsNone(self.negative_cache.expiry('FRFNI', 'FRPAR', DAY, None, 600))
+        self.negative_cache.record('FRFNI', 'FRPAR', DAY, [make_proposal(dpt_hour=8)], 1, None, 300)
+        self.assertEqual(self.negative_cache.expiries, {})
+
+    def test_expired(self):
+        """
+        Expired entries are ignored and not saved
+        """
+        self.negative_cache.record('FRFNI', 'FRPAR', DAY, [], 1)
+        with patch('negative_cache.time', return_value=datetime.now().timestamp() + 100 * 24 * 3600):
+            self.assertIsNone(self.negative_cache.expiry('FRFNI', 'FRPAR', DAY))
+            self.negative_cache.save()
+        self.assertEqual(NegativeCache(self.negative_cache.path).expiries, {})
+
+    def test_save(self):
+        """
+        Entries are kept from a run to the next one
+        """
+        self.negative_cache.record('FRFNI', 'FRPAR', DAY, [], 1)
+        self.negative_cache.save()
+        self.assertIsNotNone(NegativeCache(self.negative_cache.path).expiry('FRFNI', 'FRPAR', DAY))
+
+    def test_segment_skipped(self):
+        """
+        A segment recently searched without seats is not searched again, and reported as skipped
+        """
+        self.negative_cache.record('FRFNI', 'FRPAR', DAY, [], 1, None, 600)
+        search = Search('Beziers', 'Paris', SearchOptions(max_duration=600, negative_cache=self.negative_cache))
+        segment = {'dpt': Station('Nimes', code='FRFNI'), 'arr': Station('Paris', code='FRPAR')}
+        with patch('api.get_available_seats') as mock:
+            self.assertEqual(search.search_segment(segment, DAY), [])
+        mock.assert_not_called()
+        self.assertIn('no seat found recently', search.skipped[0])
@@ -0,0 +1,64 @@
+import unittest
+from time import monotonic
+from unittest.mock import patch
+
+from cache import segments
+from prefetch import Prefetcher, WINDOW, MIN_PAUSE
+from throttle import RateLimiter
+
+KEY = ('FRPAR', 'FRLYS', '2031-01-10', None, 600)
+
+
+class PrefetchTest(unittest.TestCase):
+    """
+    Test the speculative prefetch of the next searches
+    """
+
+    def setUp(self):
+        self.prefetcher = Prefetcher()
+
+    def test_predict(self):
+        """
+        The next day and the reverse direction are predicted, unless they are already cached
+        """
+        self.assertEqual(Prefetcher.predict(KEY), [('FRPAR', 'FRLYS', '2031-01-11', None, 600),
+                                                   ('FRLYS', 'FRPAR', '2031-01-10', None, 600)])
+        segments.set(('FRLYS', 'FRPAR', '2031-01-10', None, 600), [])
+        self.prefetcher.observe(KEY)
+        self.assertEqual(list(self.prefetcher.pending), [('FRPAR', 'FRLYS', '2031-01-11', None, 600)])
+
+    def test_prefetch(self):
+        """
+        A prefetched segment is cached and counted as a hit once searched
+        """
+        key = ('FRPAR', 'FRLYS', '2031-01-12', (7, 12), 600)
+        with patch('prefetch.get_available_seats', return_value=['proposal']) as mock:
+            self.prefetcher.prefetch(key)
+        self.assertTrue(mock.call_args.args[3].background)
+        self.assertEqual(segments.get(key), ['proposal'])
+        self.prefetcher.observe(key)
+        self.assertEqual((self.prefetcher.hits, self.prefetcher.misses), (1, 0))
+
+    def test_pause(self):
+        """
+        Prefetch is paused when prefetched segments expire unused, longer each time
+        """
+        for day in range(WINDOW):
+            self.prefetcher.prefetched[('FRPAR', 'FRLYS', f'2031-02-{day + 1:02}', None, 600)] = monotonic() - 3600
+        self.prefetcher.observe(KEY)
+        self.assertEqual(self.prefetcher.misses, WINDOW)
+        self.assertGreater(self.prefetcher.paused_until, monotonic() + MIN_PAUSE - 10)
+        self.assertEqual(self.prefetcher.pause, 2 * MIN_PAUSE)
+        self.assertFalse(self.prefetcher.pending)
+
+    def test_background_wait(self):
+        """
+        Background requests wait for the limiter to be idle for a whole interval
+        """
+        limiter = RateLimiter(0.05, 0.05)
+        limiter.wait()
+        start = monotonic()
+        limiter.wait()  # the foreground request waits for its slot only
+        self.assertLess(monotonic() - start, 0.09)
+        limiter.wait(background=True)
+        self.assertGreaterEqual(monotonic() - start, 0.14)
@@ -0,0 +1,65 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from api import Search
+from direct_destination import DirectDestination
+from options import SearchOptions
+from prefilter import count_connections, fetch_timetable
+from station import Station
+
+DAY = datetime(2030, 1, 10, 0, 0, 1)
+
+
+def train(dpt_hour, arr_hour):
+    return DAY.replace(hour=dpt_hour, second=0), DAY.replace(hour=arr_hour, second=0)
+
+
+class PrefilterTest(unittest.TestCase):
+    """
+    Test the prefilter of intermediate stations with HAFAS timetables
+    """
+
+    def test_count_connections(self):
+        """
+        Connections are the trains of the second segment departing after each arrival
+        """
+        self.assertEqual(count_connections([train(8, 10), train(12, 14)], [train(9, 11), train(11, 13), train(15, 17)]),
+                         3)
+        self.assertEqual(count_connections([train(18, 20)], [train(9, 11)]), 0)
+
+    def test_timetable(self):
+        """
+        Only trains departing in the day and the hour window are kept
+        """
+        journeys = [SimpleNamespace(legs=[SimpleNamespace(departure=departure, arrival=arrival)])
+                    for departure, arrival in (train(9, 11), train(13, 15), train(19, 21))]
+        journeys.append(SimpleNamespace(legs=[SimpleNamespace(departure=DAY + timedelta(days=1, hours=6),
+                                                              arrival=DAY + timedelta(days=1, hours=8))]))
+        with patch('prefilter.client.journeys', return_value=journeys) as mock:
+            trains = fetch_timetable(Station('Nimes', identifier='8777500'), Station('Paris', identifier='8796001'),
+                                     DAY, (12, 18))
+        self.assertEqual(trains, [train(13, 15)])
+        self.assertEqual(mock.call_args.args[2], DAY.replace(hour=12, second=0))
+
+    def test_plan(self):
+        """
+        Vias without connection are not searched, the other ones are ranked by number of connections
+        """
+        search = Search('Beziers', 'Paris', SearchOptions(max_duration=600, prefilter=True))
+        search.departure.code, search.arrival.code = 'FRBZR', 'FRPAR'
+        vias = [Station(name, identifier=identifier) for name, identifier in
+                (('Nimes', '8777500'), ('Lyon', '8772319'), ('Montpellier', '8777300'))]
+        destinations = {via.identifier: {'station': via, 'duration': 60} for via in vias}
+        search.dpt_direct_dest = DirectDestination(search.departure, destinations)
+        search.arr_direct_dest = DirectDestination(search.arrival, destinations)
+        search.intermediate_stations = [{'station': via} for via in vias]
+        counts = {('Nimes', DAY): 2, ('Lyon', DAY): 0, ('Montpellier', DAY): 5}
+        with patch('api.count_all', return_value=counts):
+            graph = search.plan([DAY])
+        firsts = sorted((task for task in graph.tasks if task.details['kind'] == 'segment' and not task.needs),
+                        key=lambda task: task.rank)
+        self.assertEqual([task.details['via'] for task in firsts], ['Montpellier', 'Nimes'])
+        self.assertEqual(search.skipped, [f'Connections via Lyon {DAY.date()}: '
+                                          'no TGV or Intercités connection in HAFAS timetables'])
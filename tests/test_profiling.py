@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+import unittest
+
+from profiling import Tracer
+
+
+class TracerTest(unittest.TestCase):
+    """
+    Test the timing spans written with --trace
+    """
+
+    def test_disabled(self):
+        """
+        Nothing is recorded until the tracer is started
+        """
+        tracer = Tracer()
+        with tracer.span('stations'):
+            pass
+        self.assertEqual(tracer.events, [])
+
+    def test_nested_spans(self):
+        """
+        Spans are complete events, a nested span is within its parent and the file is a Chrome trace
+        """
+        tracer = Tracer()
+        tracer.start()
+        with tracer.span('segment', dpt='Paris'):
+            with tracer.span('page', page=1):
+                pass
+        page, segment = tracer.events
+        self.assertEqual((segment['name'], segment['ph'], segment['args']), ('segment', 'X', {'dpt': 'Paris'}))
+        self.assertLessEqual(segment['ts'], page['ts'])
+        self.assertGreaterEqual(segment['ts'] + segment['dur'], page['ts'] + page['dur'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.json')
+            tracer.write(path)
+            with open(path, encoding='utf-8') as file:
+                self.assertEqual([event['name'] for event in json.load(file)['traceEvents']], ['segment', 'page'])
+
+
+if __name__ == '__main__':
+    unittest.main()
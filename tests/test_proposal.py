@@ -1,22 +1,30 @@
+import io
 import unittest
 from datetime import datetime
 
-from proposal import Proposal
+from emulator import proposal_json
+import proposal as proposal_module
+from proposal import Proposal, ProposalMetadata
+from station import Station
 
-normal_train = Proposal(121, 0, datetime(2021, 12, 1, 7, 17), 'Paris',
-                        datetime(2021, 12, 1, 9, 23), 'Lyon', 'TGV InOui', '4173', 8)
+normal_train = Proposal(126, datetime(2021, 12, 1, 7, 17), Station('Paris'),
+                        datetime(2021, 12, 1, 9, 23), Station('Lyon'),
+                        ProposalMetadata('TGV INOUI', '4173', {'seats': 8}, 0))
 
-another_normal = Proposal(118, 0, datetime(2021, 12, 1, 7, 20), 'Paris',
-                          datetime(2021, 12, 1, 9, 29), 'Lyon', 'TGV InOui', '4174', 3)
-
-not_free = Proposal(124, 5, datetime(2021, 12, 1, 7, 20), 'Paris',
-                    datetime(2021, 12, 1, 9, 29), 'Lyon', 'TGV InOui', 'TGV 4171', 2)
-
-ter = Proposal(247, 0, datetime(2021, 12, 1, 7, 20), 'Paris',
-               datetime(2021, 12, 1, 9, 29), 'Lyon', 'TER', 'TER 24762', 67)
+another_normal = Proposal(129, datetime(2021, 12, 1, 7, 20), Station('Paris'),
+                          datetime(2021, 12, 1, 9, 29), Station('Lyon'),
+                          ProposalMetadata('TGV INOUI', '4174', {'seats': 3}, 0))
 
 MAX_DURATION = 125
 
+# SNCF Connect JSON proposals, as filtered from itineraries responses
+normal_json = proposal_json('Paris', 'Lyon', datetime(2021, 12, 1, 7, 17), 126, seats=8, number='4173')
+another_normal_json = proposal_json('Paris', 'Lyon', datetime(2021, 12, 1, 7, 20), 129, seats=3, number='4174')
+not_free_json = proposal_json('Paris', 'Lyon', datetime(2021, 12, 1, 7, 20), 129, price=5, number='4171')
+unavailable_json = proposal_json('Paris', 'Lyon', datetime(2021, 12, 1, 8, 0), 124, price=99999, number='4175')
+ter_json = proposal_json('Paris', 'Lyon', datetime(2021, 12, 1, 7, 20), 247, transporter='TER',
+                         number='24762', bookable=False)
+
 
 class RemoveDuplicatesTest(unittest.TestCase):
     """
@@ -56,22 +64,23 @@ class FilterProposals(unittest.TestCase):
         """
         Test the filter_proposals function with a simple list
         """
-        self.assertEqual(Proposal.filter([normal_train, another_normal, not_free, ter],
-                                         MAX_DURATION),
-                         [normal_train, another_normal],
+        proposals = Proposal.filter([normal_json, another_normal_json, not_free_json, unavailable_json, ter_json],
+                                    MAX_DURATION)
+        self.assertEqual([proposal.metadata.vehicle_number for proposal in proposals], ['4173', '4174'],
                          "Should be a and b")
+        self.assertEqual(proposals[0].departure_date, datetime(2021, 12, 1, 7, 17))
+        self.assertEqual(proposals[0].duration, 126)
+        self.assertEqual(proposals[0].metadata.remaining_seats, {'seats': 8})
 
     def test_with_options(self):
         """
         Test the filter_proposals function with a simple list but also with SearchOptions
         to allow non tgvmax eligible trains
         """
-
-        self.assertEqual(
-            Proposal.filter([normal_train, another_normal, not_free, ter],
-                            MAX_DURATION, get_non_tgvmax=True),
-            [normal_train, another_normal, not_free],
-            "Should be a, b and not_free")
+        proposals = Proposal.filter([normal_json, another_normal_json, not_free_json, unavailable_json, ter_json],
+                                    MAX_DURATION, get_non_tgvmax=True)
+        self.assertEqual([proposal.metadata.vehicle_number for proposal in proposals], ['4173', '4174', '4171'],
+                         "Should be a, b and not_free")
 
 
 class Display(unittest.TestCase):
@@ -79,18 +88,25 @@ class Display(unittest.TestCase):
     Test the display function
     """
 
+    def setUp(self):
+        self.output = io.StringIO()
+        self.console_file = proposal_module.console.file
+        proposal_module.console.file = self.output
+
+    def tearDown(self):
+        proposal_module.console.file = self.console_file
+
     def test_simple(self):
         """
         Test the display function with a simple list
         """
-        self.assertEqual(normal_train.print(long=False), [normal_train, another_normal],
-                         "Should be a and b")
+        Proposal.display([normal_train, another_normal])
+        self.assertIn('8 seats remaining', self.output.getvalue())
+        self.assertIn('3 seats remaining', self.output.getvalue())
 
     def test_with_options(self):
         """
-        Test the display function with a simple list but also with SearchOptions
+        Test the display function with transporters and vehicle numbers
         """
-        self.assertEqual(
-            Proposal.filter([normal_train, another_normal, not_free, ter],
-                            MAX_DURATION, get_non_tgvmax=True),
-            [normal_train, another_normal, not_free], "Should be a, b and not_free")
+        normal_train.print(long=True)
+        self.assertIn('4173', self.output.getvalue())
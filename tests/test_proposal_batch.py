@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime, timedelta
+
+from benchmarks.payloads import proposals, segment
+from multiple_proposals import MultipleProposals
+from proposal import Proposal, ProposalMetadata
+from proposal_batch import ProposalBatch, numpy
+from station import Station
+
+DAY = datetime(2030, 1, 10)
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class ProposalBatchTest(unittest.TestCase):
+    """
+    Test the columnar proposals against the Proposal objects path
+    """
+
+    def test_round_trip(self):
+        """
+        Proposals converted to a batch and back are the same, physical spaces included
+        """
+        night_train = Proposal(600, DAY.replace(hour=21), Station('Paris'), DAY.replace(hour=21) + timedelta(hours=10),
+                               Station('Nice'), ProposalMetadata('IC NUIT', '5771', {'seats': 2, 'berths': 999}, 0.0))
+        originals = proposals(50) + [night_train]
+        converted = ProposalBatch.from_proposals(originals).to_proposals()
+        self.assertEqual([proposal.to_dict() for proposal in converted],
+                         [proposal.to_dict() for proposal in originals])
+        self.assertIs(converted[0].departure_station, converted[1].departure_station)
+
+    def test_filter(self):
+        """
+        Only TGVmax proposals are kept, unless asked otherwise
+        """
+        originals = proposals(3, duplicates=0)
+        originals[1].metadata.min_price, originals[2].metadata.min_price = 99999, 45.0
+        batch = ProposalBatch.from_proposals(originals)
+        self.assertEqual(len(batch.filter()), 1)
+        self.assertEqual(len(batch.filter(get_unavailable=True)), 2)
+        self.assertEqual(len(batch.filter(get_unavailable=True, get_non_tgvmax=True)), 3)
+
+    def test_where(self):
+        """
+        Proposals are kept by departure hour, duration and seats
+        """
+        batch = ProposalBatch.from_proposals(segment('Paris', 'Lyon', 16, 6))  # from 6:00 to 20:03
+        self.assertEqual(len(batch.where(hours=(6, 8))), 3)
+        self.assertEqual(len(batch.where(max_duration=60)), 0)
+        self.assertEqual(len(batch.where(min_seats=3)), 16)
+
+    def test_remove_duplicates(self):
+        """
+        Consecutive duplicates of overlapping pages are removed like with Proposal objects
+        """
+        originals = proposals(200)
+        expected = Proposal.remove_duplicates(originals)
+        result = ProposalBatch.from_proposals(originals).remove_duplicates().to_proposals()
+        self.assertEqual([proposal.to_dict() for proposal in result], [proposal.to_dict() for proposal in expected])
+
+    def test_join(self):
+        """
+        Connections are the same as MultipleProposals.join ones, in the same order
+        """
+        first, second = segment('Beziers', 'Nimes', 30, 6), segment('Nimes', 'Paris', 20, 8)
+        expected = MultipleProposals.join(first, second)
+        result = ProposalBatch.connections(ProposalBatch.from_proposals(first), ProposalBatch.from_proposals(second))
+        self.assertEqual([connection.to_dict() for connection in result],
+                         [connection.to_dict() for connection in expected])
+        self.assertEqual(ProposalBatch.connections(ProposalBatch.from_proposals([]),
+                                                   ProposalBatch.from_proposals(second)), [])
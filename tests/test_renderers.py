@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+import unittest
+
+from api import DayResult
+from helpers import DAY, make_proposal
+from multiple_proposals import MultipleProposals
+from renderers import CsvRenderer, JsonLinesRenderer, FIELDS
+
+
+class RenderersTest(unittest.TestCase):
+    """
+    Test machine-readable output formats
+    """
+
+    def setUp(self):
+        connection = MultipleProposals(make_proposal('Beziers', 'Nimes', 8, 9, seats=2),
+                                        make_proposal('Nimes', 'Paris', 10, 13))
+        self.result = DayResult(DAY, [make_proposal('Beziers', 'Paris', 7, 12),
+                                      make_proposal('Beziers', 'Paris', 22, 23, 'IC NUIT', 5)],
+                                {'Nimes': [connection]})
+
+    def test_jsonl(self):
+        """
+        One JSON object per direct proposal and per connection, seats of connections are the limiting ones
+        """
+        stream = io.StringIO()
+        JsonLinesRenderer(stream).write_day(self.result)
+        rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([row['kind'] for row in rows], ['direct', 'direct', 'indirect'])
+        self.assertEqual(rows[2]['via'], 'Nimes')
+        self.assertEqual(rows[2]['seats'], 2)
+        self.assertEqual(rows[2]['duration'], 300)
+        self.assertEqual(rows[0]['departure_date'], '2030-01-10T07:00:00')
+
+    def test_csv_berth_only(self):
+        """
+        CSV has a header line, night trains without berth are excluded with berth only
+        """
+        stream = io.StringIO()
+        CsvRenderer(stream, berth_only=True).write_day(self.result)
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+        self.assertEqual(list(rows[0]), FIELDS)
+        self.assertEqual([row['transporter'] for row in rows], ['TGV INOUI', 'TGV INOUI+TGV INOUI'])
+
+
+if __name__ == '__main__':
+    unittest.main()
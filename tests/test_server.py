@@ -0,0 +1,68 @@
+import json
+import unittest
+from http.server import ThreadingHTTPServer
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from server import SearchRequestHandler, LatencyHistogram
+
+
+class SearchServerTest(unittest.TestCase):
+    """
+    Test the local search service without upstream requests
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SearchRequestHandler)
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def get(self, path):
+        try:
+            with urlopen(self.url + path) as response:
+                return response.status, json.load(response)
+        except HTTPError as error:
+            return error.code, json.load(error)
+
+    def test_missing_parameter(self):
+        """
+        A search without origin is a client error, measured in /search histogram
+        """
+        status, body = self.get('/search?destination=Lyon')
+        self.assertEqual(status, 400)
+        self.assertIn('origin', body['error'])
+        _, metrics = self.get('/metrics')
+        self.assertGreaterEqual(metrics['/search']['count'], 1)
+
+    def test_unknown_endpoint(self):
+        """
+        Unknown endpoints list available ones
+        """
+        status, body = self.get('/unknown')
+        self.assertEqual(status, 404)
+        self.assertIn('/search', body['endpoints'])
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    """
+    Test latency histograms
+    """
+
+    def test_cumulative_buckets(self):
+        """
+        Buckets count latencies lower or equal to their bound
+        """
+        histogram = LatencyHistogram()
+        for seconds in (0.01, 0.3, 0.3, 100):
+            histogram.observe(seconds)
+        buckets = histogram.to_dict()['buckets']
+        self.assertEqual(buckets['0.05'], 1)
+        self.assertEqual(buckets['0.5'], 3)
+        self.assertEqual(buckets['+Inf'], 4)
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+from cache import station_codes
+from helpers import DAY, make_proposal
+from snapshot_store import SnapshotStore
+
+
+class SnapshotStoreTest(unittest.TestCase):
+    """
+    Test the SQLite snapshot store
+    """
+
+    def setUp(self):
+        self.store = SnapshotStore(':memory:')
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_last_snapshot(self):
+        """
+        Query returns the trains of the last scan, the ones missing from it are not available anymore
+        """
+        self.store.record('FRPAR', 'FRLYS', DAY, [make_proposal('Paris', 'Lyon', 7, seats=8, vehicle_number='6601'), make_proposal('Paris', 'Lyon', 9, seats=999, vehicle_number='6603')], 1)
+        self.store.record('FRPAR', 'FRLYS', DAY, [make_proposal('Paris', 'Lyon', 7, seats=3, vehicle_number='6601')], 1)
+
+        proposals = self.store.query('FRPAR', 'FRLYS', DAY)
+        self.assertEqual([(proposal.metadata.vehicle_number, proposal.get_remaining_seats())
+                          for proposal in proposals],
+                         [('6601', 3)])
+        self.store.record('FRPAR', 'FRLYS', DAY, [], 1)
+        self.assertEqual(self.store.query('FRPAR', 'FRLYS', DAY), [])
+        self.assertEqual(self.store.query('FRPAR', 'FRLYS', datetime(2030, 1, 11)), [])
+
+    def test_hour_window(self):
+        """
+        Scans of an hour window do not hide the trains of the other hours
+        """
+        self.store.record('FRPAR', 'FRLYS', DAY, [make_proposal('Paris', 'Lyon', 7, seats=8, vehicle_number='6601'), make_proposal('Paris', 'Lyon', 9, seats=999, vehicle_number='6603')], 1)
+        self.store.record('FRPAR', 'FRLYS', DAY, [make_proposal('Paris', 'Lyon', 9, seats=12, vehicle_number='6603')], 1, (8, 12))
+        self.assertEqual([proposal.metadata.vehicle_number for proposal in self.store.query('FRPAR', 'FRLYS', DAY)],
+                         ['6601', '6603'])
+        self.assertEqual(self.store.connection.execute('SELECT hours FROM scans').fetchall(), [(None,), ('8-12',)])
+
+    def test_migration(self):
+        """
+        Stores created before the hour window of scans was kept get the column
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'snapshots.sqlite')
+            connection = sqlite3.connect(path)
+            connection.execute('CREATE TABLE scans (id INTEGER PRIMARY KEY, scanned_at TEXT NOT NULL,'
+                               ' route TEXT NOT NULL, departure_day TEXT NOT NULL, pages INTEGER NOT NULL,'
+                               ' proposals INTEGER NOT NULL)')
+            connection.close()
+            store = SnapshotStore(path)
+            store.record('FRPAR', 'FRLYS', DAY, [make_proposal('Paris', 'Lyon', 7, seats=8, vehicle_number='6601')], 1)
+            self.assertEqual(len(store.query('FRPAR', 'FRLYS', DAY)), 1)
+            store.close()
+
+    def test_station_names(self):
+        """
+        Station names resolved during the run can be used in queries
+        """
+        station_codes.set('lyon', ('FRLYS', 'Lyon (toutes gares)'))
+        self.store.record('FRPAR', 'FRLYS', DAY, [make_proposal('Paris', 'Lyon', 7, seats=8, vehicle_number='6601')], 2)
+        self.assertEqual(len(self.store.query('frpar', 'Lyon', DAY, max_age=10)), 1)
+
+    def test_compact(self):
+        """
+        Recent snapshots are never compacted
+        """
+        self.store.record('FRPAR', 'FRLYS', DAY, [make_proposal('Paris', 'Lyon', 7, seats=8, vehicle_number='6601')], 1)
+        self.store.record('FRPAR', 'FRLYS', DAY, [make_proposal('Paris', 'Lyon', 7, seats=5, vehicle_number='6601')], 1)
+        self.assertEqual(self.store.compact(), 0)
+        self.assertEqual(self.store.apply_retention(0), 2)
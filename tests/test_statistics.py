@@ -0,0 +1,123 @@
+import copy
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from benchmarks.payloads import passed_trips
+from trips_statistics import Statistics, StatisticsError, TripHistory, TripsStream, parse_duration
+
+
+def stream(response: dict) -> TripsStream:
+    return TripsStream(io.BytesIO(json.dumps(response).encode()))
+
+
+def analyze(response: dict) -> Statistics:
+    statistics = Statistics.empty()
+    statistics.analyze(stream(response))
+    return statistics
+
+
+class TripsStreamTest(unittest.TestCase):
+    """
+    Test the parse of trips one by one
+    """
+
+    def test_trips(self):
+        """
+        Passed trips are parsed like the whole response, cancelled trips are counted
+        """
+        response = passed_trips(20)
+        response['response']['cancelledTrips'] = [{'trip': {}}, {'trip': {}}]
+        trips = stream(response)
+        self.assertEqual(list(trips), response['response']['passedTrips'])
+        self.assertEqual((trips.passed_count, trips.cancelled_count), (20, 2))
+
+    def test_labels(self):
+        """
+        Prices, delays on arrival and durations are extracted from their labels
+        """
+        self.assertEqual([parse_duration(label) for label in ('1h32', '2h', '58 min')], [92, 120, 58])
+        trip = passed_trips(1)['response']['passedTrips'][0]['trip']
+        trip['tripDetails']['outwardJourney']['priceLabel'] = '12,50 €'
+        trip['tripIv']['disruptions']['messages'] = [
+            {'disruptionType': 'DISRUPTION_DELAYED', 'title': 'Retard au départ de 5 min et 12 min à l’arrivée'}]
+        statistics = Statistics.empty()
+        statistics.parse_one_trip(trip)
+        totals = statistics.totals()
+        self.assertEqual((totals['amount'], totals['delay_duration'], totals['delay_count']), (12.5, 12, 1))
+
+
+class TripHistoryTest(unittest.TestCase):
+    """
+    Test statistics kept as running totals of the trips history
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'trips_history.json')
+        self.response = passed_trips(50)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def statistics(self, response: dict = None, offline: bool = False) -> Statistics:
+        with patch('trips_statistics.Statistics.fetch', return_value=stream(response or self.response)) as fetch:
+            statistics = Statistics(TripHistory(self.path), offline)
+        self.assertEqual(fetch.called, not offline)
+        return statistics
+
+    def test_same_as_analyze(self):
+        """
+        Totals of the history are the ones of a whole analysis, and are shown offline
+        """
+        expected = analyze(self.response).totals()
+        self.assertEqual(self.statistics().totals(), expected)
+        offline = self.statistics(offline=True)
+        self.assertEqual(offline.totals(), expected)
+        self.assertEqual(offline.count, 50)
+
+    def test_only_new_trips(self):
+        """
+        Trips already in the history are not analyzed again, only fingerprints of the trips are kept
+        """
+        self.statistics()
+        with patch('trips_statistics.Statistics.parse_one_trip') as parse:
+            self.statistics()
+        parse.assert_not_called()
+        self.assertEqual(self.statistics().first_trip_date, analyze(self.response).first_trip_date)
+        history = TripHistory(self.path)
+        self.assertTrue(all(isinstance(fingerprint, str) for fingerprint in history.trips.values()))
+        response = passed_trips(51)
+        self.assertEqual(history.sync(stream(response), lambda: stream(response)), (51, 0, 50))
+
+    def test_changed_and_removed_trips(self):
+        """
+        Totals are analyzed again from a new response when trips changed or are not passed anymore
+        """
+        self.statistics()
+        response = copy.deepcopy(self.response)
+        response['response']['passedTrips'][0]['trip']['tripDetails']['outwardJourney']['priceLabel'] = '12,50 €'
+        del response['response']['passedTrips'][1]
+        history = TripHistory(self.path)
+        self.assertEqual(history.sync(stream(response), lambda: stream(response)), (0, 1, 1))
+        self.assertEqual(TripHistory(self.path).totals, analyze(response).totals())
+
+    def test_empty_response(self):
+        """
+        A response without any trip leaves the history as it is
+        """
+        self.statistics()
+        with self.assertRaises(StatisticsError):
+            self.statistics({'response': {'passedTrips': [], 'cancelledTrips': []}})
+        self.assertEqual(len(TripHistory(self.path).trips), 50)
+        self.assertEqual(self.statistics(offline=True).totals(), analyze(self.response).totals())
+
+    def test_offline_without_history(self):
+        """
+        Offline statistics need a history
+        """
+        with self.assertRaises(StatisticsError):
+            self.statistics(offline=True)
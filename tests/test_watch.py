@@ -0,0 +1,48 @@
+import unittest
+
+from helpers import DAY, make_proposal
+from station import Station
+from watch import Watcher, Change
+
+ROUTE = f'FRPAR-FRLYS {DAY.date().isoformat()}'
+
+
+class WatcherDiffTest(unittest.TestCase):
+    """
+    Test the diff between two polls of the watch mode
+    """
+
+    def setUp(self):
+        self.watcher = Watcher(Station('Paris'), Station('Lyon'), [], 60, threshold=5)
+
+    def test_new_train(self):
+        """
+        Every train of the first poll is new
+        """
+        changes = self.watcher.diff(ROUTE, [make_proposal('Paris', 'Lyon', seats=8, vehicle_number='6601')])
+        self.assertEqual([change.kind for change in changes], [Change.NEW])
+
+    def test_no_change(self):
+        """
+        Same seats on the same train are not reported
+        """
+        self.watcher.diff(ROUTE, [make_proposal('Paris', 'Lyon', seats=8, vehicle_number='6601')])
+        self.assertEqual(self.watcher.diff(ROUTE, [make_proposal('Paris', 'Lyon', seats=8, vehicle_number='6601')]), [])
+
+    def test_available_again(self):
+        """
+        A train missing from a poll is available again when it comes back
+        """
+        self.watcher.diff(ROUTE, [make_proposal('Paris', 'Lyon', seats=8, vehicle_number='6601')])
+        self.watcher.diff(ROUTE, [])
+        changes = self.watcher.diff(ROUTE, [make_proposal('Paris', 'Lyon', seats=2, vehicle_number='6601')])
+        self.assertEqual([change.kind for change in changes], [Change.AVAILABLE])
+
+    def test_threshold(self):
+        """
+        Seats count crossing the threshold is reported
+        """
+        self.watcher.diff(ROUTE, [make_proposal('Paris', 'Lyon', seats=999, vehicle_number='6601')])
+        changes = self.watcher.diff(ROUTE, [make_proposal('Paris', 'Lyon', seats=3, vehicle_number='6601')])
+        self.assertEqual([(change.kind, change.previous_seats, change.seats) for change in changes],
+                         [(Change.THRESHOLD, 999, 3)])
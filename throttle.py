@@ -0,0 +1,63 @@
+"""
+Code related to the throttling of requests sent to SNCF Connect
+"""
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+
+# Seconds between two checks of an idle limiter by background requests
+IDLE_POLL = 0.05
+
+
+class RateLimiter:
+    """
+    Space out requests with a random interval, shared by all threads of the process
+    """
+    min_interval: float
+    max_interval: float
+
+    def __init__(self, min_interval: float, max_interval: float):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._next_slot = 0.0
+        self._lock = Lock()
+
+    def wait(self, background: bool = False) -> float:
+        """
+        Block until the next request slot and reserve it.
+        Background requests, like prefetches, only take a slot once no request was sent nor reserved
+        for a whole interval, so that they never delay a foreground request by more than one interval
+        :param background: wait for the limiter to be idle
+        :return: number of seconds spent waiting
+        """
+        if background:
+            return self.wait_idle()
+        with self._lock:
+            now = monotonic()
+            delay = max(0.0, self._next_slot - now)
+            # the following slot is a random interval after this one
+            self._next_slot = max(now, self._next_slot) + uniform(self.min_interval, self.max_interval)
+        if delay:
+            sleep(delay)
+        return delay
+
+    def wait_idle(self) -> float:
+        """
+        Block until the limiter is idle and reserve the next request slot
+        :return: number of seconds spent waiting
+        """
+        start = monotonic()
+        while True:
+            with self._lock:
+                now = monotonic()
+                # idle once the last reserved slot is past by a whole interval without any new reservation
+                idle_at = self._next_slot + self.max_interval
+                if now >= idle_at:
+                    self._next_slot = now + uniform(self.min_interval, self.max_interval)
+                    return now - start
+            # a foreground reservation in the meantime pushes the idle time further
+            sleep(max(idle_at - now, IDLE_POLL))
+
+
+# Limiter shared by every search of the process, SNCF Connect blocks clients sending requests too fast
+limiter = RateLimiter(2.5, 4.0)
@@ -1,11 +1,104 @@
 """
 Code related to train travel statistics
 """
-from sys import exit as sys_exit
-from requests import post
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from logging import getLogger
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 from config import Config
-from proposal import Proposal
+from proposal import SNCFConnectError
+from session import session
+
+
+logger = getLogger(__name__)
+
+DEFAULT_PATH = 'trips_history.json'
+# Running totals of the statistics, numbers then counts by station, journey or transporter
+AGGREGATES = ('amount', 'delay_duration', 'delay_count', 'total_duration')
+COUNTERS = ('frequented_stations', 'journeys', 'transporters')
+# Extractors of trip labels, like '12,50 €', 'Retard au départ de 5 min et 12 min à l’arrivée', '1h32' or '58 min'
+PRICE = re.compile(r'\d+(?:,\d+)?')
+DELAY = re.compile(r'(\d+) min')
+DURATION = re.compile(r'(?:(\d+)h)?(\d+)?(?: min)?')
+# Number of bytes of the response read at once
+CHUNK_SIZE = 64 * 1024
+# Number of hexadecimal digits of the fingerprints of the trips kept in the history
+FINGERPRINT_SIZE = 16
+
+
+class StatisticsError(Exception):
+    """
+    Exception for accounts without statistics to show
+    """
+
+
+def parse_duration(duration_string: str) -> int:
+    """
+    Returns the number of minutes of a duration label, like 1h32, 2h or 58 min
+    """
+    hours, minutes = DURATION.fullmatch(duration_string).groups()
+    return int(hours or 0) * 60 + int(minutes or 0)
+
+
+class TripsStream:
+    """
+    Passed trips of an SNCF Connect trips response, parsed one by one while the response is read (with ijson),
+    so that memory does not grow with the history. Trips are counted once all of them are read
+    """
+    stream: BinaryIO
+    passed_count: int
+    cancelled_count: int
+
+    def __init__(self, stream: BinaryIO):
+        """
+        :param stream: binary file-like object of the JSON response, like a streamed response body
+        """
+        self.stream = stream
+        self.passed_count = self.cancelled_count = 0
+
+    def __iter__(self) -> Iterator[dict]:
+        self.passed_count = self.cancelled_count = 0
+        if ijson is None:  # the whole response is loaded instead
+            response = json.load(self.stream).get('response', {})
+            self.cancelled_count = len(response.get('cancelledTrips', []))
+            for trip_data in response.get('passedTrips', []):
+                self.passed_count += 1
+                yield trip_data
+            return
+        # both arrays are parsed from the same chunks, the items of the chunks read so far are handled at once
+        passed, cancelled = ijson.sendable_list(), ijson.sendable_list()
+        parsers = [ijson.items_coro(passed, 'response.passedTrips.item', use_float=True),
+                   ijson.items_coro(cancelled, 'response.cancelledTrips.item', use_float=True)]
+        chunk = True
+        while chunk:
+            chunk = self.stream.read(CHUNK_SIZE)
+            for parser in parsers:
+                if chunk:
+                    parser.send(chunk)
+                else:
+                    parser.close()
+            self.cancelled_count += len(cancelled)
+            del cancelled[:]
+            for trip_data in passed:
+                self.passed_count += 1
+                yield trip_data
+            del passed[:]
+
+    def __enter__(self) -> 'TripsStream':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stream.close()
+
 
 class Statistics:
     """
@@ -20,11 +113,42 @@ class Statistics:
     total_duration = 0
     first_trip_date = ""
     transporters = {}
+    cancelled_count = 0
 
+    def __init__(self, history: 'TripHistory' = None, offline: bool = False):
+        """
+        :param history: local history of trips, only new trips are analyzed, all of them without history
+        :param offline: show the statistics of the history without requesting trips
+        """
+        self.frequented_stations = Counter()
+        self.journeys = Counter()
+        self.transporters = Counter()
 
-    # noinspection SpellCheckingInspection
-    def __init__(self):
+        if offline:
+            if history is None or not history.trips:
+                raise StatisticsError('No trips in the local history, run --statistics once without --offline')
+        else:
+            with Statistics.fetch() as trips:
+                if history is None:
+                    self.analyze(trips)
+                else:
+                    added, changed, removed = history.sync(trips, Statistics.fetch)
+                    logger.info('Trips history: %s new, %s changed and %s removed trips', added, changed, removed)
+            if not trips.passed_count:
+                raise StatisticsError('No trips found for your account. Are you sure you provide all your cookies ?')
+            if history is None:
+                return
+        self.fold(history.totals)
+        self.count, self.cancelled_count = len(history.trips), history.cancelled_count
+        self.first_trip_date = history.first_trip_date
 
+    @staticmethod
+    def fetch() -> TripsStream:
+        """
+        Returns the trips of the account from SNCF Connect, read while they are parsed
+        :raise SNCFConnectError: if the request is refused
+        """
+        # noinspection SpellCheckingInspection
         headers = {
             'authority': 'www.sncf-connect.com',
             'accept': 'application/json, text/plain, */*',
@@ -35,36 +159,26 @@ class Statistics:
             'cookie': Config.SNCFCONNECT_COOKIE,
             'x-bff-key': 'ah1MPO-izehIHD-QZZ9y88n-kku876'
         }
-        response = post(
-            'https://www.sncf-connect.com/bff/api/v1/trips',
-            headers=headers, json = {}, timeout=10 )
-        if response.status_code == 200:
-            self.response = response.json()
-            self.check_response()
-        else:
-            sys_exit('Error: ' + str(response.status_code) + str(response.text))
+        response = session.post(
+            Config.SNCFCONNECT_URL + '/bff/api/v1/trips',
+            headers=headers, json = {}, timeout=10, stream=True)
+        if response.status_code != 200:
+            raise SNCFConnectError(response.status_code, response.text)
+        response.raw.decode_content = True  # the body may be compressed
+        return TripsStream(response.raw)
 
-    def check_response(self) -> None:
+    def analyze(self, passed_trips: Iterable[dict]) -> None:
         """
-        Check if data include at least one passed trip in the response
+        Analyze and parse passed trips of the SNCF Connect response, one by one
+        :param passed_trips: passed trips, like a TripsStream whose cancelled trips are counted too
         """
-        if 'response' in self.response and 'passedTrips' in self.response['response']:
-            if len(self.response['response']['passedTrips']) > 0:
-                self.analyze()
-            else:
-                print('No trips found for your account. Are you sure you provide all your cookies ?')
-                sys_exit(1)
-
-    def analyze(self):
-        """
-        Analyze and parse response from SNCF Connect API
-        """
-        # get first trip date
-        self.first_trip_date = self.response['response']['passedTrips'][-1]['sortDate']
-
-        for trip_data in self.response['response']['passedTrips']: # let's iterate through all passed trip
-            trip = trip_data['trip']
-            self.parse_one_trip(trip)
+        for trip_data in passed_trips: # let's iterate through all passed trip
+            self.parse_one_trip(trip_data['trip'])
+            self.count += 1
+            # get first trip date
+            if not self.first_trip_date or trip_data['sortDate'] < self.first_trip_date:
+                self.first_trip_date = trip_data['sortDate']
+        self.cancelled_count = getattr(passed_trips, 'cancelled_count', 0)
 
     def parse_one_trip(self, trip) -> None:
         """
@@ -72,28 +186,20 @@ class Statistics:
         :param trip: trip object to be parsed
         """
         # count total amount spend
-        amount_str = trip['tripDetails']['outwardJourney']['priceLabel'].split('€')[0]
-        self.amount += float(amount_str.replace(',','.'))
-
-        # count most frequented stations
-        for station in ('originLabel', 'destinationLabel'):
-            if trip[station] in self.frequented_stations:  # if key exists increment value
-                self.frequented_stations[trip[station]] += 1
-            else:
-                self.frequented_stations[trip[station]] = 1 # else initialize value to 1
-
-        # count most frequented journeys
-        if f"{trip['originLabel']} -> {trip['destinationLabel']}" in self.journeys:
-            self.journeys[f"{trip['originLabel']} -> {trip['destinationLabel']}"] +=1
-        else:
-            self.journeys[f"{trip['originLabel']} -> {trip['destinationLabel']}"] = 1
+        self.amount += float(PRICE.search(trip['tripDetails']['outwardJourney']['priceLabel']).group()
+                             .replace(',', '.'))
+
+        # count most frequented stations and journeys
+        self.frequented_stations[trip['originLabel']] += 1
+        self.frequented_stations[trip['destinationLabel']] += 1
+        self.journeys[f"{trip['originLabel']} -> {trip['destinationLabel']}"] += 1
 
         # count trip delay on arrival
         # if traveller messages ("tripIv" = information voyageur) exists
         if trip['tripIv']['disruptions']['messages']:
             for message in trip['tripIv']['disruptions']['messages']:
                 if message['disruptionType'] == "DISRUPTION_DELAYED":
-                    delay_on_arrival = int(message['title'].split(' min')[-2].split(' ')[-1]) # extract delay in string
+                    delay_on_arrival = int(DELAY.findall(message['title'])[-1]) # the last delay is on arrival
                     # we count only the arrival delay, so string "retard au départ" must also contains "à l'arrivée"
                     if "au départ" in message['title']:
                         if "à l’arrivée" in message['title']:
@@ -105,14 +211,41 @@ class Statistics:
 
         # count trip duration
         if trip['duration']:
-            self.total_duration += Proposal.parse_duration(trip['duration'])
+            self.total_duration += parse_duration(trip['duration'])
 
         # count transporters (with exclusion of 'correspondance')
         if 'correspondance' not in trip['transportersRecapLabel']:
-            if f"{trip['transportersRecapLabel']}" in self.transporters:
-                self.transporters[f"{trip['transportersRecapLabel']}"] +=1
-            else:
-                self.transporters[f"{trip['transportersRecapLabel']}"] = 1
+            self.transporters[trip['transportersRecapLabel']] += 1
+
+    @staticmethod
+    def empty() -> 'Statistics':
+        """
+        Returns statistics without any trip, without requesting trips
+        """
+        statistics = Statistics.__new__(Statistics)
+        statistics.frequented_stations, statistics.journeys, statistics.transporters = Counter(), Counter(), Counter()
+        return statistics
+
+    def totals(self) -> dict:
+        """
+        Returns the running totals of the statistics
+        """
+        return {name: getattr(self, name) for name in AGGREGATES} | \
+            {name: dict(getattr(self, name)) for name in COUNTERS}
+
+    def fold(self, totals: dict, sign: int = 1) -> None:
+        """
+        Add running totals to the statistics, or remove them with a sign of -1
+        """
+        for name in AGGREGATES:
+            setattr(self, name, getattr(self, name) + sign * totals[name])
+        self.amount = round(self.amount, 2)  # amounts are in cents, removing one must not leave a remainder
+        for name in COUNTERS:
+            counter = getattr(self, name)
+            for key, count in totals[name].items():
+                counter[key] = counter.get(key, 0) + sign * count
+                if not counter[key]:
+                    del counter[key]
 
     def show(self) -> None:
         """
@@ -120,21 +253,108 @@ class Statistics:
         """
 
         print(f"Total trips since {self.first_trip_date.split('T')[0]} :"
-              f" passed {len(self.response['response']['passedTrips'])},"
-              f" cancelled {len(self.response['response']['cancelledTrips'])}")
-        print(f"Transporters : {self.transporters}")
+              f" passed {self.count},"
+              f" cancelled {self.cancelled_count}")
+        print(f"Transporters : {dict(self.transporters)}")
 
         print(f"Total amount spend: {self.amount:.2f} €")
 
-        favorites_stations = sorted(self.frequented_stations.items(), key=lambda stations: stations[1], reverse=True)
-        print(f"Favorites stations: {favorites_stations[:10]}")
+        print(f"Favorites stations: {self.frequented_stations.most_common(10)}")
 
-        favorite_journeys = sorted(self.journeys.items(), key=lambda journeys: journeys[1], reverse=True)
-        print(f"Favorites journeys: {favorite_journeys[:10]}")
+        print(f"Favorites journeys: {self.journeys.most_common(10)}")
 
         print(f"Total time spend in SNCF trains: "
               f"{self.total_duration//60} hours ({self.total_duration//60/24:.2f} days)")
 
         print(f"Total delay: {self.delay_duration//60} hours, "
-              f"{self.delay_count}/{len(self.response['response']['passedTrips'])} trains delayed")
-        sys_exit(0)
+              f"{self.delay_count}/{self.count} trains delayed")
+
+
+class TripHistory:
+    """
+    Fingerprint of each past trip of the account by trip id, and the running totals of all of them,
+    stored in a JSON file so that a statistics run only analyzes new trips.
+    The contribution of each trip is not kept, so that the history stays small: the totals are analyzed again
+    from all trips when a trip changed or is not passed anymore, which seldom happens
+    """
+    path: str
+    trips: dict[str, str]  # trip id -> fingerprint
+    totals: dict
+    cancelled_count: int
+    first_trip_date: str
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.trips = {}
+        self.totals = Statistics.empty().totals()
+        self.cancelled_count = 0
+        self.first_trip_date = ''
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                content = json.load(file)
+            self.trips, self.totals = content['trips'], content['totals']
+            self.cancelled_count, self.first_trip_date = content['cancelled'], content['first_trip_date']
+
+    @staticmethod
+    def trip_id(trip_data: dict) -> str:
+        """
+        Returns the id of a passed trip, its date and route when SNCF Connect gives none
+        """
+        trip = trip_data['trip']
+        return trip.get('id') or trip_data.get('id') or \
+            f"{trip_data['sortDate']} {trip['originLabel']} -> {trip['destinationLabel']}"
+
+    @staticmethod
+    def fingerprint(trip_data: dict) -> str:
+        """
+        Returns a digest of the content of a passed trip, changed by any change of the trip
+        """
+        return hashlib.sha1(json.dumps(trip_data, sort_keys=True).encode()).hexdigest()[:FINGERPRINT_SIZE]
+
+    def sync(self, trips: TripsStream, refetch: Callable[[], TripsStream]) -> (int, int, int):
+        """
+        Fold new trips into the running totals, and analyze all trips again from a new response
+        if a trip changed or is not passed anymore.
+        A response without any trip is the one of an account not logged in, the history is left as it is
+        :param trips: trips of the SNCF Connect response
+        :param refetch: returns the trips of a new SNCF Connect response
+        :return: number of added, changed and removed trips
+        """
+        statistics = Statistics.empty()
+        statistics.fold(self.totals)
+        fingerprints = {}
+        added = changed = 0
+        first_trip_date = ''
+        for trip_data in trips:
+            trip_id = TripHistory.trip_id(trip_data)
+            fingerprint = fingerprints[trip_id] = TripHistory.fingerprint(trip_data)
+            if not first_trip_date or trip_data['sortDate'] < first_trip_date:
+                first_trip_date = trip_data['sortDate']
+            stored = self.trips.get(trip_id)
+            if stored is None:
+                added += 1
+                statistics.parse_one_trip(trip_data['trip'])
+            elif stored != fingerprint:
+                changed += 1
+        if not trips.passed_count:
+            return 0, 0, 0
+        removed = len(self.trips) - (len(fingerprints) - added)
+        if changed or removed:
+            statistics = Statistics.empty()
+            with refetch() as all_trips:
+                statistics.analyze(all_trips)
+        if added or changed or removed or self.cancelled_count != trips.cancelled_count:
+            self.trips, self.totals, self.first_trip_date = fingerprints, statistics.totals(), first_trip_date
+            self.cancelled_count = trips.cancelled_count
+            self.save()
+        return added, changed, removed
+
+    def save(self) -> None:
+        """
+        Write the fingerprints and the running totals, the file is replaced atomically
+        """
+        content = json.dumps({'trips': self.trips, 'totals': self.totals, 'cancelled': self.cancelled_count,
+                              'first_trip_date': self.first_trip_date})
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(self.path + '.tmp', self.path)
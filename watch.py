@@ -0,0 +1,173 @@
+"""
+Code related to watch mode, which polls seats availability and reports only changes
+"""
+import json
+import subprocess
+from datetime import datetime
+from os.path import exists
+from random import uniform
+from time import sleep
+
+from options import SearchOptions, PromptOptions
+from proposal import Proposal, console
+from search import get_available_seats
+from station import Station
+
+
+class Change:
+    """
+    Availability change of a train between two polls
+    """
+    NEW = 'new'  # train never seen before
+    AVAILABLE = 'available'  # seats went from 0 to N
+    THRESHOLD = 'threshold'  # seat count crossed the --threshold value
+
+    kind: str
+    route: str
+    proposal: Proposal
+    previous_seats: int
+    seats: int
+
+    def __init__(self, kind, route, proposal, previous_seats, seats):
+        self.kind = kind
+        self.route = route
+        self.proposal = proposal
+        self.previous_seats = previous_seats
+        self.seats = seats
+
+    def to_dict(self) -> dict:
+        """
+        Returns the change as a JSON serializable dict
+        """
+        return {
+            'kind': self.kind,
+            'route': self.route,
+            'previous_seats': self.previous_seats,
+            'seats': self.seats,
+            'detected_at': datetime.now().isoformat(timespec='seconds'),
+            'proposal': self.proposal.to_dict(),
+        }
+
+    def __str__(self):
+        seats = self.proposal.display_seats()
+        match self.kind:
+            case Change.NEW:
+                return f'New train {self.proposal.metadata.vehicle_number}: {seats}'
+            case Change.AVAILABLE:
+                return f'Seats available again on {self.proposal.metadata.vehicle_number}: {seats}'
+            case _:
+                return f'Seats count of {self.proposal.metadata.vehicle_number} went from' \
+                       f' {self.previous_seats} to {self.seats}: {seats}'
+
+
+class Watcher:
+    """
+    Poll periodically the same route and days, keeping the last snapshot of each (route, day)
+    """
+    departure: Station
+    arrival: Station
+    days: [datetime]
+    interval: int
+    threshold: int
+    state_file: str
+    on_change: str
+    jsonl_file: str
+    snapshots: dict[str, dict[str, int]]
+
+    def __init__(self, departure: Station, arrival: Station, days: [datetime], interval: int,
+                 threshold=None, state_file=None, on_change=None, jsonl_file=None):
+        self.departure = departure
+        self.arrival = arrival
+        self.days = days
+        self.interval = interval
+        self.threshold = threshold
+        self.state_file = state_file
+        self.on_change = on_change
+        self.jsonl_file = jsonl_file
+        self.snapshots = {}
+        if state_file and exists(state_file):
+            with open(state_file, encoding='utf-8') as file:
+                self.snapshots = json.load(file)
+
+    @staticmethod
+    def train_key(proposal: Proposal) -> str:
+        """
+        Returns a key identifying a train on a given day
+        """
+        return f"{proposal.metadata.vehicle_number} {proposal.departure_date.isoformat()}"
+
+    def diff(self, snapshot_key: str, proposals: [Proposal]) -> [Change]:
+        """
+        Compare proposals with the last snapshot of the same (route, day) and update it
+        :param snapshot_key: key of the (route, day) snapshot
+        :param proposals: proposals found during the current poll
+        :return: list of changes since the previous poll
+        """
+        previous = self.snapshots.get(snapshot_key, {})
+        # Trains missing from this poll are kept in the snapshot with 0 seats,
+        # so that they are reported as available, not new, when they come back
+        current = dict.fromkeys(previous, 0)
+        changes = []
+        for proposal in proposals:
+            key = Watcher.train_key(proposal)
+            seats = proposal.get_remaining_seats()
+            current[key] = seats
+            if key not in previous:
+                changes.append(Change(Change.NEW, snapshot_key, proposal, None, seats))
+            elif previous[key] == 0 and seats > 0:
+                changes.append(Change(Change.AVAILABLE, snapshot_key, proposal, 0, seats))
+            elif self.threshold is not None and \
+                    (previous[key] < self.threshold) != (seats < self.threshold):
+                changes.append(Change(Change.THRESHOLD, snapshot_key, proposal, previous[key], seats))
+        self.snapshots[snapshot_key] = current
+        return changes
+
+    def emit(self, changes: [Change]) -> None:
+        """
+        Print changes and run the optional hooks
+        :param changes: changes detected during a poll
+        """
+        for change in changes:
+            console.print(f'{change.route} | {change}', style='bold green')
+            line = json.dumps(change.to_dict(), ensure_ascii=False)
+            if self.jsonl_file:
+                with open(self.jsonl_file, 'a', encoding='utf-8') as file:
+                    file.write(line + '\n')
+            if self.on_change:
+                # The change is given to the command on its standard input as a JSON line
+                subprocess.run(self.on_change, shell=True, input=line, text=True, check=False)
+
+    def save(self) -> None:
+        """
+        Persist snapshots on disk if a state file is configured
+        """
+        if self.state_file:
+            with open(self.state_file, 'w', encoding='utf-8') as file:
+                json.dump(self.snapshots, file)
+
+    def poll(self, search_opts: SearchOptions, prompt_opts: PromptOptions) -> [Change]:
+        """
+        Search all watched days once
+        :return: changes detected on all days
+        """
+        changes = []
+        for day in self.days:
+            if day.date() < datetime.now().date():
+                continue  # this day is over, nothing left to watch
+            proposals = get_available_seats(self.departure.code, self.arrival.code, day, search_opts, prompt_opts)
+            changes.extend(self.diff(f"{self.departure.code}-{self.arrival.code} {day.date().isoformat()}",
+                                     proposals))
+        self.save()
+        return changes
+
+    def run(self, search_opts: SearchOptions, prompt_opts: PromptOptions) -> None:
+        """
+        Poll forever on a jittered schedule, emitting only changes
+        """
+        while True:
+            changes = self.poll(search_opts, prompt_opts)
+            self.emit(changes)
+            if not changes and prompt_opts.verbosity:
+                print(f'{datetime.now().strftime("%X")} no change')
+            # jitter the interval so polls don't look like a fixed schedule
+            sleep(self.interval * uniform(0.8, 1.2))